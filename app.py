@@ -1,14 +1,117 @@
 """
 Website routing using Flask
 """
+import cProfile
+import os
+import time
+from datetime import date
 from pathlib import Path
-from flask import url_for, Flask, render_template, request, redirect
-import pandas as pd
+from flask import (
+    url_for,
+    Flask,
+    Response,
+    abort,
+    g,
+    send_file,
+    render_template,
+    request,
+    redirect,
+    jsonify,
+)
 from modules.workouts import Exercise, Routine
 from modules.profile import User
-from modules.dates import Weekday
+from modules.dates import Weekday, get_date_range
+from modules.history_store import HistoryStore
+from modules.export import stream_long_csv, stream_user_zip
+from modules.history_codec import read_log
+from modules.storage import user_data_dir
+from modules.templates import TEMPLATES
+from modules.autocomplete import EXERCISE_INDEX
+from modules.catalogue import CATALOGUE
+from modules.charts import CHART_CACHE, cached_chart_data
+from modules.reminders import LogFileSink, ReminderScheduler
+from modules.fragments import (
+    FRAGMENT_CACHE,
+    FragmentCacheExtension,
+    template_bytecode_cache,
+)
+from modules.stats import read_stats
+from modules.profiling import RequestProfiler
+from modules.memory import (
+    format_metrics,
+    memory_metrics,
+    start_tracing,
+    stop_tracing,
+    top_allocations,
+)
+from modules.api import (
+    API_VERSION,
+    MAX_SYNC_CHANGES,
+    change_to_dict,
+    compress_response,
+    exercise_to_dict,
+    history_to_dict,
+    routine_to_dict,
+    user_state_to_dict,
+    user_to_dict,
+)
 
 app = Flask(__name__)
+# set before the first render, when flask creates the jinja environment
+app.jinja_options = {
+    **app.jinja_options,
+    "extensions": [FragmentCacheExtension],
+    "bytecode_cache": template_bytecode_cache(),
+}
+EXERCISE_INDEX.load_user_data()
+CATALOGUE.load("user_data/catalogue.json")
+TEMPLATES.load("user_data/templates.json")
+REMINDERS = ReminderScheduler(LogFileSink("user_data/reminders.log"))
+REMINDERS.load_users()
+PROFILER = RequestProfiler(
+    sample_rate=float(os.environ.get("LTRAC_PROFILE_SAMPLE_RATE", 0))
+)
+# journaled changes are saved to the full files after this many
+CHECKPOINT_INTERVAL = 50
+# admin pages show every user's data and can slow the whole process, so
+# they're only served in debug mode or when LTRAC_ADMIN is 1
+app.config["ADMIN_PAGES"] = os.environ.get("LTRAC_ADMIN") == "1"
+
+
+# ----------Profiling-----------#
+
+
+@app.before_request
+def start_profiling():
+    """
+    Profile the request if it's sampled, or asks to be while admin pages
+    are served
+    """
+    if PROFILER.wanted(
+        request.headers, request.args, allow_requested=admin_pages_enabled()
+    ):
+        g.profile = cProfile.Profile()
+        g.profile_started = time.perf_counter()
+        g.profile.enable()
+
+
+# registered before any other after_request hook, so it runs last and the
+# profile covers them too
+@app.after_request
+def stop_profiling(response):
+    """
+    Save the request's profile if it was profiled
+    """
+    request_profile = g.pop("profile", None)
+    if request_profile is not None:
+        request_profile.disable()
+        PROFILER.save(
+            request_profile,
+            request.url_rule.rule if request.url_rule else "unmatched",
+            request.path,
+            g.profile_started,
+        )
+    return response
 
 
 # ----------Login Page-----------#
@@ -26,15 +129,45 @@ def authenticate():
     Check if user exists in system, create new user if not found
     """
     username = request.form["username"]
+    # let other processes save the previous user again
+    previous_user = globals().get("user")
+    if previous_user is not None:
+        previous_user.close_journal()
     global user
     try:
         user = User.load_user_data(username)
     except FileNotFoundError:
         user = User(username)
+    user.open_journal()
 
     return redirect(url_for("home", name=user.name))
 
 
+@app.context_processor
+def inject_data_version():
+    """
+    Give every template the logged in user's data version to key cached
+    fragments with
+    """
+    current_user = globals().get("user")
+    return {
+        "data_version": None if current_user is None else current_user.version
+    }
+
+
+def checkpoint_if_due(pending: int = CHECKPOINT_INTERVAL):
+    """
+    Save the user's full files once enough changes are waiting in their
+    journal
+
+    Args:
+        pending: Integer representing how many journaled changes to allow
+            before saving. 1 saves any pending change
+    """
+    if user.journal is not None and user.journal.pending >= pending:
+        user.checkpoint()
+
+
 # --------Home Page ---------#
 @app.route("/home")
 def home():
@@ -59,16 +192,17 @@ def profile():
         profile_pic = f"img/{user.name}_profile_picture.jpg"
     else:
         profile_pic = "img/default_profile.jpg"
-    level = user.level()
-    level_fraction = user.xp_points - 1000 * user.level()
+    view = user.view()
+    level_fraction, level_size = view.level_progress
     return render_template(
         "profile.html",
-        routines=user.routines,
-        length=len(user.routines),
-        username=user.name,
+        routines=view.routines,
+        length=len(view.routines),
+        username=view.name,
         photo=profile_pic,
-        level=level,
+        level=view.level,
         level_fraction=level_fraction,
+        level_size=level_size,
     )
 
 
@@ -90,6 +224,38 @@ def photo_uploaded():
     return redirect(url_for("profile"))
 
 
+@app.route("/export")
+def export_data():
+    """
+    Streams a download of the user's data, either as a zip of their json,
+    routine logs and profile picture, or with "format=csv" as a single long
+    format csv of every logged set
+    """
+    # exports read the saved files, so save anything still in the journal
+    checkpoint_if_due(1)
+    name_no_spaces = user.name.replace(" ", "_")
+    user_dir = user_data_dir(user.name)
+    if request.args.get("format") == "csv":
+        return Response(
+            stream_long_csv(list(user.routines), user_dir),
+            mimetype="text/csv",
+            headers={
+                "Content-Disposition": (
+                    f"attachment; filename={name_no_spaces}_history.csv"
+                )
+            },
+        )
+    return Response(
+        stream_user_zip(
+            user, user_dir, f"static/img/{user.name}_profile_picture.jpg"
+        ),
+        mimetype="application/zip",
+        headers={
+            "Content-Disposition": f"attachment; filename={name_no_spaces}.zip"
+        },
+    )
+
+
 # @app.route("/username-changed", methods=["GET"])
 # def username_changed():
 #     """
@@ -108,8 +274,8 @@ def routine_history(routine):
     Args:
         routine: String representing name of routine
     """
-    df = pd.read_csv(f"user_data/{user.name}/{routine}/{routine}.csv")
-    df = df[df.columns[1:]]
+    checkpoint_if_due(1)
+    df = read_log(f"{user_data_dir(user.name)}/{routine}/{routine}.csv")
     return render_template(
         "routinehistory.html", routine=routine, data=df.to_html(index=False)
     )
@@ -123,8 +289,10 @@ def personal_records(routine):
     Args:
         routine: String representing name of routine
     """
-    exercises = user.routines[routine].exercises
-    print(exercises)
+    view = user.view()
+    if routine not in view.routines:
+        abort(404)
+    exercises = view.routines[routine].exercises
     return render_template(
         "viewPR.html",
         routine=routine,
@@ -142,8 +310,9 @@ def plan_page():
     Renders page for viewing routines/add new routine
     """
 
+    view = user.view()
     return render_template(
-        "plan.html", routines=user.routines, length=len(user.routines)
+        "plan.html", routines=view.routines, length=len(view.routines)
     )
 
 
@@ -166,10 +335,41 @@ def submit_routine():
     # Get routine name from user input in webpage
     new_routine_name = request.args.get("routine-name")
     user.add_routine(Routine(new_routine_name))
-    user.to_json()
+    checkpoint_if_due()
     return redirect(url_for("add_new_exercise", routine=new_routine_name))
 
 
+@app.route("/templates")
+def routine_templates():
+    """
+    Renders page listing the routine templates a user can start from
+    """
+    return render_template("routinetemplates.html", templates=list(TEMPLATES))
+
+
+@app.route("/adopt-template/<template_id>", methods=["POST"])
+def adopt_template(template_id):
+    """
+    Adds a routine following a template to the user's routines, named after
+    the template with a number added if the user has a routine of that name
+
+    Args:
+        template_id: String identifying the template
+    """
+    template = TEMPLATES.get(template_id)
+    if template is None:
+        abort(404)
+    with user.lock:
+        name = template.name
+        copies = 1
+        while name in user.routines:
+            copies += 1
+            name = f"{template.name}{copies}"
+        user.add_routine(Routine.from_template(template, name))
+        checkpoint_if_due()
+    return redirect(url_for("plan_page"))
+
+
 # ------------- Add exercise to routine ------------- #
 
 
@@ -194,8 +394,9 @@ def submit_exercise(routine):
         routine: String representing name of routine
     """
     # Add new exercise entered by user in webpage
-    user.routines[routine].add_exercise_from_input("exercise-name", "sets")
-    user.export_routines()
+    with user.lock:
+        user.routines[routine].add_exercise_from_input("exercise-name", "sets")
+        checkpoint_if_due()
     return redirect(url_for("add_new_exercise", routine=routine))
 
 
@@ -210,9 +411,10 @@ def logs_page(day):
     Args:
         day: String reprenting what day of the week it is
     """
-    print(user.routines)
+    view = user.view()
+    print(view.routines)
     return render_template(
-        "logs.html", day=day, routines=user.routines, length=len(user.routines)
+        "logs.html", day=day, routines=view.routines, length=len(view.routines)
     )
 
 
@@ -225,8 +427,10 @@ def log_exercise(day, routine):
         day: String reprenting what day of the week it is
         routine: String representing name of routine
     """
-    exercise_dict = user.routines[routine].exercises
-    print(exercise_dict)
+    view = user.view()
+    if routine not in view.routines:
+        abort(404)
+    exercise_dict = view.routines[routine].exercises
     return render_template(
         "routinelog.html", day=day, routine=routine, inputs=exercise_dict
     )
@@ -243,34 +447,81 @@ def submit_log(routine, day):
     """
 
     if request.method == "POST":
-        try:
-            user.routines[routine].load_log(
-                f"user_data/{user.name}/{routine}/{routine}.csv"
+        with user.lock:
+            # open the history store before logging, so a new store is built
+            # from the history logged before today
+            history = HistoryStore.for_user(
+                user, f"{user_data_dir(user.name)}/history"
             )
-        except FileNotFoundError:
-            pass
-
-        user.log_workout(routine_name=routine)
-        user.to_json()
-        # Save to csv
-        user.routines[routine].export_log(
-            f"user_data/{user.name}/{routine}/{routine}.csv"
-        )
+            try:
+                gained_xp = user.log_workout(routine_name=routine)
+            except ValueError:
+                abort(400)
+            history.append_session(
+                user.routines[routine], date.today().isoformat()
+            )
+            # the journal holds the logged sets until the next checkpoint
+            checkpoint_if_due()
+        return redirect(url_for("gain_xp", day=day, xp=gained_xp))
     return redirect(url_for("gain_xp", day=day))
 
 
+@app.route("/submit-logs", methods=["POST"])
+@app.route(f"/api/v{API_VERSION}/logs", methods=["POST"])
+def submit_logs():
+    """
+    Submit many logged exercises at once from a JSON body of the form
+    {"entries": [{"date": ..., "routine": ..., "exercise": ...,
+    "weights": [...]}, ...]}, for clients that logged workouts offline
+
+    Every entry is checked before any are logged, and the whole batch is
+    journaled in a single write
+    """
+    body = request.get_json(silent=True)
+    entries = body.get("entries") if isinstance(body, dict) else None
+    if not isinstance(entries, list):
+        error = "Body must be an object with a list of entries"
+        return jsonify(errors=[error]), 400
+    with user.lock:
+        errors = user.validate_log_entries(entries)
+        if errors:
+            return jsonify(errors=errors), 400
+
+        history = HistoryStore.for_user(
+            user, f"{user_data_dir(user.name)}/history"
+        )
+        gained_xp, sessions = user.log_workouts(entries)
+        for day, routine in sessions:
+            history.append_session(user.routines[routine], day)
+        checkpoint_if_due()
+    return jsonify(
+        gained_xp=gained_xp,
+        level=user.level(),
+        xp_points=user.xp_points,
+        sessions=[
+            {"date": day, "routine": routine} for day, routine in sessions
+        ],
+    )
+
+
 @app.route("/gainxp/<day>")
 def gain_xp(day):
     """
-    Renders a page notifying the user that they gained xp
+    Renders a page notifying the user that they gained xp, with the amount
+    gained given by the "xp" query argument
 
     Args:
         day: String reprenting what day of the week it is
     """
-    level = user.level()
-    level_fraction = user.xp_points - 1000 * user.level()
+    view = user.view()
+    level_fraction, level_size = view.level_progress
     return render_template(
-        "gainxp.html", day=day, level=level, level_fraction=level_fraction
+        "gainxp.html",
+        day=day,
+        gained_xp=request.args.get("xp", type=int),
+        level=view.level,
+        level_fraction=level_fraction,
+        level_size=level_size,
     )
 
 
@@ -278,14 +529,39 @@ def gain_xp(day):
 @app.route("/calendar")
 def calendar():
     """
-    Renders Calendar page
+    Renders Calendar page, along with the user's streaks and adherence for
+    the week or month given by the "period" and "date" query arguments
     """
-    days = [
-        day.name.capitalize()
-        for day, y_n in user.workout_days.items()
-        if y_n == 1
-    ]
-    return render_template("calendar.html", workout_days=days, length=len(days))
+    period = request.args.get("period", "week")
+    try:
+        day = date.fromisoformat(request.args.get("date", ""))
+    except ValueError:
+        day = date.today()
+    try:
+        start, end = get_date_range(day, period)
+    except ValueError:
+        period = "week"
+        start, end = get_date_range(day, period)
+    with user.lock:
+        days = [
+            day.name.capitalize()
+            for day, y_n in user.workout_days.items()
+            if y_n == 1
+        ]
+        adherence = user.streaks.adherence(start, end)
+        current_streak = user.streaks.current_streak()
+        longest_streak = user.streaks.longest_streak
+    return render_template(
+        "calendar.html",
+        workout_days=days,
+        length=len(days),
+        period=period,
+        start=start,
+        end=end,
+        current_streak=current_streak,
+        longest_streak=longest_streak,
+        adherence=None if adherence is None else round(adherence),
+    )
 
 
 @app.route("/select-days")
@@ -304,10 +580,341 @@ def submit_days():
     """
     if request.method == "POST":
         days = request.form.getlist("day")
-        user.set_workout_days([Weekday[day] for day in days])
-        user.to_json()
+        with user.lock:
+            user.set_workout_days([Weekday[day] for day in days])
+            REMINDERS.schedule_user(user.name, user.schedule)
+            checkpoint_if_due()
     return redirect(url_for("calendar"))
 
 
+# ---------------------Admin-------------------- #
+
+
+def admin_pages_enabled():
+    """
+    Check whether admin pages are served
+
+    Returns:
+        True in debug mode or when the ADMIN_PAGES config is set
+    """
+    return app.debug or app.config["ADMIN_PAGES"]
+
+
+@app.before_request
+def require_admin_pages():
+    """
+    Hide every admin page unless admin pages are enabled
+    """
+    if request.path.startswith("/admin/") and not admin_pages_enabled():
+        abort(404)
+
+
+@app.route("/admin/stats")
+def admin_stats():
+    """
+    Renders the gym-wide statistics from the last nightly stats run
+    """
+    return render_template("adminstats.html", stats=read_stats())
+
+
+@app.route("/admin/profiles")
+def admin_profiles():
+    """
+    Renders the slowest profiled requests
+    """
+    return render_template("adminprofiles.html", profiles=PROFILER.slowest())
+
+
+@app.route("/admin/profiles/<profile_id>.<kind>")
+def download_profile(profile_id, kind):
+    """
+    Sends a saved profile, as collapsed stacks or as pstats data
+
+    Args:
+        profile_id: String identifying the profile
+        kind: String representing the file type, "folded" or "prof"
+    """
+    record = PROFILER.find(profile_id)
+    if record is None or kind not in ("folded", "prof"):
+        abort(404)
+    path = record.folded_path if kind == "folded" else record.stats_path
+    return send_file(os.path.abspath(path), as_attachment=True)
+
+
+@app.route("/admin/metrics")
+def admin_metrics():
+    """
+    Returns the memory held by the logged in user and the caches, in the
+    Prometheus text format
+    """
+    current_user = globals().get("user")
+    samples = memory_metrics(
+        [] if current_user is None else [current_user],
+        {"fragments": FRAGMENT_CACHE, "charts": CHART_CACHE},
+    )
+    return Response(
+        format_metrics(samples), mimetype="text/plain; version=0.0.4"
+    )
+
+
+@app.route("/admin/allocations")
+def admin_allocations():
+    """
+    Returns the lines holding the most memory allocated since tracing was
+    started. The "trace" query argument starts tracing when "start" and
+    stops it when "stop"
+    """
+    action = request.args.get("trace")
+    if action == "start":
+        start_tracing()
+    elif action == "stop":
+        stop_tracing()
+    limit = min(max(request.args.get("limit", 10, type=int), 1), 100)
+    return jsonify(allocations=top_allocations(limit))
+
+
+# ---------------------JSON API-------------------- #
+API_PREFIX = f"/api/v{API_VERSION}"
+
+
+@app.after_request
+def compress_api_response(response):
+    """
+    Compress API responses with gzip or deflate when the client accepts it
+    """
+    if request.path.startswith("/api/"):
+        return compress_response(response, request.accept_encodings)
+    return response
+
+
+def api_error(message, status=404):
+    """
+    Create a JSON error response
+
+    Args:
+        message: String describing the error
+        status: Integer representing the HTTP status code
+    """
+    return jsonify(errors=[message]), status
+
+
+def user_exercises(routine):
+    """
+    Find the exercises of one of the user's routines, while holding the
+    user's lock
+
+    Args:
+        routine: String representing name of routine
+
+    Returns:
+        A dictionary mapping exercise names to Exercise objects, empty if the
+        user has no routine with that name
+    """
+    return user.routines[routine].exercises if routine in user.routines else {}
+
+
+def api_date_range():
+    """
+    Read an optional date range from the "start" and "end" query arguments
+
+    Returns:
+        A tuple of two datetime.date objects or None, the start and end
+    """
+    start = request.args.get("start")
+    end = request.args.get("end")
+    return (
+        date.fromisoformat(start) if start else None,
+        date.fromisoformat(end) if end else None,
+    )
+
+
+@app.route(f"{API_PREFIX}/user")
+def api_user():
+    """
+    Return the user's profile, xp, level and streaks
+    """
+    with user.lock:
+        user_dict = user_to_dict(user)
+    return jsonify(user_dict)
+
+
+@app.route(f"{API_PREFIX}/routines")
+def api_routines():
+    """
+    Return every routine and its exercises
+    """
+    with user.lock:
+        routines = [
+            routine_to_dict(routine) for routine in user.routines.values()
+        ]
+    return jsonify(routines=routines)
+
+
+@app.route(f"{API_PREFIX}/routines/<routine>")
+def api_routine(routine):
+    """
+    Return a single routine and its exercises
+
+    Args:
+        routine: String representing name of routine
+    """
+    with user.lock:
+        if routine not in user.routines:
+            return api_error(f"No routine named {routine}")
+        routine_dict = routine_to_dict(user.routines[routine])
+    return jsonify(routine_dict)
+
+
+@app.route(f"{API_PREFIX}/routines/<routine>/exercises/<exercise>")
+def api_exercise(routine, exercise):
+    """
+    Return a single exercise, with its history in the date range given by the
+    "start" and "end" query arguments
+
+    Args:
+        routine: String representing name of routine
+        exercise: String representing name of exercise
+    """
+    try:
+        start, end = api_date_range()
+    except ValueError:
+        return api_error("Dates must be in ISO format", 400)
+    with user.lock:
+        if exercise not in user_exercises(routine):
+            return api_error(f"No exercise named {exercise} in {routine}")
+        exercise = user.routines[routine].exercises[exercise]
+        exercise_dict = {
+            **exercise_to_dict(exercise),
+            "history": history_to_dict(exercise, start, end),
+        }
+    return jsonify(exercise_dict)
+
+
+@app.route(f"{API_PREFIX}/routines/<routine>/exercises/<exercise>/chart")
+def api_exercise_chart(routine, exercise):
+    """
+    Return an exercise's max weight, volume and estimated one rep max series,
+    downsampled to the chart width in pixels given by the "width" query
+    argument. The "reps" query argument is the reps per set used for the
+    estimate
+
+    Args:
+        routine: String representing name of routine
+        exercise: String representing name of exercise
+    """
+    width = min(max(request.args.get("width", 600, type=int), 3), 2000)
+    reps = min(max(request.args.get("reps", 5, type=int), 1), 30)
+    with user.lock:
+        if exercise not in user_exercises(routine):
+            return api_error(f"No exercise named {exercise} in {routine}")
+        chart = cached_chart_data(
+            user,
+            routine,
+            user.routines[routine].exercises[exercise],
+            width,
+            reps,
+        )
+    return jsonify(chart)
+
+
+@app.route(f"{API_PREFIX}/routines/<routine>/history")
+def api_routine_history(routine):
+    """
+    Return the history of every exercise in a routine, in the date range
+    given by the "start" and "end" query arguments
+
+    Args:
+        routine: String representing name of routine
+    """
+    try:
+        start, end = api_date_range()
+    except ValueError:
+        return api_error("Dates must be in ISO format", 400)
+    with user.lock:
+        if routine not in user.routines:
+            return api_error(f"No routine named {routine}")
+        history = {
+            name: history_to_dict(exercise, start, end)
+            for name, exercise in user.routines[routine].exercises.items()
+        }
+    return jsonify(history)
+
+
+@app.route(f"{API_PREFIX}/sync")
+def api_sync():
+    """
+    Return the changes to the user after the version given by the "since"
+    query argument, at most "limit" of them, and the version to send as
+    "since" next time. If those changes are no longer kept, or "since" is
+    left out, return the user's full state under "full" instead
+    """
+    since = request.args.get("since", type=int)
+    limit = request.args.get("limit", MAX_SYNC_CHANGES, type=int)
+    limit = min(max(limit, 1), MAX_SYNC_CHANGES)
+    with user.lock:
+        changes = None
+        if user.changes is not None and since is not None:
+            # one extra to tell whether there are more
+            changes = user.changes.changes_since(since, limit + 1)
+        if changes is None:
+            version = 0 if user.changes is None else user.changes.version
+            return jsonify(version=version, full=user_state_to_dict(user))
+    more = len(changes) > limit
+    changes = changes[:limit]
+    return jsonify(
+        version=changes[-1][0] if changes else since,
+        changes=[change_to_dict(*change) for change in changes],
+        more=more,
+    )
+
+
+@app.route(f"{API_PREFIX}/exercises/suggest")
+def api_suggest_exercises():
+    """
+    Return exercise names starting with the "q" query argument, for
+    autocompleting the add exercise form
+    """
+    limit = min(max(request.args.get("limit", 10, type=int), 1), 50)
+    return jsonify(
+        suggestions=EXERCISE_INDEX.suggest(request.args.get("q", ""), limit)
+    )
+
+
+@app.route(f"{API_PREFIX}/schedule")
+def api_schedule():
+    """
+    Return the user's workout days and the planned workout dates over the
+    number of weeks given by the "weeks" query argument
+    """
+    weeks = min(max(request.args.get("weeks", 4, type=int), 0), 52)
+    # the schedule is replaced rather than changed, so one read is consistent
+    schedule = user.schedule
+    return jsonify(
+        workout_days=[day.name for day in schedule.days()],
+        planned=[day.isoformat() for day in schedule.project_weeks(weeks)],
+    )
+
+
+@app.route(f"{API_PREFIX}/prs")
+def api_personal_records():
+    """
+    Return the personal record of every exercise in every routine
+    """
+    view = user.view()
+    return jsonify(
+        {
+            routine.name: {
+                exercise.name: exercise.personal_record
+                for exercise in routine.exercises.values()
+            }
+            for routine in view.routines.values()
+        }
+    )
+
+
 if __name__ == "__main__":
+    # the debug reloader runs this in a watcher process too, which shouldn't
+    # send reminders
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        REMINDERS.start()
     app.run(debug=True)
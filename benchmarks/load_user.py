@@ -0,0 +1,46 @@
+"""
+Benchmark loading a heavy user from their snapshot and from json and csv
+
+Run from the repository root with:
+    python benchmarks/load_user.py [REPEATS]
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+from memory_footprint import build_user
+from modules.profile import User
+from modules.snapshot import snapshot_path
+from modules.storage import user_data_dir
+
+
+def main(repeats: int):
+    """
+    Save a heavy user and print how long loading them takes
+
+    Args:
+        repeats: An integer representing how many loads to time
+    """
+    user = build_user(0)
+    with tempfile.TemporaryDirectory() as directory:
+        user.to_json(directory)
+        user.export_routines(directory)
+
+        def load():
+            User.load_user_data(user.name, directory=directory)
+
+        with_snapshot = timeit.timeit(load, number=repeats) / repeats
+        os.remove(snapshot_path(user_data_dir(user.name, directory), user.name))
+        without_snapshot = timeit.timeit(load, number=repeats) / repeats
+    print(
+        f"snapshot: {with_snapshot * 1000:.2f} ms,"
+        f" json and csv: {without_snapshot * 1000:.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
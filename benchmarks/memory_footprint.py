@@ -0,0 +1,71 @@
+"""
+Benchmark the memory held per cached user
+
+Builds users the way the website does, with weights arriving as strings from
+the logging form, and reports the bytes allocated per user.
+
+Run from the repository root with:
+    python benchmarks/memory_footprint.py [USERS]
+"""
+import sys
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+from modules.profile import User
+from modules.workouts import Routine, Exercise
+
+ROUTINES = 3
+EXERCISES = 5
+SETS = "3"
+SESSIONS = 100
+
+
+def build_user(number: int):
+    """
+    Build a user with a full year of logged routines
+
+    Args:
+        number: An integer used to give the user a unique name
+
+    Returns:
+        A User object
+    """
+    user = User(f"user{number}")
+    start = date(2023, 1, 1)
+    for routine_number in range(ROUTINES):
+        routine = Routine(f"routine{routine_number}")
+        for exercise_number in range(EXERCISES):
+            exercise = Exercise(f"exercise{exercise_number}", SETS)
+            for session in range(SESSIONS):
+                day = start + timedelta(days=3 * session + routine_number)
+                weights = [str(100 + session + n) for n in range(int(SETS))]
+                exercise.log_weights(day.isoformat(), weights)
+            routine.add_exercise(exercise)
+        user.add_routine(routine)
+    return user
+
+
+def main(user_count: int):
+    """
+    Build users and print the memory they hold
+
+    Args:
+        user_count: An integer representing how many users to build
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    users = [build_user(number) for number in range(user_count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    per_user = (after - before) / len(users)
+    print(
+        f"{len(users)} users, {ROUTINES * EXERCISES * SESSIONS} logged"
+        f" exercise sessions each: {per_user / 1024:.1f} KiB per user"
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,212 @@
+"""
+Serialization and response compression for the LTRAC JSON API
+"""
+import gzip
+import math
+import zlib
+from datetime import date
+from flask import Response
+from .schedule import Schedule
+from .templates import TEMPLATES
+from .workouts import Exercise, Routine, weight_value
+
+API_VERSION = 1
+# responses smaller than this aren't worth compressing
+MIN_COMPRESS_SIZE = 500
+# the most changes a sync returns, clients with more to catch up on sync again
+MAX_SYNC_CHANGES = 500
+COMPRESSORS = {
+    "gzip": lambda data: gzip.compress(data, compresslevel=6),
+    "deflate": lambda data: zlib.compress(data, 6),
+}
+
+
+def weights_to_json(weights):
+    """
+    Convert stored weights to a JSON friendly list
+
+    Args:
+        weights: An array of floats representing the weights for each set
+
+    Returns:
+        A list of numbers, with None for sets that weren't logged
+    """
+    return [
+        None if math.isnan(weight) else weight_value(weight)
+        for weight in weights
+    ]
+
+
+def exercise_to_dict(exercise: Exercise):
+    """
+    Serialize an exercise without its history
+
+    Args:
+        exercise: An Exercise object
+
+    Returns:
+        A dictionary with the exercise's name, sets and personal record
+    """
+    return {
+        "name": exercise.name,
+        "sets": exercise.sets,
+        "personal_record": exercise.personal_record(),
+    }
+
+
+def routine_to_dict(routine: Routine):
+    """
+    Serialize a routine without its history
+
+    Args:
+        routine: A Routine object
+
+    Returns:
+        A dictionary with the routine's name and a list of its exercises
+    """
+    return {
+        "name": routine.name,
+        "exercises": [
+            exercise_to_dict(exercise)
+            for exercise in routine.exercises.values()
+        ],
+    }
+
+
+def history_to_dict(exercise: Exercise, start: date = None, end: date = None):
+    """
+    Serialize the history of an exercise in a date range
+
+    Args:
+        exercise: An Exercise object
+        start: A datetime.date object representing the first day to include,
+            or None to start from the beginning
+        end: A datetime.date object representing the last day to include,
+            or None to go to the end
+
+    Returns:
+        A dictionary mapping ISO dates to lists of weights, in date order
+    """
+    start_iso = start.isoformat() if start else ""
+    end_iso = end.isoformat() if end else "9999-12-31"
+    return {
+        day: weights_to_json(weights)
+        for day, weights in sorted(exercise.history.items())
+        if start_iso <= day <= end_iso
+    }
+
+
+def user_to_dict(user):
+    """
+    Serialize a user's profile, without their routines
+
+    Args:
+        user: A User object
+
+    Returns:
+        A dictionary with the user's name, xp, level, schedule and streaks
+    """
+    level_xp, level_size = user.level_progress()
+    next_day = user.next_workout_day()
+    return {
+        "name": user.name,
+        "xp_points": user.xp_points,
+        "level": user.level(),
+        "level_xp": level_xp,
+        "level_size": level_size,
+        "workout_days": [day.name for day in user.schedule.days()],
+        "next_workout_day": next_day.isoformat() if next_day else None,
+        "current_streak": user.streaks.current_streak(),
+        "longest_streak": user.streaks.longest_streak,
+        "routines": list(user.routines),
+    }
+
+
+def user_state_to_dict(user):
+    """
+    Serialize everything a syncing client keeps about a user
+
+    Args:
+        user: A User object
+
+    Returns:
+        A dictionary of the user's profile, as from user_to_dict, with each
+        routine's exercises and their full history in place of the routine
+        names
+    """
+    return {
+        **user_to_dict(user),
+        "routines": [
+            {
+                **routine_to_dict(routine),
+                "history": {
+                    name: history_to_dict(exercise)
+                    for name, exercise in routine.exercises.items()
+                },
+            }
+            for routine in user.routines.values()
+        ],
+    }
+
+
+def change_to_dict(version: int, operation: str, args: dict):
+    """
+    Serialize a change from a user's change log
+
+    Args:
+        version: An integer representing the change's version
+        operation: A string representing the name of the operation
+        args: A dictionary of the operation's arguments
+
+    Returns:
+        A dictionary with the change's version, operation and arguments.
+        Weights are converted as by weights_to_json, schedules are listed as
+        day names and a routine added from a template lists the template's
+        exercises
+    """
+    if operation == "log":
+        args = {**args, "weights": weights_to_json(args["weights"])}
+    elif operation == "set_schedule":
+        days = Schedule(args["mask"]).days()
+        args = {"workout_days": [day.name for day in days]}
+    elif operation == "add_routine" and "template" in args:
+        template = TEMPLATES.get(args["template"])
+        args = {
+            **args,
+            "exercises": [
+                {"name": name, "sets": sets}
+                for name, sets in (template.exercises if template else ())
+            ],
+        }
+    return {"version": version, "operation": operation, "args": args}
+
+
+def compress_response(response: Response, accept_encodings):
+    """
+    Compress a response body with the best encoding the client accepts
+
+    Args:
+        response: A flask Response object
+        accept_encodings: The werkzeug Accept object from the request's
+            Accept-Encoding header
+
+    Returns:
+        The same Response object, compressed if it was worth compressing
+    """
+    response.vary.add("Accept-Encoding")
+    if (
+        response.direct_passthrough
+        or response.status_code < 200
+        or response.status_code >= 300
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+    encoding = accept_encodings.best_match(list(COMPRESSORS))
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return response
+    response.set_data(COMPRESSORS[encoding](data))
+    response.headers["Content-Encoding"] = encoding
+    return response
@@ -0,0 +1,328 @@
+"""
+Archival of old routine history into compressed per-year files
+
+A routine's csv log only keeps sessions newer than the archive horizon. Older
+sessions are moved into gzip compressed csv files, one per year, next to it:
+    [ROUTINE_NAME].[YEAR].csv.gz: the archived sessions of that year, in the
+        same format as the csv log
+    [ROUTINE_NAME].archive.json: which years are archived, every archived
+        session date and the heaviest weight archived for each exercise, so
+        personal records and streaks don't need the archives to be read
+A csv log encoded by history_codec stays encoded when it's cut down.
+
+archive_all holds the lock on each user's data directory while archiving
+their routines, which the app holds for as long as it has the user logged
+in, so a checkpoint can't rewrite a csv log between the job reading it and
+cutting it down. A user the app has open is skipped until the next run.
+"""
+import json
+import os
+import sys
+from datetime import date, timedelta
+from typing import Dict, List
+import pandas as pd
+from .history_codec import log_codec, read_log, write_log
+from .journal import user_dir_locked
+from .storage import user_dirs
+
+DEFAULT_HORIZON_DAYS = 365
+
+
+def archive_path(csv_path: str, year: int):
+    """
+    Find the path of a routine's archive for a year
+
+    Args:
+        csv_path: A string representing the path to the routine's csv log
+        year: An integer representing the year
+
+    Returns:
+        A string representing the path to the archive file
+    """
+    return f"{csv_path[:-len('.csv')]}.{year}.csv.gz"
+
+
+def meta_path(csv_path: str):
+    """
+    Find the path of a routine's archive metadata
+
+    Args:
+        csv_path: A string representing the path to the routine's csv log
+
+    Returns:
+        A string representing the path to the metadata file
+    """
+    return f"{csv_path[:-len('.csv')]}.archive.json"
+
+
+class ArchiveMeta:
+    """
+    What has been archived from a routine's csv log
+
+    Attributes:
+        years: A sorted list of integers representing the archived years
+        days: A sorted list of strings representing every archived session
+            date in ISO format
+        records: A dictionary mapping exercise names to the heaviest weight
+            archived for them
+    """
+
+    years: List[int]
+    days: List[str]
+    records: Dict[str, float]
+
+    def __init__(self, years=(), days=(), records=None):
+        self.years = sorted(years)
+        self.days = sorted(days)
+        self.records = dict(records or {})
+
+    def __eq__(self, other):
+        return (self.years, self.days, self.records) == (
+            other.years,
+            other.days,
+            other.records,
+        )
+
+    @classmethod
+    def read(cls, csv_path: str):
+        """
+        Read the archive metadata of a routine
+
+        Args:
+            csv_path: A string representing the path to the routine's csv log
+
+        Returns:
+            An ArchiveMeta object, or None if nothing has been archived
+        """
+        try:
+            with open(meta_path(csv_path), "r", encoding="UTF-8") as file:
+                json_dict = json.load(file)
+        except FileNotFoundError:
+            return None
+        return cls(json_dict["years"], json_dict["days"], json_dict["records"])
+
+    def write(self, csv_path: str):
+        """
+        Save the archive metadata of a routine
+
+        Args:
+            csv_path: A string representing the path to the routine's csv log
+        """
+        json_dict = {
+            "years": self.years,
+            "days": self.days,
+            "records": self.records,
+        }
+        path = meta_path(csv_path)
+        with open(f"{path}.tmp", "w", encoding="UTF-8") as file:
+            json.dump(json_dict, file)
+        os.replace(f"{path}.tmp", path)
+
+    def years_since(self, since: date):
+        """
+        Find the archived years a query starting on a date spans
+
+        Args:
+            since: A datetime.date object representing the first day of the
+                query
+
+        Returns:
+            A list of integers representing the archived years to read
+        """
+        return [year for year in self.years if year >= since.year]
+
+
+def read_archive(csv_path: str, year: int):
+    """
+    Read a routine's archive for a year
+
+    Args:
+        csv_path: A string representing the path to the routine's csv log
+        year: An integer representing the year
+
+    Returns:
+        A pandas DataFrame in the same format as the csv log
+    """
+    return pd.read_csv(archive_path(csv_path, year), index_col=0)
+
+
+def _merge_logs(newer: pd.DataFrame, older: pd.DataFrame):
+    """
+    Merge two routine logs, keeping the newer log's weights where both have
+    the same day
+
+    Args:
+        newer: A pandas DataFrame in the csv log format
+        older: A pandas DataFrame in the csv log format
+
+    Returns:
+        A pandas DataFrame in the csv log format, with its days in order
+    """
+    merged = (
+        newer.set_index(["Exercise", "Set"])
+        .combine_first(older.set_index(["Exercise", "Set"]))
+        .reset_index()
+    )
+    days = sorted(merged.columns[2:])
+    return merged[["Exercise", "Set", *days]]
+
+
+def _write_log(log_df: pd.DataFrame, path: str, codec: str = "csv"):
+    """
+    Write a routine log without leaving a partly written file behind
+
+    Args:
+        log_df: A pandas DataFrame in the csv log format
+        path: A string representing the path to write, compressed if it ends
+            in .gz
+        codec: A string representing how to store a log not ending in .gz,
+            "csv" or a codec of history_codec
+    """
+    if path.endswith(".gz"):
+        log_df.to_csv(f"{path}.tmp", compression="gzip")
+    else:
+        write_log(log_df, f"{path}.tmp", codec)
+    os.replace(f"{path}.tmp", path)
+
+
+def _archived_records(records: dict, log_df: pd.DataFrame, old_days: list):
+    """
+    Update the heaviest weight archived for each exercise with the sessions
+    about to be archived
+
+    Args:
+        records: A dictionary mapping exercise names to the heaviest weight
+            already archived
+        log_df: A pandas.DataFrame object of the routine's csv log
+        old_days: A list of strings representing the dates being archived
+
+    Returns:
+        A new dictionary mapping exercise names to the heaviest weight
+        archived
+    """
+    weights = log_df[old_days].apply(pd.to_numeric, errors="coerce")
+    heaviest = weights.max(axis=1).groupby(log_df["Exercise"]).max()
+    records = dict(records)
+    for name, weight in heaviest.dropna().items():
+        records[name] = max(records.get(name, weight), float(weight))
+    return records
+
+
+def archive_routine(
+    csv_path: str, horizon_days: int = DEFAULT_HORIZON_DAYS, today: date = None
+):
+    """
+    Move the sessions older than the horizon out of a routine's csv log into
+    its per-year archives
+
+    The archives and metadata are written before the csv log is cut down, so
+    if the job stops part way the sessions are in both places and the csv
+    log's copy wins.
+
+    Args:
+        csv_path: A string representing the path to the routine's csv log
+        horizon_days: An integer representing how many days of history the
+            csv log keeps
+        today: A datetime.date object representing the day to measure the
+            horizon from. Defaults to today
+
+    Returns:
+        An integer representing the number of sessions archived
+    """
+    if today is None:
+        today = date.today()
+    cutoff = (today - timedelta(days=horizon_days)).isoformat()
+    log_df = read_log(csv_path)
+    old_days = [day for day in log_df.columns[2:] if day < cutoff]
+    if not old_days:
+        return 0
+
+    meta = ArchiveMeta.read(csv_path) or ArchiveMeta()
+    records = _archived_records(meta.records, log_df, old_days)
+    years = {}
+    for day in old_days:
+        years.setdefault(int(day[:4]), []).append(day)
+    for year, days in years.items():
+        year_df = log_df[["Exercise", "Set", *days]]
+        if year in meta.years:
+            year_df = _merge_logs(year_df, read_archive(csv_path, year))
+        _write_log(year_df.reset_index(drop=True), archive_path(csv_path, year))
+
+    ArchiveMeta(
+        set(meta.years) | set(years), set(meta.days) | set(old_days), records
+    ).write(csv_path)
+    _write_log(log_df.drop(columns=old_days), csv_path, log_codec(csv_path))
+    return len(old_days)
+
+
+def _archive_user(user_dir: str, horizon_days: int, today: date):
+    """
+    Archive the old sessions of every routine of one user, holding the lock
+    on their data directory
+
+    Args:
+        user_dir: A string representing the user's data directory
+        horizon_days: An integer representing how many days of history each
+            csv log keeps
+        today: A datetime.date object representing the day to measure the
+            horizon from, or None for today
+
+    Returns:
+        A dictionary mapping the path of each csv log that had sessions
+        archived to the number of sessions archived
+
+    Raises:
+        BlockingIOError: Another process, such as the app, has the user open
+    """
+    archived = {}
+    with user_dir_locked(user_dir, blocking=False):
+        for routine_entry in os.scandir(user_dir):
+            csv_path = f"{routine_entry.path}/{routine_entry.name}.csv"
+            if routine_entry.is_dir() and os.path.isfile(csv_path):
+                count = archive_routine(csv_path, horizon_days, today)
+                if count:
+                    archived[csv_path] = count
+    return archived
+
+
+def archive_all(
+    directory: str = "user_data",
+    horizon_days: int = DEFAULT_HORIZON_DAYS,
+    today: date = None,
+):
+    """
+    Archive the old sessions of every routine of every user, skipping users
+    another process has open
+
+    Args:
+        directory: A string representing the base directory of user data
+        horizon_days: An integer representing how many days of history each
+            csv log keeps
+        today: A datetime.date object representing the day to measure the
+            horizon from. Defaults to today
+
+    Returns:
+        A tuple of a dictionary mapping the path of each csv log that had
+        sessions archived to the number of sessions archived, and a list of
+        the names of users skipped because they were open
+    """
+    archived = {}
+    busy = []
+    for name, user_dir in user_dirs(directory):
+        try:
+            archived.update(_archive_user(user_dir, horizon_days, today))
+        except BlockingIOError:
+            busy.append(name)
+    return archived, busy
+
+
+if __name__ == "__main__":
+    # run regularly, for example nightly from cron:
+    # python -m modules.archive [HORIZON_DAYS]
+    archived_logs, busy_users = archive_all(
+        horizon_days=int(sys.argv[1]) if len(sys.argv) > 1 else 365
+    )
+    for log_path, sessions in archived_logs.items():
+        print(f"{log_path}: archived {sessions} sessions")
+    for busy_user in busy_users:
+        print(f"{busy_user}: skipped, open in the app")
@@ -0,0 +1,155 @@
+"""
+Prefix search over exercise names for autocompleting the add exercise form
+"""
+import json
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List
+from .storage import routine_json_paths
+
+BUILTIN_EXERCISES = (
+    "Arnold Press",
+    "Back Squat",
+    "Barbell Curl",
+    "Barbell Row",
+    "Bench Press",
+    "Bulgarian Split Squat",
+    "Cable Fly",
+    "Calf Raise",
+    "Chin Up",
+    "Close Grip Bench Press",
+    "Deadlift",
+    "Dip",
+    "Dumbbell Bench Press",
+    "Dumbbell Curl",
+    "Dumbbell Row",
+    "Face Pull",
+    "Front Raise",
+    "Front Squat",
+    "Goblet Squat",
+    "Hammer Curl",
+    "Hip Thrust",
+    "Incline Bench Press",
+    "Incline Dumbbell Press",
+    "Lat Pulldown",
+    "Lateral Raise",
+    "Leg Curl",
+    "Leg Extension",
+    "Leg Press",
+    "Lunge",
+    "Overhead Press",
+    "Pendlay Row",
+    "Preacher Curl",
+    "Pull Up",
+    "Push Up",
+    "Rear Delt Fly",
+    "Romanian Deadlift",
+    "Seated Cable Row",
+    "Shrug",
+    "Skull Crusher",
+    "Sumo Deadlift",
+    "T Bar Row",
+    "Tricep Extension",
+    "Tricep Pushdown",
+)
+
+
+def normalize(name: str):
+    """
+    Normalize an exercise name for matching, ignoring case, spacing and
+    hyphens
+
+    Args:
+        name: A string representing an exercise name
+
+    Returns:
+        A string in lower case with single spaces between words
+    """
+    return " ".join(name.casefold().replace("-", " ").split())
+
+
+class PrefixIndex:
+    """
+    A sorted array of normalized exercise names searched with bisect
+
+    Attributes:
+        keys: A sorted list of strings representing the normalized names
+        names: A dictionary mapping each normalized name to the name shown
+            to users, which is the first spelling added
+    """
+
+    keys: List[str]
+    names: Dict[str, str]
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.names = {}
+        for name in names:
+            key = normalize(name)
+            if key and key not in self.names:
+                self.names[key] = name.strip()
+        self.keys = sorted(self.names)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, name: str):
+        return normalize(name) in self.names
+
+    def add(self, name: str):
+        """
+        Add an exercise name to the index, keeping the keys sorted
+
+        Args:
+            name: A string representing the exercise name
+        """
+        key = normalize(name)
+        if key and key not in self.names:
+            self.names[key] = name.strip()
+            insort(self.keys, key)
+
+    def suggest(self, prefix: str, limit: int = 10):
+        """
+        Find exercise names starting with a prefix
+
+        Args:
+            prefix: A string representing what the user has typed so far
+            limit: An integer representing the most names to return
+
+        Returns:
+            A list of up to limit strings representing matching exercise
+            names in alphabetical order
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        suggestions = []
+        index = bisect_left(self.keys, prefix)
+        while (
+            index < len(self.keys)
+            and len(suggestions) < limit
+            and self.keys[index].startswith(prefix)
+        ):
+            suggestions.append(self.names[self.keys[index]])
+            index += 1
+        return suggestions
+
+    def load_user_data(self, directory: str = "user_data"):
+        """
+        Add every exercise name in every user's routine json
+
+        Args:
+            directory: A string representing the base directory of user data
+        """
+        for path in routine_json_paths(directory):
+            try:
+                with open(path, "r", encoding="UTF-8") as file:
+                    json_dict = json.load(file)
+            except (OSError, ValueError):
+                continue
+            if not isinstance(json_dict, dict):
+                continue
+            for item in json_dict.get("_exercises", {}).values():
+                self.add(item["_name"])
+
+
+# shared by every routine so new exercises are suggested straight away
+EXERCISE_INDEX = PrefixIndex(BUILTIN_EXERCISES)
@@ -0,0 +1,253 @@
+"""
+Loading every user at once for admin and nightly reporting jobs
+
+Users are split into chunks that are loaded across a process pool, so the
+csv parsing of each user runs in parallel. A user whose files can't be read
+is reported with the error instead of stopping the whole run.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Callable, List
+import pandas as pd
+from .journal import journal_path
+from .profile import User
+from .storage import user_dirs
+
+FRAME_COLUMNS = ("User", "Routine", "Exercise", "Set", "Date", "Weight")
+
+
+def discover_users(directory: str = "user_data"):
+    """
+    Find every user with saved or journaled data
+
+    Args:
+        directory: A string representing the base directory of user data
+
+    Returns:
+        A sorted list of strings representing the users' directory names
+    """
+    return sorted(
+        name
+        for name, user_dir in user_dirs(directory)
+        if os.path.isfile(f"{user_dir}/{name}.json")
+        or os.path.isfile(journal_path(user_dir))
+    )
+
+
+def _chunks(names: List[str], chunk_size: int, workers: int):
+    """
+    Split user names into the chunks handed to each worker
+
+    Args:
+        names: A list of strings representing the users' directory names
+        chunk_size: An integer representing the number of users per chunk,
+            or None to give each worker about four chunks
+        workers: An integer representing the number of worker processes, or
+            None for the number of CPUs
+
+    Returns:
+        A list of lists of strings representing the users in each chunk
+    """
+    if chunk_size is None:
+        chunk_size = max(len(names) // (4 * (workers or os.cpu_count())), 1)
+    return [
+        names[start : start + chunk_size]
+        for start in range(0, len(names), chunk_size)
+    ]
+
+
+def load_chunk(args):
+    """
+    Load a chunk of users
+
+    Args:
+        args: A tuple of a list of the users' directory names, the data
+            directory and the earliest history to load
+
+    Returns:
+        A list of tuples of each user's directory name and either their User
+        object or the exception raised while loading it
+    """
+    names, directory, since = args
+    loaded = []
+    for name in names:
+        try:
+            loaded.append(
+                (name, User.load_user_data(name, directory, since=since))
+            )
+        except (OSError, ValueError, KeyError) as error:
+            loaded.append((name, error))
+    return loaded
+
+
+def history_columns(loaded: List[tuple]):
+    """
+    Flatten the history of loaded users into columns of every logged set
+
+    Args:
+        loaded: A list of tuples of each user's directory name and either
+            their User object or the exception raised while loading it
+
+    Returns:
+        A tuple of a dictionary mapping each of FRAME_COLUMNS to a list of
+        values and a dictionary mapping the directory name of each user that
+        couldn't be loaded to the exception raised
+    """
+    columns = {column: [] for column in FRAME_COLUMNS}
+    errors = {}
+    for name, user in loaded:
+        if isinstance(user, Exception):
+            errors[name] = user
+            continue
+        for routine in user.routines.values():
+            for exercise in routine.exercises.values():
+                for day, weights in exercise.history.items():
+                    for set_number, weight in enumerate(weights, start=1):
+                        columns["User"].append(name)
+                        columns["Routine"].append(routine.name)
+                        columns["Exercise"].append(exercise.name)
+                        columns["Set"].append(set_number)
+                        columns["Date"].append(day)
+                        columns["Weight"].append(weight)
+    return columns, errors
+
+
+def _frame_chunk(args):
+    """
+    Load a chunk of users into columns of every logged set, which are much
+    cheaper to send back from a worker than User objects
+
+    Args:
+        args: A tuple of a list of the users' directory names, the data
+            directory and the earliest history to load
+
+    Returns:
+        The columns and errors of the chunk, as returned by history_columns
+    """
+    return history_columns(load_chunk(args))
+
+
+# the pool options are the same ones load_users takes, passed through
+def map_chunks(  # pylint: disable=too-many-arguments
+    worker: Callable,
+    directory: str = "user_data",
+    names: List[str] = None,
+    *,
+    workers: int = None,
+    chunk_size: int = None,
+    since: date = None,
+):
+    """
+    Run a function over chunks of users across a process pool
+
+    Args:
+        worker: A picklable function taking a tuple of a list of the users'
+            directory names, the data directory and the earliest history to
+            load, like load_chunk
+        directory: A string representing the base directory of user data
+        names: A list of strings representing the users' directory names.
+            Defaults to every user found by discover_users
+        workers: An integer representing the number of worker processes.
+            Defaults to the number of CPUs
+        chunk_size: An integer representing how many users each worker
+            handles at a time. Defaults to about four chunks per worker
+        since: A datetime.date object representing the earliest routine
+            history needed, or None to only load history that hasn't been
+            archived
+
+    Yields:
+        What the function returns for each chunk, in chunk order
+    """
+    if names is None:
+        names = discover_users(directory)
+    chunks = _chunks(names, chunk_size, workers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(
+            worker, [(chunk, directory, since) for chunk in chunks]
+        )
+
+
+def load_users(
+    directory: str = "user_data",
+    workers: int = None,
+    chunk_size: int = None,
+    since: date = None,
+    names: List[str] = None,
+):
+    """
+    Load every user in parallel
+
+    Args:
+        directory: A string representing the base directory of user data
+        workers: An integer representing the number of worker processes.
+            Defaults to the number of CPUs
+        chunk_size: An integer representing how many users each worker loads
+            at a time. Defaults to about four chunks per worker
+        since: A datetime.date object representing the earliest routine
+            history needed, or None to only load history that hasn't been
+            archived
+        names: A list of strings representing the directory names of the
+            users to load. Defaults to every user
+
+    Yields:
+        Tuples of each user's directory name and either their User object or
+        the exception raised while loading it, in directory name order
+    """
+    for loaded in map_chunks(
+        load_chunk,
+        directory,
+        names,
+        workers=workers,
+        chunk_size=chunk_size,
+        since=since,
+    ):
+        yield from loaded
+
+
+def load_users_frame(
+    directory: str = "user_data",
+    workers: int = None,
+    chunk_size: int = None,
+    since: date = None,
+    names: List[str] = None,
+):
+    """
+    Load every logged set of every user in parallel into one long format
+    frame
+
+    Args:
+        directory: A string representing the base directory of user data
+        workers: An integer representing the number of worker processes.
+            Defaults to the number of CPUs
+        chunk_size: An integer representing how many users each worker loads
+            at a time. Defaults to about four chunks per worker
+        since: A datetime.date object representing the earliest routine
+            history needed, or None to only load history that hasn't been
+            archived
+        names: A list of strings representing the directory names of the
+            users to load. Defaults to every user
+
+    Returns:
+        A tuple of a pandas DataFrame with FRAME_COLUMNS and a row for each
+        logged set, and a dictionary mapping the directory name of each user
+        that couldn't be loaded to the exception raised
+    """
+    frames = []
+    errors = {}
+    for columns, chunk_errors in map_chunks(
+        _frame_chunk,
+        directory,
+        names,
+        workers=workers,
+        chunk_size=chunk_size,
+        since=since,
+    ):
+        frames.append(pd.DataFrame(columns, columns=FRAME_COLUMNS))
+        errors.update(chunk_errors)
+    if not frames:
+        return pd.DataFrame(columns=FRAME_COLUMNS), errors
+    frame = pd.concat(frames, ignore_index=True).astype(
+        {"User": "category", "Routine": "category", "Exercise": "category"}
+    )
+    return frame, errors
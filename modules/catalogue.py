@@ -0,0 +1,290 @@
+"""
+A canonical catalogue of exercises with integer ids shared by every user
+
+Every exercise name is mapped to an id after normalizing case, spacing and
+known aliases, so "Bench Press", "bench  press" and "BP" are all the same
+exercise. Ids are only ever appended, so an id means the same exercise for
+as long as the catalogue file is kept.
+
+The catalogue is saved as [directory]/catalogue.json in the form
+{"names": [canonical names in id order], "aliases": {alias: id}}
+
+The catalogue doesn't change how exercises are stored. Routine json and csv
+files keep the names the user typed, since they are the files /export hands
+back to the user and the routine history page shows as they are, and they
+have to stay readable without the catalogue. Ids are only used by snapshots,
+which are derived from those files, and canonical names only group the
+nightly stats. An exercise is given an id the first time its exercise_id is
+needed.
+"""
+import json
+import os
+import sys
+import threading
+import zlib
+from typing import Dict, List
+from .autocomplete import BUILTIN_EXERCISES, normalize
+from .storage import routine_json_paths
+
+BUILTIN_ALIASES = {
+    "BP": "Bench Press",
+    "Bench": "Bench Press",
+    "Flat Bench": "Bench Press",
+    "Squat": "Back Squat",
+    "DL": "Deadlift",
+    "RDL": "Romanian Deadlift",
+    "OHP": "Overhead Press",
+    "Military Press": "Overhead Press",
+    "Shoulder Press": "Overhead Press",
+    "Pullup": "Pull Up",
+    "Chinup": "Chin Up",
+    "Pushup": "Push Up",
+    "Skullcrusher": "Skull Crusher",
+}
+
+
+class ExerciseCatalogue:
+    """
+    The mapping between exercise names and their canonical ids
+
+    Attributes:
+        names: A list of interned strings representing the canonical name of
+            each exercise, where an exercise's id is its index in the list
+        aliases: A dictionary mapping normalized aliases to exercise ids
+    """
+
+    names: List[str]
+    aliases: Dict[str, int]
+    _ids: Dict[str, int]
+    _checksums: List[int]
+    _file_stat: tuple
+    _saved_size: tuple
+    _lock: threading.RLock
+
+    def __init__(self, names: List[str] = (), aliases: Dict[str, str] = None):
+        # shared by every request thread, which may add names at once
+        self._lock = threading.RLock()
+        self._clear()
+        self._file_stat = None
+        self._saved_size = None
+        for name in names:
+            self.id_for(name)
+        for alias, name in (aliases or {}).items():
+            self.add_alias(alias, name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _clear(self):
+        """
+        Remove every name and alias
+        """
+        self.names = []
+        self.aliases = {}
+        self._ids = {}
+        self._checksums = [0]
+
+    def lookup(self, name: str):
+        """
+        Find the id of an exercise name without adding it
+
+        Args:
+            name: A string representing the exercise name or an alias
+
+        Returns:
+            An integer representing the exercise id, or None if the name
+            isn't in the catalogue
+        """
+        key = normalize(name)
+        with self._lock:
+            exercise_id = self._ids.get(key)
+            if exercise_id is None:
+                exercise_id = self.aliases.get(key)
+        return exercise_id
+
+    def id_for(self, name: str):
+        """
+        Find the id of an exercise name, adding it as a new canonical
+        exercise if it isn't in the catalogue
+
+        Args:
+            name: A string representing the exercise name or an alias
+
+        Returns:
+            An integer representing the exercise id
+        """
+        with self._lock:
+            exercise_id = self.lookup(name)
+            if exercise_id is None:
+                exercise_id = len(self.names)
+                name = sys.intern(name.strip())
+                self.names.append(name)
+                self._ids[normalize(name)] = exercise_id
+                self._checksums.append(
+                    zlib.crc32(
+                        name.encode("UTF-8") + b"\0", self._checksums[-1]
+                    )
+                )
+        return exercise_id
+
+    def name(self, exercise_id: int):
+        """
+        Find the canonical name of an exercise
+
+        Args:
+            exercise_id: An integer representing the exercise id
+
+        Returns:
+            A string representing the canonical name
+        """
+        return self.names[exercise_id]
+
+    def canonical_name(self, name: str):
+        """
+        Find the canonical name for an exercise name or alias
+
+        Args:
+            name: A string representing the exercise name or an alias
+
+        Returns:
+            A string representing the canonical name, or the name itself if
+            it isn't in the catalogue
+        """
+        exercise_id = self.lookup(name)
+        return name if exercise_id is None else self.names[exercise_id]
+
+    def add_alias(self, alias: str, name: str):
+        """
+        Make an alias refer to an exercise
+
+        Args:
+            alias: A string representing the alternative name
+            name: A string representing the exercise name the alias refers to
+        """
+        key = normalize(alias)
+        with self._lock:
+            if key not in self._ids:
+                self.aliases[key] = self.id_for(name)
+
+    def checksum(self, count: int):
+        """
+        Find the checksum of the first names in the catalogue, used to check
+        that ids saved elsewhere still refer to the same names
+
+        Args:
+            count: An integer representing how many names to include
+
+        Returns:
+            An integer representing the CRC32 of the names, or None if the
+            catalogue has fewer names than count
+        """
+        if count >= len(self._checksums):
+            return None
+        return self._checksums[count]
+
+    def to_json_dict(self):
+        """
+        Convert the catalogue to the format saved in catalogue.json
+
+        Returns:
+            A dictionary with the list of names and the aliases
+        """
+        return {"names": self.names, "aliases": self.aliases}
+
+    def load(self, path: str):
+        """
+        Merge a saved catalogue into this one. Ids from the file take
+        priority, and names only known in memory are given new ids after
+        them. Does nothing if the file hasn't changed since it was last
+        loaded or saved
+
+        Args:
+            path: A string representing the path to catalogue.json
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if (stat.st_mtime_ns, stat.st_size) == self._file_stat:
+                return
+            with open(path, "r", encoding="UTF-8") as file:
+                json_dict = json.load(file)
+            names = self.names
+            aliases = {
+                alias: names[index] for alias, index in self.aliases.items()
+            }
+            self._clear()
+            for name in json_dict["names"]:
+                self.id_for(name)
+            self.aliases = {
+                alias: int(index)
+                for alias, index in json_dict["aliases"].items()
+            }
+            for name in names:
+                self.id_for(name)
+            for alias, name in aliases.items():
+                self.add_alias(alias, name)
+            self._file_stat = (stat.st_mtime_ns, stat.st_size)
+            self._saved_size = (
+                len(json_dict["names"]),
+                len(json_dict["aliases"]),
+            )
+
+    def save(self, path: str):
+        """
+        Save the catalogue, first merging in any names another process
+        saved. Does nothing if no names or aliases were added since it was
+        last loaded or saved
+
+        Args:
+            path: A string representing the path to catalogue.json
+        """
+        with self._lock:
+            self.load(path)
+            if self._saved_size == (len(self.names), len(self.aliases)):
+                return
+            with open(f"{path}.tmp", "w", encoding="UTF-8") as file:
+                json.dump(self.to_json_dict(), file)
+            os.replace(f"{path}.tmp", path)
+            stat = os.stat(path)
+            self._file_stat = (stat.st_mtime_ns, stat.st_size)
+            self._saved_size = (len(self.names), len(self.aliases))
+
+
+# shared by every exercise so the same name always has the same id
+CATALOGUE = ExerciseCatalogue(BUILTIN_EXERCISES, BUILTIN_ALIASES)
+
+
+def register_user_exercises(directory: str = "user_data"):
+    """
+    Add every exercise named in every user's routine json to the catalogue
+    and save it, so ids are shared by every process from the start. This
+    only registers names, no routine json or csv file is rewritten
+
+    Args:
+        directory: A string representing the base directory of user data
+
+    Returns:
+        A dictionary mapping each exercise name found to its id
+    """
+    path = f"{directory}/catalogue.json"
+    CATALOGUE.load(path)
+    mapping = {}
+    for routine_path in routine_json_paths(directory):
+        with open(routine_path, "r", encoding="UTF-8") as file:
+            json_dict = json.load(file)
+        if not isinstance(json_dict, dict):
+            continue
+        for item in json_dict.get("_exercises", {}).values():
+            mapping[item["_name"]] = CATALOGUE.id_for(item["_name"])
+    CATALOGUE.save(path)
+    return mapping
+
+
+if __name__ == "__main__":
+    for exercise_name, canonical_id in sorted(
+        register_user_exercises().items()
+    ):
+        canonical = CATALOGUE.name(canonical_id)
+        print(f"{canonical_id:>6} {canonical} <- {exercise_name}")
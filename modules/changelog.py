@@ -0,0 +1,259 @@
+"""
+A per-user log of changes for clients to sync from
+
+Every change to a user is appended to [USER_DIR]/changes.log numbered with
+the user's sync version, which only ever goes up. A client keeps the version
+it last synced to and asks for the changes after it, so a poll costs as much
+as the changes it returns rather than the size of the user's data. Unlike
+the journal, the log isn't emptied by checkpoints.
+
+Lines use the journal's format, with each record's arguments holding its
+version. Once the log holds more than MAX_CHANGES records it's compacted:
+records a later record overwrites, such as an older xp total or a set logged
+again for the same day, are dropped, then the oldest records until
+COMPACT_TO are left. The log's base is the version of the newest record
+dropped for age, and a client behind it has to fetch the full state again.
+A log changed by another process, such as a job recomputing xp, is read
+again before it's next used.
+"""
+
+import os
+from bisect import bisect_right
+from typing import List, Tuple
+from .journal import encode_record, read_records
+
+CHANGES_NAME = "changes.log"
+MAX_CHANGES = 2000
+COMPACT_TO = 1000
+
+
+def changes_path(user_dir: str):
+    """
+    Find the path of a user's change log
+
+    Args:
+        user_dir: A string representing the user's data directory
+
+    Returns:
+        A string representing the path to the change log file
+    """
+    return f"{user_dir}/{CHANGES_NAME}"
+
+
+def _overwrite_key(operation: str, args: dict):
+    """
+    Find what a change sets, so an older change setting the same thing can
+    be dropped
+
+    Args:
+        operation: A string representing the name of the operation
+        args: A dictionary of the operation's arguments
+
+    Returns:
+        A hashable key, or None if the change is never overwritten
+    """
+    if operation in ("set_xp", "set_schedule"):
+        return (operation,)
+    if operation == "log":
+        return (operation, args["routine"], args["exercise"], args["date"])
+    return None
+
+
+class ChangeLog:
+    """
+    An open change log, with its records held in memory to answer syncs
+
+    Attributes:
+        path: A string representing the path to the change log file
+        base: An integer representing the earliest version changes can be
+            listed after
+        version: An integer representing the version of the latest change
+    """
+
+    path: str
+    base: int
+    version: int
+
+    def __init__(self, path: str, base: int = 0):
+        self.path = path
+        self.base = base
+        self.version = base
+        self._versions: List[int] = []
+        self._records: List[Tuple[str, dict]] = []
+        self._file = None
+        self._file_stat = None
+
+    @classmethod
+    def open(cls, user_dir: str):
+        """
+        Open a user's change log, cutting off any partly written record at
+        the end
+
+        Args:
+            user_dir: A string representing the user's data directory
+
+        Returns:
+            A ChangeLog object
+        """
+        log = cls(changes_path(user_dir))
+        log._load()
+        return log
+
+    def _load(self):
+        """
+        Read the change log file into memory, replacing any records held,
+        and cut off any partly written record at the end
+        """
+        records, valid_size = read_records(self.path)
+        if (
+            os.path.exists(self.path)
+            and os.path.getsize(self.path) != valid_size
+        ):
+            os.truncate(self.path, valid_size)
+        self.base = self.version = 0
+        self._versions = []
+        self._records = []
+        for operation, args in records:
+            if operation == "base":
+                self.base = self.version = args["version"]
+                continue
+            args = dict(args)
+            self._add(args.pop("version"), operation, args)
+        self._file_stat = self._stat()
+
+    def _stat(self):
+        """
+        Identify the current contents of the change log file
+
+        Returns:
+            A tuple of the file's inode number and size, or None if it
+            doesn't exist
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size
+
+    def _refresh(self):
+        """
+        Read the log again if another process changed it since this one
+        last read or wrote it
+        """
+        if self._stat() == self._file_stat:
+            return
+        self.close()
+        self._load()
+
+    def _add(self, version: int, operation: str, args: dict):
+        """
+        Add a record to the records held in memory
+
+        Args:
+            version: An integer representing the record's version
+            operation: A string representing the name of the operation
+            args: A dictionary of the operation's arguments
+        """
+        self._versions.append(version)
+        self._records.append((operation, args))
+        self.version = version
+
+    def __len__(self):
+        return len(self._records)
+
+    def append(self, records: List[Tuple[str, dict]]):
+        """
+        Append records, each with the next version, and sync them to disk
+        with a single write
+
+        Args:
+            records: A list of (operation, args) tuples
+        """
+        self._refresh()
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # kept open between appends so each one is a single write
+            # pylint: disable=consider-using-with
+            self._file = open(self.path, "ab")
+        lines = []
+        for operation, args in records:
+            version = self.version + 1
+            lines.append(encode_record(operation, {**args, "version": version}))
+            self._add(version, operation, args)
+        self._file.write(b"".join(lines))
+        self._file.flush()
+        # a version handed to a client must never be reused after a crash
+        os.fsync(self._file.fileno())
+        self._file_stat = self._stat()
+        if len(self) > MAX_CHANGES:
+            self.compact()
+
+    def changes_since(self, version: int, limit: int = None):
+        """
+        List the changes after a version
+
+        Args:
+            version: An integer representing the version the client last
+                synced to
+            limit: An integer representing the most changes to list, or None
+                for every change
+
+        Returns:
+            A list of (version, operation, args) tuples in order, or None if
+            the log can't tell what changed since that version and the
+            client has to fetch the full state
+        """
+        self._refresh()
+        if version < self.base or version > self.version:
+            return None
+        start = bisect_right(self._versions, version)
+        end = len(self) if limit is None else start + limit
+        return [
+            (self._versions[index], *self._records[index])
+            for index in range(start, min(end, len(self)))
+        ]
+
+    def compact(self, keep: int = COMPACT_TO):
+        """
+        Drop overwritten records, then the oldest records, and rewrite the
+        log
+
+        Args:
+            keep: An integer representing the most records to keep
+        """
+        seen = set()
+        kept = []
+        for index in range(len(self) - 1, -1, -1):
+            key = _overwrite_key(*self._records[index])
+            if key is not None and key in seen:
+                continue
+            seen.add(key)
+            kept.append(index)
+        kept.reverse()
+        if len(kept) > keep:
+            self.base = self._versions[kept[-keep - 1]]
+            kept = kept[-keep:] if keep else []
+        self._versions = [self._versions[index] for index in kept]
+        self._records = [self._records[index] for index in kept]
+
+        self.close()
+        with open(f"{self.path}.tmp", "wb") as file:
+            file.write(encode_record("base", {"version": self.base}))
+            file.write(
+                b"".join(
+                    encode_record(operation, {**args, "version": version})
+                    for version, (operation, args) in zip(
+                        self._versions, self._records
+                    )
+                )
+            )
+        os.replace(f"{self.path}.tmp", self.path)
+        self._file_stat = self._stat()
+
+    def close(self):
+        """
+        Close the change log file
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,149 @@
+"""
+Progression chart data for an exercise, downsampled for plotting
+
+An exercise can have thousands of sessions, far more points than a chart is
+pixels wide. Each series is downsampled with Largest-Triangle-Three-Buckets
+(LTTB), which keeps the points that shape the line, so a chart's payload is
+bounded by its width however long the history grows.
+"""
+from datetime import date
+import numpy as np
+from .fragments import FragmentCache
+from .workouts import Exercise, weight_value
+
+MAX_CHARTS = 256
+SERIES = ("max_weight", "volume", "estimated_1rm")
+
+# keyed by the user's data version, so charts of changed users are never hit
+CHART_CACHE = FragmentCache(MAX_CHARTS)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int):
+    """
+    Choose the points that best keep a line's shape with
+    Largest-Triangle-Three-Buckets
+
+    The first and last points are always kept. The points between are split
+    into threshold - 2 buckets and from each bucket the point making the
+    largest triangle with the point kept from the previous bucket and the
+    average of the next bucket is kept.
+
+    Args:
+        x: A sorted numpy array of the x values
+        y: A numpy array of the y values
+        threshold: An integer representing the number of points to keep
+
+    Returns:
+        A numpy array of the indices of the points kept, in order
+    """
+    length = len(x)
+    if threshold >= length or threshold < 3:
+        return np.arange(length)
+    bounds = np.append(
+        (np.arange(threshold - 1) * (length - 2) / (threshold - 2)).astype(int)
+        + 1,
+        length,
+    )
+    indices = np.empty(threshold, dtype=np.intp)
+    indices[0] = 0
+    indices[-1] = length - 1
+    kept = 0
+    for bucket in range(threshold - 2):
+        start, stop = bounds[bucket], bounds[bucket + 1]
+        next_x = x[stop : bounds[bucket + 2]].mean()
+        next_y = y[stop : bounds[bucket + 2]].mean()
+        areas = np.abs(
+            (x[kept] - next_x) * (y[start:stop] - y[kept])
+            - (x[kept] - x[start:stop]) * (next_y - y[kept])
+        )
+        kept = start + int(np.argmax(areas))
+        indices[bucket + 1] = kept
+    return indices
+
+
+def exercise_series(exercise: Exercise, reps: int):
+    """
+    Build an exercise's progression series over every session with a
+    logged set
+
+    Args:
+        exercise: An Exercise object
+        reps: An integer representing the reps done in each set, used to
+            estimate the one rep max
+
+    Returns:
+        A tuple of a numpy array of the session dates as ordinals and a
+        dictionary mapping each of SERIES to a numpy array of its values
+    """
+    days = sorted(exercise.history)
+    sets = max((len(exercise.history[day]) for day in days), default=0)
+    weights = np.full((len(days), sets), np.nan)
+    for row, day in enumerate(days):
+        session = exercise.history[day]
+        weights[row, : len(session)] = session
+    logged = ~np.isnan(weights).all(axis=1)
+    weights = weights[logged]
+    x = np.array(
+        [date.fromisoformat(day).toordinal() for day in days], dtype=float
+    )[logged]
+    max_weight = np.nanmax(weights, axis=1) if len(weights) else np.empty(0)
+    return x, {
+        "max_weight": max_weight,
+        "volume": np.nansum(weights, axis=1),
+        # Epley's formula
+        "estimated_1rm": max_weight * (1 + reps / 30),
+    }
+
+
+def chart_data(exercise: Exercise, width: int, reps: int = 5):
+    """
+    Build an exercise's progression series downsampled to a chart's width
+
+    Args:
+        exercise: An Exercise object
+        width: An integer representing the width of the chart in pixels,
+            the most points each series keeps
+        reps: An integer representing the reps done in each set, used to
+            estimate the one rep max
+
+    Returns:
+        A dictionary mapping each of SERIES to a list of [date, value]
+        pairs, with dates in ISO format
+    """
+    x, series = exercise_series(exercise, reps)
+    chart = {}
+    for name, y in series.items():
+        indices = lttb(x, y, width)
+        chart[name] = [
+            [
+                date.fromordinal(int(x[index])).isoformat(),
+                weight_value(round(float(y[index]), 1)),
+            ]
+            for index in indices
+        ]
+    return chart
+
+
+def cached_chart_data(
+    user, routine_name: str, exercise: Exercise, width: int, reps: int = 5
+):
+    """
+    Look up an exercise's chart data, building it the first time it's asked
+    for at this width since the user's data last changed
+
+    Args:
+        user: The User object the exercise belongs to
+        routine_name: A string representing the routine the exercise is in
+        exercise: An Exercise object
+        width: An integer representing the width of the chart in pixels
+        reps: An integer representing the reps done in each set
+
+    Returns:
+        The chart data, as returned by chart_data
+    """
+    key = (user.version, routine_name, exercise.name, width, reps)
+    chart = CHART_CACHE.get(key)
+    if chart is None:
+        chart = chart_data(exercise, width, reps)
+        CHART_CACHE.set(key, chart)
+    return chart
@@ -49,3 +49,27 @@ def get_week(today=str(datetime.date.today())):
     ]
     week_dates.append(today)
     return week_dates
+
+
+def get_date_range(day: datetime.date, period: str = "week"):
+    """
+    Find the first and last day of the week or month containing a day.
+
+    Args:
+        day: a datetime.date object representing a day in the period.
+        period: a string, either "week" or "month", representing the length
+            of the period.
+    Returns:
+        A tuple of two datetime.date objects representing the first and last
+        day of the period, inclusive.
+    Raises:
+        ValueError: period is not "week" or "month".
+    """
+    if period == "week":
+        start = day - datetime.timedelta(days=day.weekday())
+        return start, start + datetime.timedelta(days=6)
+    if period == "month":
+        start = day.replace(day=1)
+        next_month = (start + datetime.timedelta(days=32)).replace(day=1)
+        return start, next_month - datetime.timedelta(days=1)
+    raise ValueError("Period must be either 'week' or 'month'.")
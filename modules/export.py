@@ -0,0 +1,270 @@
+"""
+Streaming exports of a user's data
+
+Exports are generators of byte chunks, so a response can be sent while it's
+being built without ever holding a whole file or archive in memory.
+"""
+import csv
+import gzip
+import io
+import math
+import os
+import zipfile
+from typing import Iterable, List, Tuple
+from .archive import ArchiveMeta, archive_path, meta_path
+from .history_codec import log_codec, read_log
+from .snapshot import source_files
+from .workouts import to_weight, weight_value
+
+CHUNK_SIZE = 64 * 1024
+LONG_CSV_HEADER = ("Date", "Routine", "Exercise", "Set", "Weight")
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """
+    An unseekable file that keeps what's written to it until it's taken, so
+    zipfile can write an archive straight into a stream
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        """
+        Remove everything written so far
+
+        Returns:
+            The bytes written since the last call
+        """
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def read_chunks(path: str, chunk_size: int = CHUNK_SIZE):
+    """
+    Read a file in chunks
+
+    Args:
+        path: A string representing the path to the file
+        chunk_size: An integer representing the most bytes per chunk
+
+    Yields:
+        The file's contents as bytes, one chunk at a time
+    """
+    with open(path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            yield chunk
+
+
+def log_chunks(path: str, chunk_size: int = CHUNK_SIZE):
+    """
+    Read a routine's csv log in chunks as a csv file, decoding it if it's
+    encoded by history_codec
+
+    Args:
+        path: A string representing the path to the csv log
+        chunk_size: An integer representing the most bytes per chunk of a
+            plain csv log
+
+    Yields:
+        The csv file as bytes, one chunk at a time
+    """
+    if log_codec(path) == "csv":
+        yield from read_chunks(path, chunk_size)
+    else:
+        yield read_log(path).to_csv().encode("UTF-8")
+
+
+def _open_log(csv_path: str):
+    """
+    Open a routine's csv log or archive as a text file
+
+    Args:
+        csv_path: A string representing the path to the csv log, which may
+            be encoded by history_codec, or a gzip compressed archive
+
+    Returns:
+        A file object reading the log as csv text
+    """
+    if csv_path.endswith(".gz"):
+        return gzip.open(csv_path, "rt", encoding="UTF-8", newline="")
+    if log_codec(csv_path) != "csv":
+        # encoded logs are decoded whole, they're small next to the csv
+        return io.StringIO(read_log(csv_path).to_csv(), newline="")
+    return open(csv_path, "r", encoding="UTF-8", newline="")
+
+
+def stream_zip(entries: Iterable[Tuple[str, Iterable[bytes]]]):
+    """
+    Build a zip archive as a stream
+
+    Args:
+        entries: An iterable of tuples of a string representing the name of
+            the file in the archive and an iterable of its contents as bytes
+
+    Yields:
+        The archive as bytes, one chunk at a time
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, chunks in entries:
+            with archive.open(name, "w", force_zip64=True) as file:
+                for chunk in chunks:
+                    file.write(chunk)
+                    if data := buffer.take():
+                        yield data
+            if data := buffer.take():
+                yield data
+    # the central directory is written when the archive closes
+    yield buffer.take()
+
+
+def user_export_files(user, user_dir: str, picture_path: str):
+    """
+    List the files that make up a user's export
+
+    Snapshots and the history store are derived from these files, so they
+    aren't included.
+
+    Args:
+        user: A User object whose files to list
+        user_dir: A string representing the user's data directory
+        picture_path: A string representing the path to the user's profile
+            picture
+
+    Returns:
+        A list of tuples of a string representing the path to each file that
+        exists and a string representing its name in the export
+    """
+    name_no_spaces = user.name.replace(" ", "_")
+    files = [
+        (f"{user_dir}/{file}", file)
+        for file in source_files(name_no_spaces, list(user.routines))
+    ]
+    for csv_path in routine_log_paths(list(user.routines), user_dir):
+        meta = ArchiveMeta.read(csv_path)
+        if meta is not None:
+            for path in [meta_path(csv_path)] + [
+                archive_path(csv_path, year) for year in meta.years
+            ]:
+                files.append((path, os.path.relpath(path, user_dir)))
+    files.append((picture_path, os.path.basename(picture_path)))
+    return [(path, name) for path, name in files if os.path.isfile(path)]
+
+
+def stream_user_zip(user, user_dir: str, picture_path: str):
+    """
+    Stream a zip archive of a user's json, routine logs and profile picture
+
+    Args:
+        user: A User object whose data to export
+        user_dir: A string representing the user's data directory
+        picture_path: A string representing the path to the user's profile
+            picture
+
+    Yields:
+        The archive as bytes, one chunk at a time
+    """
+    return stream_zip(
+        (
+            name,
+            log_chunks(path) if path.endswith(".csv") else read_chunks(path),
+        )
+        for path, name in user_export_files(user, user_dir, picture_path)
+    )
+
+
+def routine_log_paths(routine_names: List[str], user_dir: str):
+    """
+    Find the csv log of each routine
+
+    Args:
+        routine_names: A list of strings representing the user's routines
+        user_dir: A string representing the user's data directory
+
+    Returns:
+        A list of strings representing the path to each routine's csv log
+    """
+    return [
+        f"{user_dir}/{name}/{name}.csv"
+        for name in (name.replace(" ", "_") for name in routine_names)
+    ]
+
+
+def long_csv_rows(routine_name: str, csv_path: str):
+    """
+    Read a routine's csv log or archive one row at a time as long format rows
+
+    Args:
+        routine_name: A string representing the name of the routine
+        csv_path: A string representing the path to the routine's csv log,
+            which may be encoded by history_codec, or a gzip compressed
+            archive
+
+    Yields:
+        Tuples of the date, routine name, exercise name, set number and
+        weight of every logged set
+    """
+    with _open_log(csv_path) as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if header is None:
+            return
+        days = header[3:]
+        for row in reader:
+            exercise_name, set_number = row[1], row[2]
+            for day, weight in zip(days, row[3:]):
+                # pandas writes whole weights as floats when a day has gaps
+                weight = to_weight(weight)
+                if not math.isnan(weight):
+                    weight = weight_value(weight)
+                    yield day, routine_name, exercise_name, set_number, weight
+
+
+def stream_long_csv(
+    routine_names: List[str], user_dir: str, rows_per_chunk: int = 1000
+):
+    """
+    Stream every routine log of a user, including archived history, merged
+    into one long format csv with a row for each logged set
+
+    Args:
+        routine_names: A list of strings representing the user's routines
+        user_dir: A string representing the user's data directory
+        rows_per_chunk: An integer representing how many rows to write
+            before yielding a chunk
+
+    Yields:
+        The csv as bytes, one chunk at a time
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(LONG_CSV_HEADER)
+    rows = 0
+    for routine_name, csv_path in zip(
+        routine_names, routine_log_paths(routine_names, user_dir)
+    ):
+        if not os.path.isfile(csv_path):
+            continue
+        meta = ArchiveMeta.read(csv_path)
+        paths = [] if meta is None else [
+            archive_path(csv_path, year) for year in meta.years
+        ]
+        for path in paths + [csv_path]:
+            for row in long_csv_rows(routine_name, path):
+                writer.writerow(row)
+                rows += 1
+                if rows % rows_per_chunk == 0:
+                    yield buffer.getvalue().encode("UTF-8")
+                    buffer.seek(0)
+                    buffer.truncate()
+    yield buffer.getvalue().encode("UTF-8")
@@ -0,0 +1,158 @@
+"""
+Caching of rendered template fragments and compiled templates
+
+Templates wrap the parts of a page built from a user's data in a cache tag
+keyed by the user's data version:
+    {% cache "plan-routines", data_version %} ... {% endcache %}
+The first render stores the fragment's html and every later render for the
+same key is a dictionary lookup. Any change to the user gives them a new
+version, so stale fragments are never looked up again and age out of the
+cache.
+"""
+import os
+import threading
+from collections import OrderedDict
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+MAX_FRAGMENTS = 512
+BYTECODE_CACHE_DIR = "cache/jinja"
+
+
+class FragmentCache:
+    """
+    A least recently used cache of rendered template fragments, safe to
+    share between request threads
+
+    Attributes:
+        max_entries: An integer representing how many fragments to keep
+        hits: An integer representing how many lookups found a fragment
+        misses: An integer representing how many lookups had to render one
+    """
+
+    max_entries: int
+    hits: int
+    misses: int
+
+    def __init__(self, max_entries: int = MAX_FRAGMENTS):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._fragments = OrderedDict()
+        # a lookup moves its entry, so even reads change the order
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._fragments)
+
+    def get(self, key: tuple):
+        """
+        Look up a rendered fragment
+
+        Args:
+            key: A tuple of the fragment's name and what it depends on
+
+        Returns:
+            The rendered html as a string, or None if it isn't cached
+        """
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._fragments.move_to_end(key)
+            return fragment
+
+    def set(self, key: tuple, fragment: str):
+        """
+        Store a rendered fragment, evicting the least recently used one if
+        the cache is full
+
+        Args:
+            key: A tuple of the fragment's name and what it depends on
+            fragment: A string representing the rendered html
+        """
+        with self._lock:
+            self._fragments[key] = fragment
+            self._fragments.move_to_end(key)
+            while len(self._fragments) > self.max_entries:
+                self._fragments.popitem(last=False)
+
+    def items(self):
+        """
+        Take a snapshot of the cached fragments, so they can be read without
+        holding the lock while other threads keep using the cache
+
+        Returns:
+            A list of tuples of each fragment's key and rendered html, least
+            recently used first
+        """
+        with self._lock:
+            return list(self._fragments.items())
+
+    def clear(self):
+        """
+        Remove every cached fragment
+        """
+        with self._lock:
+            self._fragments.clear()
+
+
+FRAGMENT_CACHE = FragmentCache()
+
+
+class FragmentCacheExtension(Extension):
+    """
+    A Jinja extension adding the {% cache key, ... %} tag, which renders its
+    body once per key and reuses the html from the environment's
+    fragment_cache afterwards
+    """
+
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=FRAGMENT_CACHE)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_render_cached", [nodes.List(key)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render_cached(self, key: list, caller):
+        """
+        Return a fragment's cached html, rendering and storing it first if
+        it isn't cached
+
+        Args:
+            key: A list of the fragment's name and what it depends on
+            caller: A function rendering the body of the cache tag
+        """
+        cache = self.environment.fragment_cache
+        key = tuple(key)
+        fragment = cache.get(key)
+        if fragment is None:
+            fragment = caller()
+            cache.set(key, fragment)
+        return fragment
+
+
+def template_bytecode_cache(directory: str = BYTECODE_CACHE_DIR):
+    """
+    Create a cache that keeps compiled templates on disk, so a new worker
+    loads them instead of compiling every template again
+
+    Args:
+        directory: A string representing the directory to keep them in
+
+    Returns:
+        A jinja2.FileSystemBytecodeCache object
+    """
+    os.makedirs(directory, exist_ok=True)
+    return FileSystemBytecodeCache(directory)
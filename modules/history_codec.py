@@ -0,0 +1,376 @@
+"""
+A compact binary encoding of routine logs
+
+The csv log repeats every date as a column for every exercise, writes each
+weight as decimal text and leaves an empty cell for every exercise not done
+that day. The encoded log stores each exercise's sessions on their own:
+    dates as the gap in days since the previous session
+    weights as whole numbers of the plate increment that divides every
+        weight exactly, each as the change from the same set's weight in the
+        previous session, so a steady program is mostly zeros
+    which sets were logged as a bitmap
+and compresses the result with zlib or lzma.
+
+An encoded log keeps the log's .csv path so nothing else about a user's
+files changes. read_log tells the two formats apart by the MAGIC bytes an
+encoded log starts with, so either can be read wherever a log is.
+"""
+
+import io
+import lzma
+import os
+import struct
+import zlib
+import numpy as np
+import pandas as pd
+
+MAGIC = b"LTRH"
+FORMAT_VERSION = 1
+CODECS = {"zlib": 1, "lzma": 2}
+# the codec export_log writes with, "csv" for the plain csv log
+HISTORY_CODEC = os.environ.get("LTRAC_HISTORY_CODEC", "csv")
+# tried largest first, a log whose weights no increment divides stores them
+# as 64 bit floats instead
+PLATE_INCREMENTS = (5.0, 2.5, 1.25, 1.0, 0.5, 0.25, 0.125, 0.1, 0.05, 0.01)
+
+_HEADER = struct.Struct("<4sBB")
+_INCREMENT = struct.Struct("<d")
+_COUNT = struct.Struct("<H")
+_DAYS = struct.Struct("<Ii")
+_EXERCISE = struct.Struct("<HHI")
+
+
+def _compress(codec: str, data: bytes):
+    """
+    Compress a payload with a codec
+
+    Args:
+        codec: A string representing the codec, a key of CODECS
+        data: The bytes to compress
+
+    Returns:
+        The compressed bytes
+    """
+    if codec == "lzma":
+        return lzma.compress(data, preset=6)
+    return zlib.compress(data, 9)
+
+
+def _plate_increment(weights: np.ndarray):
+    """
+    Find the largest plate increment every weight is a whole number of
+
+    Args:
+        weights: A numpy array of the logged weights, without NaN
+
+    Returns:
+        A float representing the increment, or 0.0 if none divides them all
+    """
+    for increment in PLATE_INCREMENTS:
+        plates = np.round(weights / increment)
+        if np.allclose(plates * increment, weights, rtol=0, atol=1e-6):
+            return increment
+    return 0.0
+
+
+class _Reader:
+    """
+    Reads values back out of an encoded log's payload in order
+    """
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offset = 0
+
+    def unpack(self, packer: struct.Struct):
+        """
+        Read values packed with a struct
+        """
+        values = packer.unpack_from(self.data, self.offset)
+        self.offset += packer.size
+        return values
+
+    def read(self, size: int):
+        """
+        Read raw bytes
+        """
+        value = self.data[self.offset : self.offset + size]
+        self.offset += size
+        return value
+
+    def array(self, dtype, count: int):
+        """
+        Read a numpy array of a number of values, without copying them
+        """
+        values = np.frombuffer(self.data, dtype, count, self.offset)
+        self.offset += values.nbytes
+        return values
+
+
+def _write_exercise(
+    payload: io.BytesIO, name: str, sets: np.ndarray, increment: float
+):
+    """
+    Encode the sessions of one exercise
+
+    Args:
+        payload: An io.BytesIO object to write the encoded exercise to
+        name: A string representing the name of the exercise
+        sets: A numpy array of the exercise's weights, with a row per day of
+            the log and a column per set
+        increment: A float representing the plate increment weights are
+            stored as whole numbers of, or 0.0 to store them as floats
+    """
+    # only the days the exercise was logged
+    sessions = np.flatnonzero(~np.isnan(sets).all(axis=1))
+    sets = sets[sessions]
+    encoded_name = name.encode("UTF-8")
+    payload.write(
+        _EXERCISE.pack(len(encoded_name), sets.shape[1], len(sessions))
+    )
+    payload.write(encoded_name)
+    payload.write(np.diff(sessions, prepend=0).astype("<i4").tobytes())
+    payload.write(np.packbits(np.isnan(sets)).tobytes())
+    if increment:
+        # an unlogged set repeats the set's last weight, a zero change
+        plates = (
+            pd.DataFrame(np.round(sets / increment))
+            .ffill()
+            .fillna(0)
+            .to_numpy()
+        )
+        payload.write(
+            np.diff(plates, axis=0, prepend=0).astype("<i4").tobytes()
+        )
+    else:
+        payload.write(sets.astype("<f8").tobytes())
+
+
+def encode_log(log_df: pd.DataFrame, codec: str = "zlib"):
+    """
+    Encode a routine log
+
+    Args:
+        log_df: A pandas DataFrame in the csv log format
+        codec: A string representing the codec to compress with, a key of
+            CODECS
+
+    Returns:
+        The encoded log as bytes
+    """
+    days = list(log_df.columns[2:])
+    ordinals = np.array(
+        [pd.Timestamp(day).toordinal() for day in days], dtype=np.int32
+    )
+    order = np.argsort(ordinals, kind="stable")
+    ordinals = ordinals[order]
+    weights = (
+        log_df[days]
+        .apply(pd.to_numeric, errors="coerce")
+        .to_numpy(dtype=float)[:, order]
+    )
+    logged = weights[~np.isnan(weights)]
+    increment = _plate_increment(logged) if len(logged) else 1.0
+
+    payload = io.BytesIO()
+    payload.write(_INCREMENT.pack(increment))
+    payload.write(
+        _DAYS.pack(len(ordinals), int(ordinals[0]) if len(ordinals) else 0)
+    )
+    payload.write(np.diff(ordinals).astype("<i4").tobytes())
+    # a routine without exercises exports a log without any columns
+    exercises = log_df["Exercise"].tolist() if len(log_df.columns) else []
+    names = list(dict.fromkeys(exercises))
+    payload.write(_COUNT.pack(len(names)))
+    for name in names:
+        rows = [
+            row for row, exercise in enumerate(exercises) if exercise == name
+        ]
+        _write_exercise(payload, name, weights[rows].T, increment)
+
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, CODECS[codec])
+    return header + _compress(codec, payload.getvalue())
+
+
+def _decompress_payload(data: bytes):
+    """
+    Check an encoded log's header and decompress its payload
+
+    Args:
+        data: The encoded log as bytes
+
+    Returns:
+        The payload as bytes
+
+    Raises:
+        ValueError: The data isn't an encoded log of a version this reads
+    """
+    magic, version, codec = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("Not an encoded routine log")
+    body = data[_HEADER.size :]
+    if codec == CODECS["lzma"]:
+        return lzma.decompress(body)
+    return zlib.decompress(body)
+
+
+def _read_days(reader: _Reader):
+    """
+    Decode the days of a log
+
+    Args:
+        reader: A _Reader object positioned at the days
+
+    Returns:
+        A list of strings representing the days in ISO format, in order
+    """
+    day_count, first = reader.unpack(_DAYS)
+    gaps = reader.array("<i4", max(day_count - 1, 0))
+    ordinals = np.concatenate(([first], first + np.cumsum(gaps)))[:day_count]
+    return [
+        pd.Timestamp.fromordinal(int(day)).date().isoformat()
+        for day in ordinals
+    ]
+
+
+def _read_exercise(reader: _Reader, increment: float, day_count: int):
+    """
+    Decode the sessions of one exercise
+
+    Args:
+        reader: A _Reader object positioned at the exercise
+        increment: A float representing the plate increment weights are
+            stored as whole numbers of, or 0.0 if they're stored as floats
+        day_count: An integer representing the number of days in the log
+
+    Returns:
+        A tuple of a string representing the exercise's name and a numpy
+        array of its weights, with a row per set and a column per day
+    """
+    name_size, sets, session_count = reader.unpack(_EXERCISE)
+    name = reader.read(name_size).decode("UTF-8")
+    sessions = np.cumsum(reader.array("<i4", session_count))
+    cells = session_count * sets
+    missing = np.unpackbits(
+        reader.array(np.uint8, (cells + 7) // 8), count=cells
+    ).astype(bool)
+    if increment:
+        changes = reader.array("<i4", cells).reshape(session_count, sets)
+        values = np.cumsum(changes, axis=0) * increment
+    else:
+        values = reader.array("<f8", cells).reshape(session_count, sets)
+    values = np.where(missing.reshape(session_count, sets), np.nan, values)
+
+    block = np.full((sets, day_count), np.nan)
+    block[:, sessions] = values.T
+    return name, block
+
+
+def _build_frame(days: list, exercises: list):
+    """
+    Build a log in the csv log format from decoded exercises
+
+    Args:
+        days: A list of strings representing the log's days in ISO format
+        exercises: A list of tuples of each exercise's name and weights, as
+            returned by _read_exercise
+
+    Returns:
+        A pandas DataFrame in the csv log format
+    """
+    if exercises:
+        weights = np.vstack([block for _, block in exercises])
+    else:
+        weights = np.empty((0, len(days)))
+    log_df = pd.DataFrame(weights, columns=days)
+    log_df.insert(
+        0, "Exercise", [name for name, block in exercises for _ in block]
+    )
+    log_df.insert(
+        1,
+        "Set",
+        [
+            number
+            for _, block in exercises
+            for number in range(1, len(block) + 1)
+        ],
+    )
+    return log_df
+
+
+def decode_log(data: bytes):
+    """
+    Decode a routine log
+
+    Args:
+        data: The encoded log as bytes
+
+    Returns:
+        A pandas DataFrame in the csv log format
+
+    Raises:
+        ValueError: The data isn't an encoded log of a version this reads
+    """
+    reader = _Reader(_decompress_payload(data))
+    (increment,) = reader.unpack(_INCREMENT)
+    days = _read_days(reader)
+    (exercise_count,) = reader.unpack(_COUNT)
+    exercises = [
+        _read_exercise(reader, increment, len(days))
+        for _ in range(exercise_count)
+    ]
+    return _build_frame(days, exercises)
+
+
+def log_codec(path: str):
+    """
+    Find how a routine log is stored
+
+    Args:
+        path: A string representing the path to the log
+
+    Returns:
+        A string, "csv" for a plain csv log or the codec of an encoded log
+    """
+    with open(path, "rb") as file:
+        header = file.read(_HEADER.size)
+    if len(header) < _HEADER.size or not header.startswith(MAGIC):
+        return "csv"
+    codec = header[-1]
+    return next(name for name, value in CODECS.items() if value == codec)
+
+
+def read_log(path: str):
+    """
+    Read a routine log, whether it's a csv log or encoded
+
+    Args:
+        path: A string representing the path to the log
+
+    Returns:
+        A pandas DataFrame in the csv log format
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    if data.startswith(MAGIC):
+        return decode_log(data)
+    return pd.read_csv(io.BytesIO(data), index_col=0)
+
+
+def write_log(log_df: pd.DataFrame, path: str, codec: str = None):
+    """
+    Write a routine log as a csv log or encoded
+
+    Args:
+        log_df: A pandas DataFrame in the csv log format
+        path: A string representing the path to write
+        codec: A string representing how to store the log, "csv" or a key
+            of CODECS. Defaults to HISTORY_CODEC
+    """
+    if codec is None:
+        codec = HISTORY_CODEC
+    if codec == "csv":
+        log_df.to_csv(path)
+        return
+    with open(path, "wb") as file:
+        file.write(encode_log(log_df, codec))
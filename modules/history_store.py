@@ -0,0 +1,510 @@
+"""
+Memory-mapped columnar storage of a user's workout history
+
+Every logged set is one row across four fixed-width column files:
+    date: the day the set was logged as a date ordinal (int32)
+    exercise: the id of the exercise (int32), indexing exercises.json,
+        where each exercise is stored as "[ROUTINE_NAME]/[EXERCISE_NAME]"
+    set: the set number, starting at 1 (uint8)
+    weight: the weight used (float32), NaN if the set wasn't logged
+
+Rows in the main segment are sorted by date, so date ranges are found with a
+binary search and read as slices of the memory map without copying. New rows
+are appended to a small unsorted tail segment, which is merged into the main
+segment once it holds more than TAIL_ROWS rows so appending and querying
+never cost more than the tail.
+
+A store is built from a user's history the first time it's opened, including
+sessions archived from their csv logs, and kept in the history directory of
+the user's data directory. The app appends every session logged after that.
+
+Logging an exercise again on the same day appends its sets again, like the
+csv log overwriting the day. The row appended last for each date, exercise
+and set replaces any earlier ones, both when querying and when compacting.
+"""
+
+import json
+import os
+from datetime import date
+from typing import Dict, List
+import numpy as np
+from .archive import ArchiveMeta
+from .workouts import Exercise, Routine
+
+COLUMNS = {
+    "date": np.dtype("<i4"),
+    "exercise": np.dtype("<i4"),
+    "set": np.dtype("u1"),
+    "weight": np.dtype("<f4"),
+}
+MAIN = "main"
+TAIL = "tail"
+# the most rows the tail segment holds before it's merged into the main one
+TAIL_ROWS = 4096
+
+
+def _row_keys(rows: Dict[str, np.ndarray]):
+    """
+    Combine the date, exercise and set of each row into a single integer, so
+    rows for the same set on the same day have the same key
+
+    Args:
+        rows: A dictionary mapping each column name to an array of values
+
+    Returns:
+        A numpy array of 64 bit integers, one for each row
+    """
+    return (
+        (rows["date"].astype(np.int64) << 32)
+        | (rows["exercise"].astype(np.int64) << 8)
+        | rows["set"].astype(np.int64)
+    )
+
+
+def _latest_rows(rows: Dict[str, np.ndarray]):
+    """
+    Drop every row a later row with the same key replaces
+
+    Args:
+        rows: A dictionary mapping each column name to an array of values
+
+    Returns:
+        A dictionary mapping each column name to an array of values, in the
+        same order as the rows kept
+    """
+    keys = _row_keys(rows)
+    _, last = np.unique(keys[::-1], return_index=True)
+    if len(last) == len(keys):
+        return rows
+    keep = np.sort(len(keys) - 1 - last)
+    return {column: values[keep] for column, values in rows.items()}
+
+
+def _add_sets(rows: Dict[str, list], ordinal: int, exercise_id: int, weights):
+    """
+    Add a row for every set of an exercise logged on a day
+
+    Args:
+        rows: A dictionary mapping each column name to a list of values
+        ordinal: An integer representing the day as a date ordinal
+        exercise_id: An integer representing the exercise's store id
+        weights: An array of floats representing the weight of each set
+    """
+    for set_number, weight in enumerate(weights, start=1):
+        rows["date"].append(ordinal)
+        rows["exercise"].append(exercise_id)
+        rows["set"].append(set_number)
+        rows["weight"].append(weight)
+
+
+def _archived_history(routine: Routine, user_dir: str):
+    """
+    Read every session archived from a routine's csv log, which loading a
+    user leaves out
+
+    Args:
+        routine: A Routine object
+        user_dir: A string representing the user's data directory
+
+    Returns:
+        A dictionary mapping exercise names to dictionaries mapping ISO dates
+        to the weights logged, empty if nothing is archived
+    """
+    routine_name_no_spaces = routine.name.replace(" ", "_")
+    csv_path = (
+        f"{user_dir}/{routine_name_no_spaces}/{routine_name_no_spaces}.csv"
+    )
+    archive = ArchiveMeta.read(csv_path)
+    if archive is None:
+        return {}
+    # a copy of the routine's exercises to load the whole log into
+    full = Routine(routine.name)
+    for exercise in routine.exercises.values():
+        full.add_exercise(Exercise(exercise.name, exercise.sets))
+    full.load_log(csv_path, date.min)
+    archived_days = set(archive.days)
+    return {
+        name: {
+            day: weights
+            for day, weights in exercise.history.items()
+            if day in archived_days
+        }
+        for name, exercise in full.exercises.items()
+    }
+
+
+def _without_replaced(rows: Dict[str, np.ndarray], tail: Dict[str, np.ndarray]):
+    """
+    Drop the rows of the main segment that rows of the tail segment replace
+
+    Only the main rows between the tail's first and last dates are checked,
+    and the rows are only copied if some are dropped.
+
+    Args:
+        rows: A dictionary mapping each column name to an array of rows of
+            the main segment, sorted by date
+        tail: A dictionary mapping each column name to an array of rows of
+            the tail segment
+
+    Returns:
+        A dictionary mapping each column name to an array of values
+    """
+    low, high = np.searchsorted(
+        rows["date"], [tail["date"].min(), tail["date"].max() + 1]
+    )
+    window = {column: values[low:high] for column, values in rows.items()}
+    replaced = np.isin(_row_keys(window), _row_keys(tail))
+    if not replaced.any():
+        return rows
+    keep = np.ones(len(rows["date"]), dtype=bool)
+    keep[low:high] = ~replaced
+    return {column: values[keep] for column, values in rows.items()}
+
+
+class HistoryStore:
+    """
+    The columnar history of a single user
+
+    Attributes:
+        path: A string representing the directory holding the column files
+        exercises: A list of strings representing the exercise keys, where
+            an exercise's id is its index in the list
+    """
+
+    path: str
+    exercises: List[str]
+    _exercise_ids: Dict[str, int]
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(f"{path}/exercises.json", "r", encoding="UTF-8") as file:
+                self.exercises = json.load(file)
+        except FileNotFoundError:
+            self.exercises = []
+        self._exercise_ids = {
+            key: index for index, key in enumerate(self.exercises)
+        }
+
+    @staticmethod
+    def exercise_key(routine_name: str, exercise_name: str):
+        """
+        Create the key an exercise is stored under
+
+        Args:
+            routine_name: A string representing the name of the routine
+            exercise_name: A string representing the name of the exercise
+
+        Returns:
+            A string of the form "[ROUTINE_NAME]/[EXERCISE_NAME]"
+        """
+        return f"{routine_name}/{exercise_name}"
+
+    def _column_path(self, segment: str, column: str):
+        """
+        Find the path of a column file
+
+        Args:
+            segment: A string, either MAIN or TAIL
+            column: A string representing the column name
+
+        Returns:
+            A string representing the path to the column file
+        """
+        return f"{self.path}/{segment}.{column}"
+
+    def exercise_id(self, key: str):
+        """
+        Find the id of an exercise, adding it to the store if it's new
+
+        Args:
+            key: A string representing the exercise key
+
+        Returns:
+            An integer representing the exercise's id
+        """
+        if key not in self._exercise_ids:
+            self._exercise_ids[key] = len(self.exercises)
+            self.exercises.append(key)
+            self._save_exercises()
+        return self._exercise_ids[key]
+
+    def _save_exercises(self):
+        """
+        Save the list of exercise keys, creating the store if it doesn't
+        exist yet
+        """
+        os.makedirs(self.path, exist_ok=True)
+        with open(f"{self.path}/exercises.json", "w", encoding="UTF-8") as file:
+            json.dump(self.exercises, file)
+
+    def segment(self, segment: str):
+        """
+        Memory-map the columns of a segment
+
+        Args:
+            segment: A string, either MAIN or TAIL
+
+        Returns:
+            A dictionary mapping each column name to a read-only numpy array
+            backed by the column file. Every column has the same length
+        """
+        columns = {}
+        for column, dtype in COLUMNS.items():
+            path = self._column_path(segment, column)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if size < dtype.itemsize:
+                columns[column] = np.empty(0, dtype=dtype)
+            else:
+                columns[column] = np.memmap(
+                    path, dtype=dtype, mode="r", shape=size // dtype.itemsize
+                )
+        # a crash part way through an append can leave some columns longer
+        rows = min(len(values) for values in columns.values())
+        return {column: values[:rows] for column, values in columns.items()}
+
+    def _write_rows(self, segment: str, rows: Dict[str, np.ndarray], mode: str):
+        """
+        Write rows to the column files of a segment
+
+        Args:
+            segment: A string, either MAIN or TAIL
+            rows: A dictionary mapping each column name to an array of values
+            mode: A string, either "ab" to append or "wb" to overwrite
+        """
+        os.makedirs(self.path, exist_ok=True)
+        for column, dtype in COLUMNS.items():
+            path = self._column_path(segment, column)
+            with open(f"{path}.tmp" if mode == "wb" else path, mode) as file:
+                file.write(np.asarray(rows[column], dtype=dtype).tobytes())
+                file.flush()
+                os.fsync(file.fileno())
+        if mode == "wb":
+            for column in COLUMNS:
+                path = self._column_path(segment, column)
+                os.replace(f"{path}.tmp", path)
+
+    def append_session(self, routine, date_iso: str):
+        """
+        Append every exercise of a routine logged on a day to the tail segment
+
+        Args:
+            routine: A Routine object whose history to append from
+            date_iso: A string representing the date in ISO format
+        """
+        rows = {column: [] for column in COLUMNS}
+        ordinal = date.fromisoformat(date_iso).toordinal()
+        for exercise in routine.exercises.values():
+            if date_iso not in exercise.history:
+                continue
+            exercise_id = self.exercise_id(
+                self.exercise_key(routine.name, exercise.name)
+            )
+            _add_sets(rows, ordinal, exercise_id, exercise.history[date_iso])
+        if not rows["date"]:
+            return
+        tail_rows = self._repair_tail()
+        self._write_rows(TAIL, rows, "ab")
+        if tail_rows + len(rows["date"]) > TAIL_ROWS:
+            self.compact()
+
+    def _repair_tail(self):
+        """
+        Cut the tail column files back to the same number of rows, in case a
+        crash part way through an append left some of them longer
+
+        Returns:
+            An integer representing the number of rows in the tail segment
+        """
+        paths = {column: self._column_path(TAIL, column) for column in COLUMNS}
+        sizes = {
+            column: os.path.getsize(path) if os.path.exists(path) else 0
+            for column, path in paths.items()
+        }
+        rows = min(
+            sizes[column] // dtype.itemsize for column, dtype in COLUMNS.items()
+        )
+        for column, dtype in COLUMNS.items():
+            if sizes[column] > rows * dtype.itemsize:
+                os.truncate(paths[column], rows * dtype.itemsize)
+        return rows
+
+    def compact(self):
+        """
+        Merge the tail segment into the main segment, keeping it sorted
+        """
+        tail = self.segment(TAIL)
+        if not tail["date"].size:
+            return
+        main = self.segment(MAIN)
+        # the tail comes last, so its rows replace the main segment's
+        merged = _latest_rows(
+            {
+                column: np.concatenate([main[column], tail[column]])
+                for column in COLUMNS
+            }
+        )
+        order = np.argsort(merged["date"], kind="stable")
+        self._write_rows(
+            MAIN, {column: merged[column][order] for column in COLUMNS}, "wb"
+        )
+        for column in COLUMNS:
+            os.remove(self._column_path(TAIL, column))
+
+    @classmethod
+    def for_user(cls, user, path: str):
+        """
+        Open a user's store, first building it from all of their history if
+        it doesn't exist yet
+
+        Args:
+            user: A User object whose history the store holds
+            path: A string representing the directory of the store, in the
+                user's data directory
+
+        Returns:
+            A HistoryStore object
+        """
+        store = cls(path)
+        if not os.path.exists(f"{path}/exercises.json"):
+            store.rebuild(user, os.path.dirname(path))
+        return store
+
+    def rebuild(self, user, user_dir: str = None):
+        """
+        Replace everything in the store with all of a user's history
+
+        Args:
+            user: A User object whose history to store
+            user_dir: A string representing the user's data directory to
+                read history archived from their csv logs from, or None to
+                only store the history loaded
+        """
+        rows = {column: [] for column in COLUMNS}
+        for routine in user.routines.values():
+            archived = {}
+            if user_dir is not None:
+                archived = _archived_history(routine, user_dir)
+            for exercise in routine.exercises.values():
+                exercise_id = self.exercise_id(
+                    self.exercise_key(routine.name, exercise.name)
+                )
+                history = {
+                    **archived.get(exercise.name, {}),
+                    **exercise.history,
+                }
+                for day, weights in history.items():
+                    _add_sets(
+                        rows,
+                        date.fromisoformat(day).toordinal(),
+                        exercise_id,
+                        weights,
+                    )
+        self._save_exercises()
+        order = np.argsort(np.asarray(rows["date"], dtype="<i4"), kind="stable")
+        self._write_rows(
+            MAIN,
+            {
+                column: np.asarray(values, dtype=COLUMNS[column])[order]
+                for column, values in rows.items()
+            },
+            "wb",
+        )
+        for column in COLUMNS:
+            if os.path.exists(self._column_path(TAIL, column)):
+                os.remove(self._column_path(TAIL, column))
+
+    def query(self, start: date = None, end: date = None):
+        """
+        Find every row logged in a date range
+
+        Rows from the main segment are slices of the memory map, so no data
+        is copied for them unless the tail segment replaces some of them.
+        Only the small tail segment is filtered into new arrays.
+
+        Args:
+            start: A datetime.date object representing the first day of the
+                range, or None to start from the beginning
+            end: A datetime.date object representing the last day of the
+                range, inclusive, or None to go to the end
+
+        Returns:
+            A list of dictionaries mapping each column name to an array, one
+            for each segment with rows in the range
+        """
+        low = np.iinfo(np.int32).min if start is None else start.toordinal()
+        high = np.iinfo(np.int32).max if end is None else end.toordinal()
+        main = self.segment(MAIN)
+        first, last = np.searchsorted(main["date"], [low, high + 1])
+        segments = [{column: main[column][first:last] for column in COLUMNS}]
+
+        tail = _latest_rows(self.segment(TAIL))
+        if len(tail["date"]):
+            segments[0] = _without_replaced(segments[0], tail)
+            mask = (tail["date"] >= low) & (tail["date"] <= high)
+            segments.append({column: tail[column][mask] for column in COLUMNS})
+        return [segment for segment in segments if len(segment["date"])]
+
+    def max_weight(self, start: date = None, end: date = None):
+        """
+        Find the heaviest weight logged for each exercise in a date range
+
+        Args:
+            start: A datetime.date object representing the first day of the
+                range, or None to start from the beginning
+            end: A datetime.date object representing the last day of the
+                range, inclusive, or None to go to the end
+
+        Returns:
+            A dictionary mapping exercise keys to the heaviest weight logged
+        """
+        best = np.full(len(self.exercises), np.nan, dtype=np.float32)
+        for segment in self.query(start, end):
+            np.fmax.at(best, segment["exercise"], segment["weight"])
+        return {
+            self.exercises[index]: float(best[index])
+            for index in np.flatnonzero(~np.isnan(best))
+        }
+
+    def volume_totals(self, start: date = None, end: date = None):
+        """
+        Find the total weight lifted for each exercise in a date range as an
+        array indexed by store id
+
+        Args:
+            start: A datetime.date object representing the first day of the
+                range, or None to start from the beginning
+            end: A datetime.date object representing the last day of the
+                range, inclusive, or None to go to the end
+
+        Returns:
+            A numpy array where element n is the total weight lifted for the
+            exercise with store id n
+        """
+        totals = np.zeros(len(self.exercises))
+        for segment in self.query(start, end):
+            totals += np.bincount(
+                segment["exercise"],
+                weights=np.nan_to_num(segment["weight"]),
+                minlength=len(self.exercises),
+            )
+        return totals
+
+    def volume(self, start: date = None, end: date = None):
+        """
+        Find the total weight lifted for each exercise in a date range
+
+        Args:
+            start: A datetime.date object representing the first day of the
+                range, or None to start from the beginning
+            end: A datetime.date object representing the last day of the
+                range, inclusive, or None to go to the end
+
+        Returns:
+            A dictionary mapping exercise keys to the total weight lifted
+        """
+        totals = self.volume_totals(start, end)
+        return {
+            self.exercises[index]: float(totals[index])
+            for index in np.flatnonzero(totals)
+        }
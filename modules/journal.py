@@ -0,0 +1,296 @@
+"""
+A write-ahead journal of changes to a user that haven't been saved yet
+
+Every change to a user is appended to [USER_DIR]/journal.log as one line and
+synced to disk before the request finishes, which is far cheaper than
+rewriting the user's json and csv files. A checkpoint saves the full files
+and empties the journal. Loading a user replays whatever is left in the
+journal on top of their saved files.
+
+Each line is the CRC32 of a record in hex, a space, then the record as a json
+list of the operation name and its arguments. A line that was only partly
+written when the process stopped fails its checksum, so it and anything after
+it are ignored. Every operation sets state rather than changing it, so
+replaying a record that was already saved does no harm.
+
+A process holds [USER_DIR]/journal.lock while it has the user's journal
+open, so a job in another process can't save the user under it. The lock is
+shared by everything in the process holding it.
+"""
+import json
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import List, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows, where files are locked through msvcrt
+    import msvcrt
+
+    fcntl = None
+
+JOURNAL_NAME = "journal.log"
+LOCK_NAME = "journal.lock"
+
+# lock file path -> [open lock file, number of holders in this process]
+_HELD = {}
+_HELD_LOCK = threading.Lock()
+
+
+def _forget_held_locks():
+    """
+    Drop the parent's locks in a forked child, which doesn't hold them, so
+    it has to take them itself
+    """
+    global _HELD_LOCK  # pylint: disable=global-statement
+    _HELD_LOCK = threading.Lock()
+    for file, _ in _HELD.values():
+        file.close()
+    _HELD.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_held_locks)
+
+
+def journal_path(user_dir: str):
+    """
+    Find the path of a user's journal
+
+    Args:
+        user_dir: A string representing the user's data directory
+
+    Returns:
+        A string representing the path to the journal file
+    """
+    return f"{user_dir}/{JOURNAL_NAME}"
+
+
+def _lock_file(file, blocking: bool):
+    """
+    Take the operating system's exclusive lock on an open file
+
+    Args:
+        file: The open lock file
+        blocking: A boolean representing whether to wait for another
+            process to release the lock
+
+    Raises:
+        BlockingIOError: Another process holds the lock and blocking is
+            False
+    """
+    if fcntl is not None:
+        fcntl.flock(file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        return
+    # only reached on Windows, where msvcrt is imported
+    # pylint: disable-next=used-before-assignment
+    mode = msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK
+    try:
+        msvcrt.locking(file.fileno(), mode, 1)
+    except OSError as error:
+        raise BlockingIOError(str(error)) from error
+
+
+def lock_user_dir(user_dir: str, blocking: bool = True):
+    """
+    Take the lock on a user's data directory for this process, or count
+    another holder if this process already has it
+
+    Args:
+        user_dir: A string representing the user's data directory
+        blocking: A boolean representing whether to wait for another
+            process to release the lock
+
+    Raises:
+        BlockingIOError: Another process holds the lock and blocking is
+            False
+    """
+    path = os.path.realpath(f"{user_dir}/{LOCK_NAME}")
+    with _HELD_LOCK:
+        if path in _HELD:
+            _HELD[path][1] += 1
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # held open until the last holder releases the lock
+        # pylint: disable=consider-using-with
+        file = open(path, "ab")
+        try:
+            _lock_file(file, blocking)
+        except OSError:
+            file.close()
+            raise
+        _HELD[path] = [file, 1]
+
+
+def unlock_user_dir(user_dir: str):
+    """
+    Release this process's hold on the lock on a user's data directory,
+    letting other processes take it once nothing else here holds it
+
+    Args:
+        user_dir: A string representing the user's data directory
+    """
+    path = os.path.realpath(f"{user_dir}/{LOCK_NAME}")
+    with _HELD_LOCK:
+        if path not in _HELD:
+            return
+        _HELD[path][1] -= 1
+        if not _HELD[path][1]:
+            # closing the file releases the operating system's lock
+            _HELD.pop(path)[0].close()
+
+
+@contextmanager
+def user_dir_locked(user_dir: str, blocking: bool = True):
+    """
+    Hold the lock on a user's data directory for the body of a with block
+
+    Args:
+        user_dir: A string representing the user's data directory
+        blocking: A boolean representing whether to wait for another
+            process to release the lock
+
+    Raises:
+        BlockingIOError: Another process holds the lock and blocking is
+            False
+    """
+    lock_user_dir(user_dir, blocking)
+    try:
+        yield
+    finally:
+        unlock_user_dir(user_dir)
+
+
+def encode_record(operation: str, args: dict):
+    """
+    Encode a record as a journal line
+
+    Args:
+        operation: A string representing the name of the operation
+        args: A dictionary of the operation's arguments
+
+    Returns:
+        The line as bytes, including the trailing newline
+    """
+    payload = json.dumps([operation, args], separators=(",", ":")).encode(
+        "UTF-8"
+    )
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+
+def read_records(path: str):
+    """
+    Read every complete record in a journal
+
+    Args:
+        path: A string representing the path to the journal file
+
+    Returns:
+        A tuple of a list of (operation, args) tuples and an integer
+        representing the number of bytes of the file they take up
+    """
+    records = []
+    valid_size = 0
+    try:
+        with open(path, "rb") as file:
+            for line in file:
+                checksum, _, payload = line.rstrip(b"\n").partition(b" ")
+                expected = b"%08x" % zlib.crc32(payload)
+                if not line.endswith(b"\n") or checksum != expected:
+                    break
+                operation, args = json.loads(payload)
+                records.append((operation, args))
+                valid_size += len(line)
+    except FileNotFoundError:
+        pass
+    return records, valid_size
+
+
+class Journal:
+    """
+    An open journal file that records are appended to
+
+    Attributes:
+        path: A string representing the path to the journal file
+        pending: An integer representing how many records have been written
+            since the last checkpoint
+    """
+
+    path: str
+    pending: int
+
+    def __init__(self, path: str, pending: int = 0):
+        self.path = path
+        self.pending = pending
+        self._file = None
+        self._locked = False
+
+    @classmethod
+    def open(cls, user_dir: str):
+        """
+        Open a user's journal, cutting off any partly written record at the
+        end so new records follow the last complete one. Waits for any
+        other process holding the user's lock, which is then held until the
+        journal is closed
+
+        Args:
+            user_dir: A string representing the user's data directory
+
+        Returns:
+            A tuple of the Journal object and a list of the (operation, args)
+            tuples still in it
+        """
+        lock_user_dir(user_dir)
+        path = journal_path(user_dir)
+        records, valid_size = read_records(path)
+        if os.path.exists(path) and os.path.getsize(path) != valid_size:
+            os.truncate(path, valid_size)
+        journal = cls(path, len(records))
+        journal._locked = True
+        return journal, records
+
+    def append(self, records: List[Tuple[str, dict]]):
+        """
+        Append records and sync them to disk with a single write
+
+        Args:
+            records: A list of (operation, args) tuples
+        """
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # kept open between appends so each one is a single write
+            # pylint: disable=consider-using-with
+            self._file = open(self.path, "ab")
+        self._file.write(
+            b"".join(
+                encode_record(operation, args) for operation, args in records
+            )
+        )
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.pending += len(records)
+
+    def checkpoint(self):
+        """
+        Empty the journal once everything in it has been saved to the full
+        files
+        """
+        if self._file is not None:
+            self._file.truncate(0)
+            os.fsync(self._file.fileno())
+        elif os.path.exists(self.path):
+            os.truncate(self.path, 0)
+        self.pending = 0
+
+    def close(self):
+        """
+        Close the journal file and release the user's lock
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._locked:
+            unlock_user_dir(os.path.dirname(self.path))
+            self._locked = False
@@ -0,0 +1,248 @@
+"""
+Accounting of the memory held by users and caches, exposed as metrics
+
+deep_sizeof walks an object and everything it holds, counting each object
+once, so a user's size covers their routines, exercises and history arrays.
+Sizes are approximate: strings shared with other users, such as interned
+dates and exercise names, are counted for every user holding them.
+tracemalloc can be turned on at runtime to find which lines allocate the
+most.
+"""
+import io
+import sys
+import threading
+import tracemalloc
+import types
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+import pandas as pd
+from .fragments import FragmentCache
+
+MAX_MEASURED_USERS = 256
+# objects shared by everything or holding the interpreter's state, which
+# aren't part of any one object's size
+_SKIPPED_TYPES = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+    io.IOBase,
+    type(threading.Lock()),
+    type(threading.RLock()),
+)
+
+# keyed by user name and data version, so a user is measured again after
+# they change
+_USER_SIZES = FragmentCache(MAX_MEASURED_USERS)
+
+
+def deep_sizeof(obj, seen: set = None):
+    """
+    Find the bytes held by an object and everything it refers to
+
+    Args:
+        obj: The object to measure
+        seen: A set of the ids of objects already counted, which are
+            counted as 0 bytes. Shared between calls to measure several
+            objects without counting what they share twice
+
+    Returns:
+        An integer representing the size in bytes
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or isinstance(obj, _SKIPPED_TYPES):
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(np.sum(obj.memory_usage(deep=True)))
+    # includes the data of numpy arrays, array.array objects and strings
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (dict, types.MappingProxyType)):
+        size += sum(
+            deep_sizeof(key, seen) + deep_sizeof(value, seen)
+            for key, value in obj.items()
+        )
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    if hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    for cls in type(obj).__mro__:
+        for slot in cls.__dict__.get("__slots__", ()):
+            if hasattr(obj, slot):
+                size += deep_sizeof(getattr(obj, slot), seen)
+    return size
+
+
+def user_memory(user):
+    """
+    Measure the memory held by a user and each of their routines, reusing
+    the last measurement if the user hasn't changed since
+
+    Args:
+        user: A User object
+
+    Returns:
+        A dictionary with "total", the bytes held by the user, and
+        "routines", a dictionary mapping each routine name to the bytes its
+        exercises and history hold
+    """
+    # held so a request logging a workout can't change what's being walked
+    with user.lock:
+        key = (user.name, user.version)
+        sizes = _USER_SIZES.get(key)
+        if sizes is None:
+            seen = set()
+            routines = {
+                name: deep_sizeof(routine, seen)
+                for name, routine in user.routines.items()
+            }
+            sizes = {
+                "total": sum(routines.values()) + deep_sizeof(user, seen),
+                "routines": routines,
+            }
+            _USER_SIZES.set(key, sizes)
+    return sizes
+
+
+def cache_memory(cache: FragmentCache):
+    """
+    Measure the memory held by a cache's entries, from a snapshot taken
+    under its lock so it isn't walked while a request changes it
+
+    Args:
+        cache: A FragmentCache object
+
+    Returns:
+        An integer representing the size in bytes
+    """
+    seen = set()
+    return sys.getsizeof(cache) + sum(
+        deep_sizeof(key, seen) + deep_sizeof(fragment, seen)
+        for key, fragment in cache.items()
+    )
+
+
+def start_tracing(frames: int = 10):
+    """
+    Start tracing allocations, which slows the process until stopped
+
+    Args:
+        frames: An integer representing how many frames of each allocation's
+            stack to keep
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop_tracing():
+    """
+    Stop tracing allocations and free the traces
+    """
+    tracemalloc.stop()
+
+
+def top_allocations(limit: int = 10):
+    """
+    Find the lines holding the most memory allocated since tracing started
+
+    Args:
+        limit: An integer representing how many lines to list
+
+    Returns:
+        A list of dictionaries with the "location" of each line, the "size"
+        in bytes still held and the "count" of blocks, largest first. Empty
+        if allocations aren't being traced
+    """
+    if not tracemalloc.is_tracing():
+        return []
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__),)
+    )
+    return [
+        {
+            "location": f"{stat.traceback[0].filename}:"
+            f"{stat.traceback[0].lineno}",
+            "size": stat.size,
+            "count": stat.count,
+        }
+        for stat in snapshot.statistics("lineno")[:limit]
+    ]
+
+
+def _escape(value: str):
+    """
+    Escape a label value for the Prometheus text format
+
+    Args:
+        value: A string representing the label value
+
+    Returns:
+        The escaped string
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_metrics(samples: Iterable[Tuple[str, Dict[str, str], float]]):
+    """
+    Format metric samples in the Prometheus text format
+
+    Args:
+        samples: Tuples of a metric name, a dictionary of label names to
+            values and the sample's value
+
+    Returns:
+        A string of one line per sample
+    """
+    lines = []
+    for name, labels, value in samples:
+        label_text = ",".join(
+            f'{label}="{_escape(str(label_value))}"'
+            for label, label_value in labels.items()
+        )
+        lines.append(
+            f"{name}{{{label_text}}} {value}" if labels else f"{name} {value}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def memory_metrics(users: Iterable, caches: Dict[str, FragmentCache]):
+    """
+    Collect memory metric samples for users and caches
+
+    Args:
+        users: User objects held in memory
+        caches: A dictionary mapping cache names to the cache objects
+
+    Returns:
+        A list of tuples of a metric name, a dictionary of labels and the
+        sample's value, as taken by format_metrics
+    """
+    samples: List[Tuple[str, Dict[str, str], float]] = []
+    total = 0
+    for user in users:
+        sizes = user_memory(user)
+        total += sizes["total"]
+        samples.append(
+            ("ltrac_user_bytes", {"user": user.name}, sizes["total"])
+        )
+        for routine, size in sizes["routines"].items():
+            samples.append(
+                (
+                    "ltrac_routine_bytes",
+                    {"user": user.name, "routine": routine},
+                    size,
+                )
+            )
+    samples.append(("ltrac_users_bytes_total", {}, total))
+    for name, cache in caches.items():
+        samples.append(
+            ("ltrac_cache_bytes", {"cache": name}, cache_memory(cache))
+        )
+        samples.append(("ltrac_cache_entries", {"cache": name}, len(cache)))
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        samples.append(("ltrac_traced_bytes", {}, current))
+        samples.append(("ltrac_traced_peak_bytes", {}, peak))
+    return samples
@@ -1,15 +1,88 @@
 """
 Functions for creating new users and viewing stats in LTRAC
 """
+import functools
+import itertools
 import json
+import math
 import os
-from datetime import date, timedelta
+import threading
+from array import array
+from datetime import date
 from typing import Dict, List
 from flask import request
-from .workouts import Routine
+from .workouts import Exercise, Routine, to_weight
+from .catalogue import CATALOGUE
+from .changelog import ChangeLog
 from .dates import Weekday
+from .journal import Journal, read_records, journal_path
+from .schedule import Schedule
+from .snapshot import read_snapshot, write_snapshot
+from .storage import user_data_dir
+from .streaks import StreakTracker
+from .templates import TEMPLATES
+from .views import UserView, snapshot_user
+from .xp import LevelCurve, Session, XPEngine, is_new_record
 
+# shared by every User so a version is never reused, even by a reloaded user
+_VERSIONS = itertools.count(1)
 
+
+def _synchronized(method):
+    """
+    Make a User method hold the user's lock while it runs, so requests
+    changing or saving the same user don't interleave
+
+    Args:
+        method: The User method to wrap
+
+    Returns:
+        The wrapped method
+    """
+
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+
+    return locked
+
+
+def _weights_error(weights: list):
+    """
+    Find what's wrong with the weights of a log entry, if anything
+
+    A set is either unlogged, as None or an empty string, or logged as a
+    number or numeric string that's finite once stored as a 32 bit float.
+    At least one set has to be logged.
+
+    Args:
+        weights: A list with one weight per set of the exercise
+
+    Returns:
+        A string describing the problem, or None if the weights can be
+        logged
+    """
+    logged = False
+    for weight in weights:
+        if weight is None or weight == "":
+            continue
+        # bool is an int, but never a weight
+        if isinstance(weight, bool) or not isinstance(
+            weight, (int, float, str)
+        ):
+            return "Weights must be numbers or null"
+        if not math.isfinite(array("f", [to_weight(weight)])[0]):
+            return "Weights must be finite numbers or null"
+        logged = True
+    if not logged:
+        return "At least one set must have a weight"
+    return None
+
+
+# the app and its templates only talk to a User, so it keeps every piece of a
+# user's state and every operation on it
+# pylint: disable-next=too-many-instance-attributes,too-many-public-methods
 class User:
     """
     A LTRAC user profile
@@ -23,31 +96,80 @@ class User:
             routines
         workout_days: A dictionary mapping Weekday objects to booleans,
             representing the days the user plans to workout
+        schedule: A Schedule object storing the workout days as a bitmask
+        streaks: A StreakTracker object measuring how consistently the user
+            trains on their workout days
+        journal: A Journal object every change to the user is recorded in
+            until it's saved, or None if changes aren't journaled
+        changes: A ChangeLog object every change to the user is recorded in
+            for clients to sync from, or None if changes aren't journaled
+        version: An integer that changes whenever the user's data does, used
+            to key cached page fragments
+        lock: A reentrant lock held while the user is changed or saved
     """
 
     XP_PER_LEVEL = 1000
+    XP_ENGINE = XPEngine(curve=LevelCurve.linear(XP_PER_LEVEL))
+
+    __slots__ = (
+        "_name",
+        "_xp_points",
+        "_routines",
+        "_schedule",
+        "_streaks",
+        "_journal",
+        "_changes",
+        "_version",
+        "_lock",
+        "_view",
+    )
 
     _name: str
     _xp_points: int
     _routines: Dict[str, Routine]
-    _workout_days: Dict[Weekday, bool]
+    _schedule: Schedule
+    _streaks: StreakTracker
+    _journal: Journal
+    _changes: ChangeLog
+    _version: int
+    _lock: threading.RLock
+    _view: UserView
 
     def __init__(self, name: int, xp_points: int = 0):
         self._name = name
         self._xp_points = xp_points
         self._routines = {}
-        self._workout_days = {
-            Weekday.MONDAY: False,
-            Weekday.TUESDAY: False,
-            Weekday.WEDNESDAY: False,
-            Weekday.THURSDAY: False,
-            Weekday.FRIDAY: False,
-            Weekday.SATURDAY: False,
-            Weekday.SUNDAY: False,
+        self._schedule = Schedule()
+        # built lazily from routine history the first time it's needed
+        self._streaks = None
+        self._journal = None
+        self._changes = None
+        self._version = next(_VERSIONS)
+        self._lock = threading.RLock()
+        self._view = None
+
+    def __getstate__(self):
+        # locks can't be pickled, so each copy gets its own
+        return {
+            slot: getattr(self, slot)
+            for slot in self.__slots__
+            if slot not in ("_lock", "_view")
         }
 
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+        self._lock = threading.RLock()
+        self._view = None
+
     def __eq__(self, other):
-        return self.__dict__ == other.__dict__
+        # streaks are derived from routines and schedule, so skip them
+        return (self.name, self.xp_points, self.routines, self.schedule) == (
+            other.name,
+            other.xp_points,
+            other.routines,
+            other.schedule,
+        )
 
     @property
     def name(self):
@@ -73,50 +195,259 @@ class User:
     @property
     def workout_days(self):
         """
-        Return private attribute workout_days
+        Return the workout days as a dictionary mapping every Weekday object
+        to a boolean
+        """
+        return self._schedule.to_workout_days()
+
+    @property
+    def schedule(self):
+        """
+        Return private attribute schedule
+        """
+        return self._schedule
+
+    @property
+    def streaks(self):
+        """
+        Return the user's streak tracker, building it from all logged routine
+        history in a single pass the first time it's accessed
+        """
+        with self._lock:
+            if self._streaks is None:
+                self._streaks = StreakTracker.from_routines(
+                    self.routines.values(), self.schedule
+                )
+            return self._streaks
+
+    @property
+    def journal(self):
+        """
+        Return private attribute journal
+        """
+        return self._journal
+
+    @property
+    def changes(self):
+        """
+        Return private attribute changes
+        """
+        return self._changes
+
+    @property
+    def version(self):
+        """
+        Return private attribute version
+        """
+        return self._version
+
+    @property
+    def lock(self):
+        """
+        Return private attribute lock
+        """
+        return self._lock
+
+    def view(self):
+        """
+        Take an immutable snapshot of the user for rendering read-only pages
+
+        The snapshot is only taken again after the user changes, so readers
+        share one copy and only wait on the lock to take a new one.
+
+        Returns:
+            A UserView object
         """
-        return self._workout_days
+        view = self._view
+        if view is None or view.version != self._version:
+            with self._lock:
+                if self._view is None or self._view.version != self._version:
+                    self._view = snapshot_user(self)
+                view = self._view
+        return view
 
     @classmethod
-    def load_user_data(cls, user_name: str, directory: str = "user_data"):
+    def load_user_data(
+        cls, user_name: str, directory: str = "user_data", since: date = None
+    ):
         """
-        Load user data from user json as well as all associated routine data
+        Load user data from the user's binary snapshot, or from the user json
+        as well as all associated routine data if the snapshot is missing or
+        out of date, then replay any changes left in the user's journal
 
         Args:
             user_name: A string representing the user's name to load
             directory: A string representing the base directory of the user's
                 data, for example the user's json file will be located at
-                [directory]/[user_name]/[user_name].json
+                [directory]/[ab]/[cd]/[user_name]/[user_name].json, or at
+                [directory]/[user_name]/[user_name].json if the user hasn't
+                been migrated to the sharded layout
+            since: A datetime.date object representing the earliest routine
+                history needed, or None to only load history that hasn't
+                been archived
+
+        Raises:
+            FileNotFoundError: The user has no saved data or journal
         """
         name_no_spaces = user_name.replace(" ", "_")
+        user_dir = user_data_dir(user_name, directory)
+
+        # snapshots store exercises by id, so pick up ids other users added
+        CATALOGUE.load(f"{directory}/catalogue.json")
+        TEMPLATES.load(f"{directory}/templates.json")
+        # snapshots only hold history that hasn't been archived
+        user = None
+        if since is None:
+            user = read_snapshot(cls, user_dir, name_no_spaces)
+        if user is not None:
+            user._load_archive_meta(user_dir)
+            user.apply_journal(read_records(journal_path(user_dir))[0])
+            return user
 
         # load user json
-        with open(
-            f"{directory}/{name_no_spaces}/{name_no_spaces}.json",
-            "r",
-            encoding="UTF-8",
-        ) as file:
-            json_dict = json.load(file)
+        try:
+            with open(
+                f"{user_dir}/{name_no_spaces}.json",
+                "r",
+                encoding="UTF-8",
+            ) as file:
+                json_dict = json.load(file)
+        except FileNotFoundError:
+            # a new user may not have been saved yet, only journaled
+            records = read_records(journal_path(user_dir))[0]
+            if not records:
+                raise
+            user = cls(user_name)
+            user.apply_journal(records)
+            return user
 
         # set user data from json
         user = cls(json_dict["_name"], json_dict["_xp_points"])
-        user.set_workout_days(
-            [
-                Weekday[day]
-                for day, value in json_dict["_workout_days"].items()
-                if value
-            ]
-        )
+        user.set_schedule(Schedule.from_json_dict(json_dict["_workout_days"]))
 
         # load routine json and csv
         for routine_name in json_dict["_routines"]:
             routine_name_no_spaces = routine_name.replace(" ", "_")
             # pylint: disable=line-too-long
-            path = f"{directory}/{name_no_spaces}/{routine_name_no_spaces}/{routine_name_no_spaces}"
+            path = f"{user_dir}/{routine_name_no_spaces}/{routine_name_no_spaces}"
             user.add_routine(Routine.from_json(f"{path}.json"))
-            user.routines[routine_name].load_log(f"{path}.csv")
+            user.routines[routine_name].load_log(f"{path}.csv", since)
+        user.apply_journal(read_records(journal_path(user_dir))[0])
         return user
 
+    @_synchronized
+    def open_journal(self, directory: str = "user_data"):
+        """
+        Start recording every change to the user in their journal and
+        change log
+
+        Args:
+            directory: A string representing the base directory of user data
+        """
+        self.close_journal()
+        user_dir = user_data_dir(self.name, directory)
+        self._journal, _ = Journal.open(user_dir)
+        self._changes = ChangeLog.open(user_dir)
+
+    @_synchronized
+    def close_journal(self):
+        """
+        Stop recording changes to the user, closing their journal and change
+        log and releasing the lock on their data directory
+        """
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if self._changes is not None:
+            self._changes.close()
+            self._changes = None
+
+    def _record(self, *records):
+        """
+        Bump the user's version and append changes to their journal and
+        change log, if they have them
+
+        Args:
+            records: Tuples of a string representing the operation name and a
+                dictionary of its arguments
+        """
+        self._version = next(_VERSIONS)
+        if self._journal is not None:
+            self._journal.append(list(records))
+        if self._changes is not None:
+            self._changes.append(list(records))
+
+    @_synchronized
+    def apply_journal(self, records: List[tuple]):
+        """
+        Replay changes recorded in a journal without recording them again
+
+        Args:
+            records: A list of tuples of a string representing the operation
+                name and a dictionary of its arguments
+        """
+        journal, self._journal = self._journal, None
+        changes, self._changes = self._changes, None
+        for operation, args in records:
+            if operation == "add_routine":
+                template = TEMPLATES.get(args.get("template"))
+                if args["name"] not in self.routines:
+                    self.add_routine(
+                        Routine(args["name"])
+                        if template is None
+                        else Routine.from_template(template, args["name"])
+                    )
+            elif operation == "add_exercise":
+                routine = self.routines.get(args["routine"])
+                if routine is not None and (
+                    args["name"] not in routine.exercises
+                ):
+                    routine.add_exercise(Exercise(args["name"], args["sets"]))
+            elif operation == "set_schedule":
+                self.set_schedule(Schedule(args["mask"]))
+            elif operation == "log":
+                exercise = self._routine_exercises(args["routine"]).get(
+                    args["exercise"]
+                )
+                if exercise is not None:
+                    exercise.log_weights(args["date"], args["weights"])
+                    self._streaks = None
+            elif operation == "set_xp":
+                self._xp_points = args["xp_points"]
+        self._journal = journal
+        self._changes = changes
+        self._version = next(_VERSIONS)
+
+    def _routine_exercises(self, routine_name: str):
+        """
+        Find the exercises of a routine that may not exist
+
+        Args:
+            routine_name: A string representing the name of the routine
+
+        Returns:
+            A dictionary mapping exercise names to Exercise objects, empty if
+            the user has no routine with that name
+        """
+        routine = self.routines.get(routine_name)
+        return {} if routine is None else routine.exercises
+
+    @_synchronized
+    def checkpoint(self, directory: str = "user_data"):
+        """
+        Save every routine and the user json, then empty the user's journal
+        since nothing in it is unsaved any more
+
+        Args:
+            directory: A string representing the base directory of user data
+        """
+        self._export_routine_files(directory)
+        # the user json is written last, so the snapshot written with it is
+        # taken against the new routine files
+        self.to_json(directory)
+        if self._journal is not None:
+            self._journal.checkpoint()
+
     def level(self):
         """
         Calculate the level of the user
@@ -124,8 +455,19 @@ class User:
         Returns:
             An integer representing the user's level
         """
-        return self.xp_points // self.XP_PER_LEVEL
+        return self.XP_ENGINE.curve.level(self.xp_points)
+
+    def level_progress(self):
+        """
+        Calculate how far the user is through their current level
+
+        Returns:
+            A tuple of two integers, the xp earned within the current level
+            and the xp the current level takes in total
+        """
+        return self.XP_ENGINE.curve.progress(self.xp_points)
 
+    @_synchronized
     def gain_xp(self, gained_xp: int):
         """
         Gain an amount of xp for completing a workout
@@ -134,7 +476,24 @@ class User:
             gained_xp: An integer representing the amount of xp gained
         """
         self._xp_points += gained_xp
+        self._record(("set_xp", {"xp_points": self.xp_points}))
 
+    @_synchronized
+    def recompute_xp(self, engine: XPEngine = None):
+        """
+        Replace the user's xp with the xp their whole history earns under a
+        set of xp rules
+
+        Args:
+            engine: An XPEngine object with the rules to use. Defaults to the
+                User class's engine
+        """
+        if engine is None:
+            engine = self.XP_ENGINE
+        self._xp_points = engine.replay(self)
+        self._record(("set_xp", {"xp_points": self.xp_points}))
+
+    @_synchronized
     def add_routine(self, routine: Routine):
         """
         Add a routine to the user's routines
@@ -143,7 +502,46 @@ class User:
             routine: A Routine object to be added to the user's routines
         """
         self.routines[routine.name] = routine
+        # the new routine may carry history the tracker hasn't seen
+        self._streaks = None
+        routine.set_listener(self._on_add_exercise)
+        if routine.template is not None:
+            # the template holds the exercises, so they aren't journaled
+            self._record(
+                (
+                    "add_routine",
+                    {
+                        "name": routine.name,
+                        "template": routine.template.template_id,
+                    },
+                )
+            )
+            return
+        self._record(("add_routine", {"name": routine.name}))
+        for exercise in routine.exercises.values():
+            self._on_add_exercise(routine, exercise)
 
+    @_synchronized
+    def _on_add_exercise(self, routine: Routine, exercise: Exercise):
+        """
+        Record an exercise being added to one of the user's routines
+
+        Args:
+            routine: The Routine object the exercise was added to
+            exercise: The Exercise object that was added
+        """
+        self._record(
+            (
+                "add_exercise",
+                {
+                    "routine": routine.name,
+                    "name": exercise.name,
+                    "sets": exercise.sets,
+                },
+            )
+        )
+
+    @_synchronized
     def set_workout_days(self, selected_days: List[Weekday]):
         """
         Set which days to workout
@@ -152,11 +550,20 @@ class User:
             selected_days: A list of Weekday objects, representing the days
                 to workout on
         """
-        for day in self.workout_days:
-            if day in selected_days:
-                self.workout_days[day] = True
-            else:
-                self.workout_days[day] = False
+        self.set_schedule(Schedule.from_days(selected_days))
+
+    @_synchronized
+    def set_schedule(self, schedule: Schedule):
+        """
+        Set which days to workout from a schedule
+
+        Args:
+            schedule: A Schedule object representing the days to workout on
+        """
+        self._schedule = schedule
+        if self._streaks is not None:
+            self._streaks.set_schedule(schedule)
+        self._record(("set_schedule", {"mask": schedule.mask}))
 
     def next_workout_day(self):
         """
@@ -167,84 +574,326 @@ class User:
             A datetime.date object representing the next day the user has
             planned to workout on. Returns None if no workout days are set
         """
-        # get the day numbers of the user's workout days
-        # (monday = 0, tuesday = 1, etc)
-        workout_day_numbers = [
-            day.value for day, value in self.workout_days.items() if value
+        return self.schedule.next_day(date.today())
+
+    @_synchronized
+    def log_workout(self, routine_name: str):
+        """
+        Log all exercises in a routine by pulling from user inputted values in
+        Flask, then gain xp according to the user's xp rules. Exercises left
+        blank aren't logged
+
+        Args:
+            routine_name: A string representing the routine to log
+
+        Returns:
+            An integer representing the amount of xp gained
+
+        Raises:
+            ValueError: A weight entered isn't a finite number. Nothing is
+                logged
+        """
+        today = date.today().isoformat()
+        entries = [
+            {
+                "date": today,
+                "routine": routine_name,
+                "exercise": exercise.name,
+                "weights": [
+                    request.form[f"{exercise.name} {i}"]
+                    for i in range(exercise.sets)
+                ],
+            }
+            for _, exercise in self.routines[routine_name].exercises.items()
         ]
+        gained_xp, _ = self.log_workouts(
+            [entry for entry in entries if any(entry["weights"])]
+        )
+        return gained_xp
 
-        # return None if user has no workout days set
-        if not workout_day_numbers:
-            return None
+    def validate_log_entries(self, entries: List[dict]):
+        """
+        Check log entries against the user's routines without logging them
+
+        Args:
+            entries: A list of dictionaries, each with the keys "date" (a
+                string in ISO format), "routine" and "exercise" (strings
+                naming an existing routine and exercise) and "weights" (a
+                list with one weight per set of the exercise, each a finite
+                number or None for a set that wasn't done, with at least one
+                set done)
+
+        Returns:
+            A list of strings describing every problem found, empty if all
+            entries can be logged
+        """
+        errors = []
+        for index, entry in enumerate(entries):
+            if not isinstance(entry, dict) or not all(
+                key in entry for key in ("date", "routine", "exercise")
+            ):
+                errors.append(
+                    f"Entry {index}: Missing date, routine or exercise"
+                )
+                continue
+            try:
+                date.fromisoformat(entry["date"])
+            except (TypeError, ValueError):
+                errors.append(f"Entry {index}: Date is not in ISO format")
+            routine = self.routines.get(str(entry["routine"]))
+            if routine is None:
+                errors.append(f"Entry {index}: Unknown routine")
+                continue
+            exercise = routine.exercises.get(str(entry["exercise"]))
+            if exercise is None:
+                errors.append(f"Entry {index}: Unknown exercise")
+            elif (
+                not isinstance(entry.get("weights"), list)
+                or len(entry["weights"]) != exercise.sets
+            ):
+                errors.append(
+                    f"Entry {index}: Number of weights logged does not match"
+                    " number of sets"
+                )
+            else:
+                error = _weights_error(entry["weights"])
+                if error is not None:
+                    errors.append(f"Entry {index}: {error}")
+        return errors
 
-        today = date.today()
-        today_number = date.weekday(today)
+    @_synchronized
+    def log_workouts(self, entries: List[dict]):
+        """
+        Log many exercises across any number of days and routines at once,
+        then gain xp for all of them in one go
 
+        Every entry is validated before anything is logged, and anything
+        logged is undone if awarding xp fails, so either all entries are
+        logged or none are. Entries for the same day and routine
+        are treated as one session when awarding xp. Entries whose weights
+        are already logged are skipped, so a client sending the same batch
+        again doesn't gain xp for it twice, and only sessions with a changed
+        entry earn xp.
+
+        Args:
+            entries: A list of dictionaries in the format described by
+                validate_log_entries
+
+        Returns:
+            A tuple of the integer amount of xp gained and a sorted list of
+            (date, routine name) tuples for every session that changed
+
+        Raises:
+            ValueError: At least one entry can't be logged. Nothing is logged
+        """
+        errors = self.validate_log_entries(entries)
+        if errors:
+            raise ValueError("; ".join(errors))
+
+        sessions = {}
+        for entry in entries:
+            day = date.fromisoformat(entry["date"]).isoformat()
+            sessions.setdefault((day, entry["routine"]), []).append(entry)
+
+        gained_xp = 0
+        records = []
+        changed = []
+        # (exercise, day, weights logged before) for everything logged
+        undo = []
+        logged = False
         try:
-            # do this if there's a workout day upcoming in the week
-            next_day_delta = (
-                min(day for day in workout_day_numbers if day > today_number)
-                - today_number
+            for (day, routine_name), session_entries in sorted(
+                sessions.items()
+            ):
+                session, session_records = self._log_session(
+                    day, routine_name, session_entries, undo
+                )
+                records.extend(session_records)
+                if session is not None:
+                    changed.append((day, routine_name))
+                    gained_xp += self.XP_ENGINE.award(session)
+            logged = True
+        finally:
+            if not logged:
+                self._undo_logs(undo)
+        if not records:
+            return 0, []
+        # journaled together so the whole batch is a single synced write
+        self._xp_points += gained_xp
+        self._record(*records, ("set_xp", {"xp_points": self.xp_points}))
+        return gained_xp, changed
+
+    def _log_session(
+        self,
+        day: str,
+        routine_name: str,
+        session_entries: List[dict],
+        undo: list,
+    ):
+        """
+        Log the entries of a single session, skipping entries whose weights
+        are already logged
+
+        Args:
+            day: A string representing the date of the session in ISO format
+            routine_name: A string representing the routine logged
+            session_entries: A list of validated entries for that day and
+                routine
+            undo: A list each exercise logged is added to, as a tuple of the
+                Exercise object, the day and the weights logged before or
+                None
+
+        Returns:
+            A tuple of the Session object to award xp for, or None if no
+            entry changed, and a list of the log records to journal
+        """
+        weights = {}
+        new_prs = 0
+        records = []
+        for entry in session_entries:
+            exercise = self.routines[routine_name].exercises[entry["exercise"]]
+            previous_record = exercise.personal_record()
+            previous = exercise.history.get(day)
+            exercise.log_weights(day, entry["weights"])
+            undo.append((exercise, day, previous))
+            # compared as bytes so unlogged (NaN) sets match
+            if (
+                previous is not None
+                and previous.tobytes() == exercise.history[day].tobytes()
+            ):
+                continue
+            weights[exercise.name] = exercise.history[day].tolist()
+            records.append(
+                (
+                    "log",
+                    {
+                        "date": day,
+                        "routine": routine_name,
+                        "exercise": exercise.name,
+                        "weights": weights[exercise.name],
+                    },
+                )
             )
-        except ValueError:
-            # do this if the next workout day is next week
-            next_day_delta = min(workout_day_numbers) - today_number + 7
+            new_prs += is_new_record(previous_record, weights[exercise.name])
+        if not weights:
+            return None, records
+        session_day = date.fromisoformat(day)
+        self.streaks.record(session_day)
+        session = Session(
+            session_day,
+            routine_name,
+            weights,
+            new_prs,
+            self.streaks.current_streak(session_day),
+        )
+        return session, records
 
-        return today + timedelta(days=next_day_delta)
+    def _undo_logs(self, undo: list):
+        """
+        Put back the weights logged before a batch that failed part way
 
-    def log_workout(self, routine_name: str):
+        Args:
+            undo: A list of tuples of an Exercise object, a day and the
+                weights logged before or None, in the order they were logged
         """
-        Log all exercises in a routine by pulling from user inputted values in
-        Flask, then gain xp
+        for exercise, day, previous in reversed(undo):
+            if previous is None:
+                del exercise.history[day]
+            else:
+                exercise.history[day] = previous
+        # the tracker recorded the failed sessions, so build it again
+        self._streaks = None
+
+    @_synchronized
+    def to_json(self, directory: str = "user_data"):
+        """
+        Export user to json file in the user's directory, as found by
+        user_data_dir, with the name '[USERNAME].json' Creates the directory
+        if it doesn't exist already, then regenerates the user's snapshot
 
         Args:
-            routine_name: A string representing the routine to log
+            directory: A string representing the base directory of user data
         """
-        for _, exercise in self.routines[routine_name].exercises.items():
-            current_exercise = exercise.name
-            weight_list = [
-                request.form[f"{current_exercise} {i}"]
-                for i in range(int(exercise.sets))
-            ]
-            exercise.log_weights_today(weight_list)
-        self.gain_xp(100)
-
-    def to_json(self):
-        """
-        Export user to json file in the directory 'user_data/[USERNAME]' with
-        the name '[USERNAME].json' Creates the directory if it doesn't exist
-        already
-        """
-        json_dict = self.__dict__.copy()
-        json_dict["_routines"] = list(json_dict["_routines"].keys())
-        json_dict["_workout_days"] = {
-            day.name: value for day, value in json_dict["_workout_days"].items()
+        # streaks are derived from routine history, so they aren't stored
+        json_dict = {
+            "_name": self.name,
+            "_xp_points": self.xp_points,
+            "_routines": list(self.routines.keys()),
+            "_workout_days": self.schedule.to_json_dict(),
         }
 
         name_no_spaces = self.name.replace(" ", "_")
-        dir_path = f"user_data/{name_no_spaces}"
-        if not os.path.exists(dir_path):
-            os.mkdir(dir_path)
+        dir_path = user_data_dir(self.name, directory)
+        os.makedirs(dir_path, exist_ok=True)
 
         with open(
             f"{dir_path}/{name_no_spaces}.json", "w", encoding="UTF-8"
         ) as file:
             file.write(json.dumps(json_dict, indent=4))
+        self._write_snapshot(directory)
 
-    def export_routines(self):
+    @_synchronized
+    def export_routines(self, directory: str = "user_data"):
         """
         Export user's routines to json and exercise logs to csv in the
-        directory 'user_data/[USERNAME]/[ROUTINE_NAME]' with the name
-        '[ROUTINE_NAME].json' and '[ROUTINE_NAME].csv'
+        directory '[ROUTINE_NAME]' of the user's directory with the name
+        '[ROUTINE_NAME].json' and '[ROUTINE_NAME].csv', then regenerate the
+        user's snapshot
+
+        Args:
+            directory: A string representing the base directory of user data
         """
-        name_no_spaces = self.name.replace(" ", "_")
-        user_dir = f"user_data/{name_no_spaces}"
+        self._export_routine_files(directory)
+        self._write_snapshot(directory)
+
+    def _export_routine_files(self, directory: str):
+        """
+        Export user's routines to json and exercise logs to csv without
+        regenerating the user's snapshot
+
+        Args:
+            directory: A string representing the base directory of user data
+        """
+        user_dir = user_data_dir(self.name, directory)
 
         for _, routine in self.routines.items():
             routine_name_no_spaces = routine.name.replace(" ", "_")
             routine_dir = f"{user_dir}/{routine_name_no_spaces}"
-            if not os.path.exists(routine_dir):
-                os.mkdir(routine_dir)
+            os.makedirs(routine_dir, exist_ok=True)
 
             routine.export_log(f"{routine_dir}/{routine_name_no_spaces}.csv")
             routine.to_json(f"{routine_dir}/{routine_name_no_spaces}.json")
+
+    def _load_archive_meta(self, user_dir: str):
+        """
+        Load what has been archived from each routine's csv log
+
+        Args:
+            user_dir: A string representing the user's data directory
+        """
+        for routine in self.routines.values():
+            routine_name_no_spaces = routine.name.replace(" ", "_")
+            routine.load_archive_meta(
+                f"{user_dir}/{routine_name_no_spaces}/"
+                f"{routine_name_no_spaces}.csv"
+            )
+
+    def _write_snapshot(self, directory: str):
+        """
+        Save any new exercises to the exercise catalogue, then regenerate the
+        user's snapshot, which refers to exercises by their catalogue ids.
+        What has been archived is read again first, so sessions archived
+        since the user was loaded aren't saved in the snapshot
+
+        Args:
+            directory: A string representing the base directory of user data
+        """
+        user_dir = user_data_dir(self.name, directory)
+        # ids are given out lazily, so make sure every exercise has one
+        # before the catalogue is saved
+        for routine in self.routines.values():
+            for exercise in routine.exercises.values():
+                _ = exercise.exercise_id
+        CATALOGUE.save(f"{directory}/catalogue.json")
+        self._load_archive_meta(user_dir)
+        write_snapshot(self, user_dir)
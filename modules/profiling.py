@@ -0,0 +1,270 @@
+"""
+Opt-in profiling of website requests
+
+A request is profiled when it sends the X-Profile: 1 header or the
+profile=1 query argument, or when it's picked by the sample rate. Its
+cProfile stats are saved under [directory]/[route]/, as a .prof file for
+pstats or snakeviz and a .folded file of collapsed stacks for flame graph
+tools such as flamegraph.pl or speedscope. Requests that aren't profiled
+only pay for a header lookup and, with sampling on, a random number.
+"""
+import cProfile
+import math
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, NamedTuple
+
+PROFILE_DIR = "cache/profiles"
+PROFILE_HEADER = "X-Profile"
+MAX_PROFILES = 200
+# calls making up less than this many seconds along a stack are left out of
+# the collapsed stacks
+MIN_STACK_SECONDS = 1e-6
+
+
+class ProfileRecord(NamedTuple):
+    """
+    A profiled request
+
+    Attributes:
+        profile_id: A string identifying the profile
+        route: A string representing the url rule the request matched
+        path: A string representing the path requested
+        seconds: A float representing how long the request took
+        started: A string representing when the request started, in ISO
+            format
+        stats_path: A string representing the path to the .prof file
+        folded_path: A string representing the path to the .folded file
+    """
+
+    profile_id: str
+    route: str
+    path: str
+    seconds: float
+    started: str
+    stats_path: str
+    folded_path: str
+
+
+def _frame_name(func: tuple):
+    """
+    Name a function in a collapsed stack
+
+    Args:
+        func: A tuple of the function's file name, line number and name, as
+            used by pstats
+
+    Returns:
+        A string naming the function without any semicolons
+    """
+    file_name, line, name = func
+    if file_name == "~":
+        return name.replace(";", ",")
+    return f"{os.path.basename(file_name)}:{name}:{line}"
+
+
+def collapsed_stacks(stats: pstats.Stats):
+    """
+    Convert cProfile stats to collapsed stacks for flame graphs
+
+    cProfile only records which function called which, not whole stacks, so
+    each function's time is shared out among the stacks leading to it in
+    proportion to the time each caller spent calling it.
+
+    Args:
+        stats: A pstats.Stats object
+
+    Returns:
+        A dictionary mapping each stack, as function names joined by
+        semicolons from the outermost call, to the microseconds spent in the
+        innermost function's own code
+    """
+    # pylint: disable=no-member
+    entries = stats.stats
+    callees: Dict[tuple, List[tuple]] = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    stacks = {}
+
+    def walk(func, path, share):
+        own_time = entries[func][2]
+        path = path + (func,)
+        micros = own_time * share * 1e6
+        if micros >= 1:
+            key = ";".join(_frame_name(frame) for frame in path)
+            stacks[key] = stacks.get(key, 0) + micros
+        for callee, edge_time in callees.get(func, ()):
+            callee_total = entries[callee][3]
+            if callee in path or not callee_total:
+                continue
+            callee_share = share * edge_time / callee_total
+            if callee_share * callee_total >= MIN_STACK_SECONDS:
+                walk(callee, path, callee_share)
+
+    for func, (_, _, _, _, callers) in entries.items():
+        if not callers:
+            walk(func, (), 1.0)
+    return {stack: math.ceil(micros) for stack, micros in stacks.items()}
+
+
+class RequestProfiler:
+    """
+    Decides which requests to profile and keeps their results
+
+    Attributes:
+        directory: A string representing the directory profiles are saved in
+        sample_rate: A float between 0 and 1 representing the fraction of
+            requests profiled without being asked to
+        max_profiles: An integer representing how many profiles to keep, the
+            oldest are deleted first
+    """
+
+    directory: str
+    sample_rate: float
+    max_profiles: int
+
+    def __init__(
+        self,
+        directory: str = PROFILE_DIR,
+        sample_rate: float = 0.0,
+        max_profiles: int = MAX_PROFILES,
+    ):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_profiles = max_profiles
+        self._records: List[ProfileRecord] = []
+        self._lock = threading.Lock()
+        self._count = 0
+
+    def wanted(self, headers, args, allow_requested: bool = True):
+        """
+        Decide whether to profile a request
+
+        Args:
+            headers: The request's headers
+            args: The request's query arguments
+            allow_requested: A boolean representing whether a request can
+                ask to be profiled, rather than only being sampled
+
+        Returns:
+            True if the request should be profiled, False otherwise
+        """
+        requested = (
+            headers.get(PROFILE_HEADER) == "1" or args.get("profile") == "1"
+        )
+        if allow_requested and requested:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def save(self, profile: cProfile.Profile, route: str, path: str, started):
+        """
+        Save a finished request's profile
+
+        Args:
+            profile: The cProfile.Profile object that profiled the request
+            route: A string representing the url rule the request matched
+            path: A string representing the path requested
+            started: A float representing when the request started, from
+                time.perf_counter
+
+        Returns:
+            The ProfileRecord object of the saved profile
+        """
+        seconds = time.perf_counter() - started
+        with self._lock:
+            self._count += 1
+            profile_id = f"{int(time.time() * 1000)}-{self._count}"
+        stats_path, folded_path = self._dump(profile, route, profile_id)
+        record = ProfileRecord(
+            profile_id,
+            route,
+            path,
+            seconds,
+            datetime.fromtimestamp(time.time() - seconds).isoformat(
+                sep=" ", timespec="seconds"
+            ),
+            stats_path,
+            folded_path,
+        )
+        self._keep(record)
+        return record
+
+    def _dump(self, profile: cProfile.Profile, route: str, profile_id: str):
+        """
+        Write a profile's stats and folded stacks under its route's directory
+
+        Args:
+            profile: The cProfile.Profile object to write
+            route: A string representing the url rule the request matched
+            profile_id: A string identifying the profile
+
+        Returns:
+            A tuple of the paths of the stats file and the folded stacks file
+        """
+        route_dir = (
+            f"{self.directory}/{re.sub(r'[^A-Za-z0-9]+', '_', route) or '_'}"
+        )
+        os.makedirs(route_dir, exist_ok=True)
+        stats = pstats.Stats(profile)
+        stats_path = f"{route_dir}/{profile_id}.prof"
+        stats.dump_stats(stats_path)
+        folded_path = f"{route_dir}/{profile_id}.folded"
+        with open(folded_path, "w", encoding="UTF-8") as file:
+            for stack, micros in sorted(collapsed_stacks(stats).items()):
+                file.write(f"{stack} {micros}\n")
+        return stats_path, folded_path
+
+    def _keep(self, record: ProfileRecord):
+        """
+        Keep a saved profile, deleting the files of the oldest ones past
+        max_profiles
+
+        Args:
+            record: The ProfileRecord object of the saved profile
+        """
+        with self._lock:
+            self._records.append(record)
+            dropped = self._records[: -self.max_profiles]
+            del self._records[: -self.max_profiles]
+        for old in dropped:
+            for old_path in (old.stats_path, old.folded_path):
+                if os.path.exists(old_path):
+                    os.remove(old_path)
+
+    def slowest(self, count: int = 20):
+        """
+        List the slowest profiled requests
+
+        Args:
+            count: An integer representing how many requests to list
+
+        Returns:
+            A list of ProfileRecord objects, slowest first
+        """
+        with self._lock:
+            return sorted(
+                self._records, key=lambda record: record.seconds, reverse=True
+            )[:count]
+
+    def find(self, profile_id: str):
+        """
+        Find a kept profile
+
+        Args:
+            profile_id: A string identifying the profile
+
+        Returns:
+            The ProfileRecord object, or None if it isn't kept
+        """
+        with self._lock:
+            for record in self._records:
+                if record.profile_id == profile_id:
+                    return record
+        return None
@@ -0,0 +1,260 @@
+"""
+Workout reminders for every user, kept in a priority queue
+
+Each user has one entry in a heap ordered by when their next reminder is
+due, so a tick only looks at the reminders that are due instead of every
+user. A user whose workout days change gets a new entry and their old one is
+left in the heap, marked stale by the user's generation number, and skipped
+when it reaches the top.
+
+Reminders are delivered by a sink, any callable taking the user's name and
+the date of the workout they're reminded of. LogFileSink stands in for a real
+delivery service by appending each reminder to a file.
+"""
+import heapq
+import itertools
+import json
+import threading
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Dict
+from .schedule import Schedule
+from .storage import user_dirs
+
+REMINDER_TIME = time(7, 0)
+TICK_SECONDS = 60
+
+
+# sinks are callables, so they only need __call__
+# pylint: disable-next=too-few-public-methods
+class LogFileSink:
+    """
+    Deliver reminders by appending a line for each to a log file
+
+    Attributes:
+        path: A string representing the path to the log file
+    """
+
+    def __init__(self, path: str = "user_data/reminders.log"):
+        self.path = path
+
+    def __call__(self, user_name: str, workout_day: date):
+        with open(self.path, "a", encoding="UTF-8") as file:
+            file.write(
+                f"{datetime.now().isoformat(timespec='seconds')} "
+                f"{user_name}: workout on {workout_day.isoformat()}\n"
+            )
+
+
+# the heap, its tie breaking sequence, the generations marking stale entries
+# and the schedules they're worked out from all change together under _lock
+# pylint: disable-next=too-many-instance-attributes
+class ReminderScheduler:
+    """
+    A priority queue of when each user's next workout reminder is due
+
+    Attributes:
+        sink: A callable taking a user name and a datetime.date object,
+            called to deliver each reminder
+        reminder_time: A datetime.time object representing the time of day
+            reminders are sent on workout days
+    """
+
+    sink: Callable
+    reminder_time: time
+
+    def __init__(self, sink: Callable, reminder_time: time = REMINDER_TIME):
+        self.sink = sink
+        self.reminder_time = reminder_time
+        # entries are (due, sequence, user name, generation), the sequence
+        # keeps entries due at the same time in the order they were added
+        self._heap = []
+        self._sequence = itertools.count()
+        self._generations = {}
+        self._schedules: Dict[str, Schedule] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def __len__(self):
+        return len(self._schedules)
+
+    def _next_reminder(self, schedule: Schedule, after: date, now: datetime):
+        """
+        Find the workout day of a user's next reminder
+
+        Args:
+            schedule: A Schedule object of the user's workout days
+            after: A datetime.date object, the reminder is for a workout day
+                strictly after it
+            now: A datetime.datetime object representing the current time,
+                the reminder is due after it
+
+        Returns:
+            A datetime.date object representing the workout day
+        """
+        workout_day = schedule.next_day(
+            max(after, now.date() - timedelta(days=1))
+        )
+        if datetime.combine(workout_day, self.reminder_time) <= now:
+            workout_day = schedule.next_day(workout_day)
+        return workout_day
+
+    def _push(self, user_name: str, workout_day: date):
+        """
+        Add a heap entry for a user's reminder of a workout day
+
+        Args:
+            user_name: A string representing the user's name
+            workout_day: A datetime.date object representing the workout day
+        """
+        heapq.heappush(
+            self._heap,
+            (
+                datetime.combine(workout_day, self.reminder_time),
+                next(self._sequence),
+                user_name,
+                self._generations[user_name],
+            ),
+        )
+        # stale entries are only dropped as they reach the top, so rebuild
+        # the heap if they ever outnumber the live ones
+        if len(self._heap) > 2 * len(self._schedules) + 16:
+            self._heap = [
+                entry
+                for entry in self._heap
+                if self._generations.get(entry[2]) == entry[3]
+            ]
+            heapq.heapify(self._heap)
+
+    def schedule_user(
+        self, user_name: str, schedule: Schedule, now: datetime = None
+    ):
+        """
+        Add a user or replace their reminders after their workout days change
+
+        Args:
+            user_name: A string representing the user's name
+            schedule: A Schedule object of the user's workout days
+            now: A datetime.datetime object representing the current time.
+                Defaults to now
+        """
+        if now is None:
+            now = datetime.now()
+        with self._lock:
+            self._generations[user_name] = (
+                self._generations.get(user_name, 0) + 1
+            )
+            if not schedule:
+                self._schedules.pop(user_name, None)
+                return
+            self._schedules[user_name] = schedule
+            self._push(
+                user_name,
+                self._next_reminder(schedule, now.date() - timedelta(1), now),
+            )
+
+    def remove_user(self, user_name: str):
+        """
+        Stop sending a user reminders
+
+        Args:
+            user_name: A string representing the user's name
+        """
+        self.schedule_user(user_name, Schedule())
+
+    def next_due(self):
+        """
+        Find when the next reminder is due
+
+        Returns:
+            A datetime.datetime object, or None if no reminders are scheduled
+        """
+        with self._lock:
+            while self._heap and (
+                self._generations[self._heap[0][2]] != self._heap[0][3]
+            ):
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def tick(self, now: datetime = None):
+        """
+        Send every reminder that is due and schedule each user's next one
+
+        Args:
+            now: A datetime.datetime object representing the current time.
+                Defaults to now
+
+        Returns:
+            An integer representing the number of reminders sent
+        """
+        if now is None:
+            now = datetime.now()
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                fire_at, _, user_name, generation = heapq.heappop(self._heap)
+                if self._generations[user_name] != generation:
+                    continue
+                # reminders missed while the scheduler wasn't running
+                # aren't sent late
+                if fire_at.date() == now.date():
+                    due.append((user_name, fire_at.date()))
+                self._push(
+                    user_name,
+                    self._next_reminder(
+                        self._schedules[user_name], fire_at.date(), now
+                    ),
+                )
+        # delivered outside the lock so a slow sink doesn't hold up changes
+        for user_name, workout_day in due:
+            self.sink(user_name, workout_day)
+        return len(due)
+
+    def load_users(self, directory: str = "user_data", now: datetime = None):
+        """
+        Schedule reminders for every saved user with workout days
+
+        Args:
+            directory: A string representing the base directory of user data
+            now: A datetime.datetime object representing the current time.
+                Defaults to now
+        """
+        for name, user_dir in user_dirs(directory):
+            try:
+                with open(
+                    f"{user_dir}/{name}.json", "r", encoding="UTF-8"
+                ) as file:
+                    json_dict = json.load(file)
+            except (OSError, ValueError):
+                continue
+            self.schedule_user(
+                json_dict["_name"],
+                Schedule.from_json_dict(json_dict["_workout_days"]),
+                now,
+            )
+
+    def start(self, interval: float = TICK_SECONDS):
+        """
+        Tick in a background thread until stopped or the process exits
+
+        Args:
+            interval: A float representing the seconds between ticks
+
+        Returns:
+            The threading.Thread object running the ticks
+        """
+        self._stopped.clear()
+
+        def run():
+            self.tick()
+            while not self._stopped.wait(interval):
+                self.tick()
+
+        thread = threading.Thread(target=run, name="reminders", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        """
+        Stop the background thread started by start
+        """
+        self._stopped.set()
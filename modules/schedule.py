@@ -0,0 +1,236 @@
+"""
+Compact weekly workout schedules stored as 7-bit masks
+"""
+from datetime import date, timedelta
+from typing import Dict, Iterable, List
+import numpy as np
+from .dates import Weekday
+
+# every possible schedule fits in 7 bits, bit n set meaning Weekday(n) is a
+# workout day
+MASK_COUNT = 1 << 7
+FULL_MASK = MASK_COUNT - 1
+
+
+def _days_until_next(mask: int, weekday: int):
+    """
+    Find how many days after a weekday the next workout day in a mask is
+
+    Args:
+        mask: An integer representing the schedule bitmask
+        weekday: An integer representing the current weekday
+
+    Returns:
+        An integer from 1 to 7 representing the number of days until the
+        next workout day, or 0 if the mask has no workout days
+    """
+    for delta in range(1, 8):
+        if mask >> ((weekday + delta) % 7) & 1:
+            return delta
+    return 0
+
+
+# NEXT_DELTA[mask, weekday] is the number of days from weekday until the
+# next workout day strictly after it, or 0 for the empty schedule
+NEXT_DELTA = np.array(
+    [
+        [_days_until_next(mask, weekday) for weekday in range(7)]
+        for mask in range(MASK_COUNT)
+    ],
+    dtype=np.uint8,
+)
+_NEXT_DELTA_LISTS = NEXT_DELTA.tolist()
+
+
+class Schedule:
+    """
+    The days of the week a user plans to workout on
+
+    Attributes:
+        mask: An integer where bit n is set if Weekday(n) is a workout day
+    """
+
+    __slots__ = ("_mask",)
+
+    _mask: int
+
+    def __init__(self, mask: int = 0):
+        if not 0 <= mask <= FULL_MASK:
+            raise ValueError("Schedule mask must fit in 7 bits")
+        self._mask = mask
+
+    def __eq__(self, other):
+        return self.mask == other.mask
+
+    def __contains__(self, day: Weekday):
+        return bool(self.mask >> day.value & 1)
+
+    def __bool__(self):
+        return bool(self.mask)
+
+    @property
+    def mask(self):
+        """
+        Return private attribute mask
+        """
+        return self._mask
+
+    @classmethod
+    def from_days(cls, days: Iterable[Weekday]):
+        """
+        Create a schedule from workout days
+
+        Args:
+            days: An iterable of Weekday objects representing the days to
+                workout on
+
+        Returns:
+            A Schedule object with those days set
+        """
+        mask = 0
+        for day in days:
+            mask |= 1 << day.value
+        return cls(mask)
+
+    @classmethod
+    def from_json_dict(cls, json_dict: Dict[str, bool]):
+        """
+        Create a schedule from the "_workout_days" format used in user json
+
+        Args:
+            json_dict: A dictionary mapping weekday names, such as "MONDAY",
+                to booleans representing whether to workout on that day
+
+        Returns:
+            A Schedule object with the same days set
+        """
+        return cls.from_days(
+            Weekday[day] for day, value in json_dict.items() if value
+        )
+
+    def to_json_dict(self):
+        """
+        Convert the schedule to the "_workout_days" format used in user json
+
+        Returns:
+            A dictionary mapping every weekday name to a boolean
+        """
+        return {day.name: day in self for day in Weekday}
+
+    def to_workout_days(self):
+        """
+        Convert the schedule to a dictionary of Weekday objects
+
+        Returns:
+            A dictionary mapping every Weekday object to a boolean
+        """
+        return {day: day in self for day in Weekday}
+
+    def days(self):
+        """
+        List the workout days in the schedule
+
+        Returns:
+            A list of Weekday objects, starting with Monday
+        """
+        return [day for day in Weekday if day in self]
+
+    def is_planned(self, day: date):
+        """
+        Check whether a date falls on a workout day
+
+        Args:
+            day: A datetime.date object representing the date to check
+
+        Returns:
+            True if the date's weekday is a workout day, False otherwise
+        """
+        return bool(self.mask >> day.weekday() & 1)
+
+    def next_day(self, day: date):
+        """
+        Find the next workout day strictly after a date
+
+        Args:
+            day: A datetime.date object representing the date to search from
+
+        Returns:
+            A datetime.date object representing the next workout day. Returns
+            None if no workout days are set
+        """
+        delta = _NEXT_DELTA_LISTS[self.mask][day.weekday()]
+        if not delta:
+            return None
+        return day + timedelta(days=delta)
+
+    def project(self, start: date, end: date):
+        """
+        List every planned workout date in a date range
+
+        Jumps straight from one workout day to the next, so the cost depends
+        on the number of sessions rather than the number of days.
+
+        Args:
+            start: A datetime.date object representing the first day of the
+                range
+            end: A datetime.date object representing the last day of the
+                range, inclusive
+
+        Returns:
+            A list of datetime.date objects in ascending order
+        """
+        sessions = []
+        if not self.mask:
+            return sessions
+        table = _NEXT_DELTA_LISTS[self.mask]
+        day = self.next_day(start - timedelta(days=1))
+        while day <= end:
+            sessions.append(day)
+            day += timedelta(days=table[day.weekday()])
+        return sessions
+
+    def project_weeks(self, weeks: int, start: date = None):
+        """
+        List the planned workout dates over a number of weeks
+
+        Args:
+            weeks: An integer representing how many weeks to project
+            start: A datetime.date object representing the first day to
+                include. Defaults to today
+
+        Returns:
+            A list of datetime.date objects in ascending order
+        """
+        if start is None:
+            start = date.today()
+        return self.project(start, start + timedelta(weeks=weeks, days=-1))
+
+
+def next_workout_days(schedules: Dict[str, Schedule], day: date = None):
+    """
+    Find the next workout day after a date for many schedules at once
+
+    Args:
+        schedules: A dictionary mapping user names to their Schedule objects
+        day: A datetime.date object representing the date to search from.
+            Defaults to today
+
+    Returns:
+        A dictionary mapping each user name to a datetime.date object
+        representing their next workout day, or None if they have no workout
+        days set
+    """
+    if day is None:
+        day = date.today()
+    names: List[str] = list(schedules)
+    masks = np.fromiter(
+        (schedules[name].mask for name in names),
+        dtype=np.uint8,
+        count=len(names),
+    )
+    deltas = NEXT_DELTA[masks, day.weekday()]
+    next_dates = np.datetime64(day, "D") + deltas.astype("timedelta64[D]")
+    return {
+        name: next_date.item() if delta else None
+        for name, next_date, delta in zip(names, next_dates, deltas)
+    }
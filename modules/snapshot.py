@@ -0,0 +1,408 @@
+"""
+Binary snapshots of a user's full data for loading in a single read
+
+A snapshot file holds a header followed by a payload:
+    header: magic bytes b"LTRS", format version (uint16) and the CRC32 of
+        the payload (uint32)
+    payload: the size and modification time of every json and csv file the
+        snapshot was taken from, the size and checksum of the exercise
+        catalogue the ids refer to, then the user, their routines with the
+        id of any template each follows, exercises and history. Exercises
+        are stored by catalogue id, with their name only when it differs
+        from the canonical name. History is stored per exercise as an array
+        of date ordinals and a flat array of 32 bit float weights.
+
+A snapshot is only used while the files it was taken from are unchanged, so
+anything that writes those files without regenerating the snapshot makes
+loading fall back to them.
+"""
+import os
+import struct
+import zlib
+from array import array
+from datetime import date
+from typing import List, Tuple
+from .catalogue import CATALOGUE
+from .schedule import Schedule
+from .templates import TEMPLATES
+from .workouts import Routine, Exercise
+
+MAGIC = b"LTRS"
+VERSION = 3
+
+_HEADER = struct.Struct("<4sHI")
+_COUNT = struct.Struct("<I")
+_FILE_STAT = struct.Struct("<qq")
+_USER = struct.Struct("<qB")
+_CATALOGUE = struct.Struct("<II")
+_EXERCISE = struct.Struct("<IH")
+
+
+def snapshot_path(user_dir: str, name_no_spaces: str):
+    """
+    Find the path of a user's snapshot file
+
+    Args:
+        user_dir: A string representing the user's data directory
+        name_no_spaces: A string representing the user's name with spaces
+            replaced by underscores
+
+    Returns:
+        A string representing the path to the snapshot file
+    """
+    return f"{user_dir}/{name_no_spaces}.snap"
+
+
+def source_files(name_no_spaces: str, routine_names: List[str]):
+    """
+    List the json and csv files a user's data is loaded from
+
+    Args:
+        name_no_spaces: A string representing the user's name with spaces
+            replaced by underscores
+        routine_names: A list of strings representing the user's routines
+
+    Returns:
+        A list of strings representing paths relative to the user's data
+        directory
+    """
+    files = [f"{name_no_spaces}.json"]
+    for routine_name in routine_names:
+        routine_name = routine_name.replace(" ", "_")
+        files.append(f"{routine_name}/{routine_name}.json")
+        files.append(f"{routine_name}/{routine_name}.csv")
+    return files
+
+
+def _file_stat(path: str):
+    """
+    Find the modification time and size of a file
+
+    Args:
+        path: A string representing the path to the file
+
+    Returns:
+        A tuple of two integers, the modification time in nanoseconds and the
+        size in bytes, or (0, -1) if the file doesn't exist
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return 0, -1
+    return stat.st_mtime_ns, stat.st_size
+
+
+class _Writer:
+    """
+    Builds a snapshot payload from packed parts
+    """
+
+    def __init__(self):
+        self.parts = []
+
+    def pack(self, packer: struct.Struct, *values):
+        """
+        Add values packed with a struct
+        """
+        self.parts.append(packer.pack(*values))
+
+    def string(self, value: str):
+        """
+        Add a length prefixed utf-8 string
+        """
+        encoded = value.encode("UTF-8")
+        self.pack(_COUNT, len(encoded))
+        self.parts.append(encoded)
+
+    def array(self, values: array):
+        """
+        Add a length prefixed array
+        """
+        self.pack(_COUNT, len(values))
+        self.parts.append(values.tobytes())
+
+
+class _Reader:
+    """
+    Reads packed parts back out of a snapshot payload
+    """
+
+    def __init__(self, data: bytes):
+        self.data = memoryview(data)
+        self.offset = 0
+
+    def unpack(self, packer: struct.Struct):
+        """
+        Read values packed with a struct
+        """
+        values = packer.unpack_from(self.data, self.offset)
+        self.offset += packer.size
+        return values
+
+    def count(self):
+        """
+        Read a count
+        """
+        return self.unpack(_COUNT)[0]
+
+    def string(self):
+        """
+        Read a length prefixed utf-8 string
+        """
+        length = self.count()
+        value = str(self.data[self.offset : self.offset + length], "UTF-8")
+        self.offset += length
+        return value
+
+    def array(self, typecode: str):
+        """
+        Read a length prefixed array
+        """
+        values = array(typecode)
+        length = self.count()
+        end = self.offset + length * values.itemsize
+        if end > len(self.data):
+            raise ValueError("Snapshot is truncated")
+        values.frombytes(self.data[self.offset : end])
+        self.offset = end
+        return values
+
+
+def _write_exercise(
+    writer: _Writer, exercise: Exercise, exercise_id: int, archived_days: set
+):
+    """
+    Write an exercise and the history it keeps in its routine's csv log
+
+    Args:
+        writer: The _Writer to write to
+        exercise: An Exercise object to write
+        exercise_id: An integer representing the exercise's catalogue id
+        archived_days: A set of strings representing the dates that live in
+            the routine's archives
+    """
+    writer.pack(_EXERCISE, exercise_id, exercise.sets)
+    # most exercises use the canonical name, so only store others
+    if exercise.name == CATALOGUE.name(exercise_id):
+        writer.string("")
+    else:
+        writer.string(exercise.name)
+    # archived sessions live in the archives, like in the csv log
+    history = {
+        day: day_weights
+        for day, day_weights in exercise.history.items()
+        if day not in archived_days
+    }
+    ordinals = (date.fromisoformat(day).toordinal() for day in history)
+    writer.array(array("I", ordinals))
+    weights = array("f")
+    for day_weights in history.values():
+        weights.extend(day_weights)
+    writer.array(weights)
+
+
+def write_snapshot(user, user_dir: str):
+    """
+    Write a snapshot of a user's data, taken against the current state of
+    the json and csv files in the user's data directory
+
+    Args:
+        user: A User object to take a snapshot of
+        user_dir: A string representing the user's data directory
+    """
+    name_no_spaces = user.name.replace(" ", "_")
+    writer = _Writer()
+
+    files = source_files(name_no_spaces, list(user.routines))
+    writer.pack(_COUNT, len(files))
+    for file in files:
+        writer.string(file)
+        writer.pack(_FILE_STAT, *_file_stat(f"{user_dir}/{file}"))
+
+    exercise_ids = {
+        exercise.name: exercise.exercise_id
+        for routine in user.routines.values()
+        for exercise in routine.exercises.values()
+    }
+    catalogue_size = len(CATALOGUE)
+    writer.pack(_CATALOGUE, catalogue_size, CATALOGUE.checksum(catalogue_size))
+    writer.string(user.name)
+    writer.pack(_USER, user.xp_points, user.schedule.mask)
+    writer.pack(_COUNT, len(user.routines))
+    for routine in user.routines.values():
+        archived_days = set(routine.archived_days)
+        writer.string(routine.name)
+        writer.string(
+            "" if routine.template is None else routine.template.template_id
+        )
+        writer.pack(_COUNT, len(routine.exercises))
+        for exercise in routine.exercises.values():
+            _write_exercise(
+                writer, exercise, exercise_ids[exercise.name], archived_days
+            )
+
+    payload = b"".join(writer.parts)
+    path = snapshot_path(user_dir, name_no_spaces)
+    with open(f"{path}.tmp", "wb") as file:
+        file.write(_HEADER.pack(MAGIC, VERSION, zlib.crc32(payload)))
+        file.write(payload)
+    os.replace(f"{path}.tmp", path)
+
+
+def _read_payload(path: str):
+    """
+    Read and verify the payload of a snapshot file
+
+    Args:
+        path: A string representing the path to the snapshot file
+
+    Returns:
+        The payload as bytes, or None if the file is missing, from another
+        format version or corrupt
+    """
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        return None
+    if len(data) < _HEADER.size:
+        return None
+    magic, version, checksum = _HEADER.unpack_from(data)
+    payload = data[_HEADER.size :]
+    if magic != MAGIC or version != VERSION or zlib.crc32(payload) != checksum:
+        return None
+    return payload
+
+
+def _is_fresh(reader: _Reader, user_dir: str):
+    """
+    Check that the files a snapshot was taken from haven't changed
+
+    Args:
+        reader: A _Reader positioned at the start of the payload
+        user_dir: A string representing the user's data directory
+
+    Returns:
+        True if every file still has the size and modification time recorded
+        in the snapshot, False otherwise
+    """
+    fresh = True
+    for _ in range(reader.count()):
+        file = reader.string()
+        recorded: Tuple[int, int] = reader.unpack(_FILE_STAT)
+        # keep reading so the reader ends up past the file list
+        fresh = fresh and recorded == _file_stat(f"{user_dir}/{file}")
+    return fresh
+
+
+def _read_exercise(reader: _Reader, catalogue_size: int, iso_dates: dict):
+    """
+    Read an exercise written by _write_exercise
+
+    Args:
+        reader: A _Reader positioned at the start of the exercise
+        catalogue_size: An integer representing how many exercises the
+            catalogue had when the snapshot was taken
+        iso_dates: A dictionary caching the date string of each ordinal
+            already read
+
+    Returns:
+        An Exercise object
+
+    Raises:
+        ValueError: The exercise isn't in the catalogue or its history
+            doesn't match its number of sets
+    """
+    exercise_id, sets = reader.unpack(_EXERCISE)
+    if exercise_id >= catalogue_size:
+        raise ValueError("Snapshot exercise isn't in the catalogue")
+    exercise = Exercise(reader.string() or CATALOGUE.name(exercise_id), sets)
+    ordinals = reader.array("I")
+    weights = reader.array("f")
+    if len(weights) != len(ordinals) * sets:
+        raise ValueError("Snapshot history doesn't match sets")
+    for ordinal in ordinals:
+        if ordinal not in iso_dates:
+            iso_dates[ordinal] = date.fromordinal(ordinal).isoformat()
+    exercise.history.update(
+        zip(
+            map(iso_dates.__getitem__, ordinals),
+            (
+                weights[start : start + sets]
+                for start in range(0, len(weights), sets or 1)
+            ),
+        )
+    )
+    return exercise
+
+
+def _read_routine(reader: _Reader, catalogue_size: int, iso_dates: dict):
+    """
+    Read a routine and its exercises
+
+    Args:
+        reader: A _Reader positioned at the start of the routine
+        catalogue_size: An integer representing how many exercises the
+            catalogue had when the snapshot was taken
+        iso_dates: A dictionary caching the date string of each ordinal
+            already read
+
+    Returns:
+        A Routine object
+
+    Raises:
+        ValueError: The routine's template isn't published, or one of its
+            exercises can't be read
+    """
+    routine = Routine(reader.string())
+    template_id = reader.string()
+    if template_id:
+        template = TEMPLATES.get(template_id)
+        if template is None:
+            raise ValueError("Snapshot template isn't published")
+        routine = Routine.from_template(template, routine.name)
+    for _ in range(reader.count()):
+        exercise = _read_exercise(reader, catalogue_size, iso_dates)
+        if template_id:
+            # fills in history without leaving the template
+            routine.exercises[exercise.name] = exercise
+        else:
+            routine.add_exercise(exercise)
+    return routine
+
+
+def read_snapshot(user_cls, user_dir: str, name_no_spaces: str):
+    """
+    Restore a user from their snapshot
+
+    Args:
+        user_cls: The User class to create the user with
+        user_dir: A string representing the user's data directory
+        name_no_spaces: A string representing the user's name with spaces
+            replaced by underscores
+
+    Returns:
+        A User object, or None if the snapshot is missing, corrupt or older
+        than the files it was taken from
+    """
+    payload = _read_payload(snapshot_path(user_dir, name_no_spaces))
+    if payload is None:
+        return None
+    try:
+        reader = _Reader(payload)
+        if not _is_fresh(reader, user_dir):
+            return None
+        catalogue_size, checksum = reader.unpack(_CATALOGUE)
+        if CATALOGUE.checksum(catalogue_size) != checksum:
+            return None
+
+        user = user_cls(reader.string(), 0)
+        xp_points, mask = reader.unpack(_USER)
+        user.gain_xp(xp_points)
+        user.set_schedule(Schedule(mask))
+        iso_dates = {}
+        for _ in range(reader.count()):
+            user.add_routine(_read_routine(reader, catalogue_size, iso_dates))
+    except (struct.error, ValueError, UnicodeDecodeError):
+        return None
+    return user
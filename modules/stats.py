@@ -0,0 +1,276 @@
+"""
+Nightly gym-wide statistics over every user
+
+Summarizing a user means loading all of their files, so each user's summary
+is kept between runs in [directory]/stats_users.json along with the newest
+modification time of their files, and a run only loads the users whose files
+changed since. The combined statistics are written to [directory]/stats.json
+for the admin page to serve without touching any user's files.
+"""
+import json
+import os
+import sys
+from datetime import date, datetime
+import pandas as pd
+from .batch import (
+    FRAME_COLUMNS,
+    discover_users,
+    history_columns,
+    load_chunk,
+    map_chunks,
+)
+from .catalogue import CATALOGUE
+from .dates import Weekday
+from .storage import user_data_dir
+
+STATS_NAME = "stats.json"
+USER_STATS_NAME = "stats_users.json"
+TOP_EXERCISES = 20
+
+
+def user_mtime(user_dir: str):
+    """
+    Find when any of a user's files last changed
+
+    Args:
+        user_dir: A string representing the user's data directory
+
+    Returns:
+        A float representing the newest modification time, in seconds since
+        the epoch, of the directory and everything in it
+    """
+    newest = 0.0
+    for root, _, files in os.walk(user_dir):
+        newest = max(newest, os.stat(root).st_mtime)
+        for file_name in files:
+            newest = max(newest, os.stat(f"{root}/{file_name}").st_mtime)
+    return newest
+
+
+def _summarize_chunk(args):
+    """
+    Load a chunk of users and summarize each of them
+
+    Args:
+        args: A tuple of a list of the users' directory names, the data
+            directory and the earliest history to load
+
+    Returns:
+        A tuple of a dictionary mapping each user's directory name to their
+        summary, and a dictionary mapping the directory name of each user
+        that couldn't be loaded to the error message
+    """
+    loaded = load_chunk(args)
+    columns, errors = history_columns(loaded)
+    sets = pd.DataFrame(columns, columns=FRAME_COLUMNS)
+    sets["Exercise"] = sets["Exercise"].map(CATALOGUE.canonical_name)
+    per_exercise = sets.groupby(["User", "Exercise"]).agg(
+        sessions=("Date", "nunique"), volume=("Weight", "sum")
+    )
+
+    summaries = {}
+    for name, user in loaded:
+        if name in errors:
+            continue
+        summaries[name] = {
+            "level": user.level(),
+            "workout_days": [
+                day.name
+                for day, planned in user.workout_days.items()
+                if planned
+            ],
+            "exercises": {},
+        }
+    for (name, exercise), row in per_exercise.iterrows():
+        summaries[name]["exercises"][exercise] = [
+            int(row["sessions"]),
+            float(row["volume"]),
+        ]
+    return summaries, {name: repr(error) for name, error in errors.items()}
+
+
+def combine_stats(summaries: dict):
+    """
+    Combine user summaries into gym-wide statistics
+
+    Args:
+        summaries: A dictionary mapping each user's directory name to their
+            summary
+
+    Returns:
+        A dictionary of the number of users, the most popular exercises, the
+        average volume of a session of each exercise, how many users are at
+        each level and how many users plan to work out on each weekday
+    """
+    rows = pd.DataFrame(
+        [
+            (name, exercise, sessions, volume)
+            for name, summary in summaries.items()
+            for exercise, (sessions, volume) in summary["exercises"].items()
+        ],
+        columns=["User", "Exercise", "Sessions", "Volume"],
+    )
+    by_exercise = (
+        rows.groupby("Exercise")
+        .agg(
+            users=("User", "nunique"),
+            sessions=("Sessions", "sum"),
+            volume=("Volume", "sum"),
+        )
+        .sort_values(["sessions", "users"], ascending=False)
+    )
+    levels = pd.Series(
+        [summary["level"] for summary in summaries.values()], dtype=int
+    ).value_counts()
+    weekdays = pd.Series(
+        [
+            day
+            for summary in summaries.values()
+            for day in summary["workout_days"]
+        ],
+        dtype=object,
+    ).value_counts()
+    return {
+        "users": len(summaries),
+        "popular_exercises": [
+            [exercise, int(row["users"]), int(row["sessions"])]
+            for exercise, row in by_exercise.head(TOP_EXERCISES).iterrows()
+        ],
+        "average_volume": {
+            exercise: round(float(row["volume"] / row["sessions"]), 1)
+            for exercise, row in by_exercise.iterrows()
+            if row["sessions"]
+        },
+        "levels": {
+            str(level): int(levels[level]) for level in sorted(levels.index)
+        },
+        "weekdays": {
+            day.name: int(weekdays.get(day.name, 0)) for day in Weekday
+        },
+    }
+
+
+def _write_json(json_dict: dict, path: str):
+    """
+    Write a json file without leaving a partly written file behind
+
+    Args:
+        json_dict: A dictionary to write
+        path: A string representing the path to write
+    """
+    with open(f"{path}.tmp", "w", encoding="UTF-8") as file:
+        json.dump(json_dict, file, separators=(",", ":"))
+    os.replace(f"{path}.tmp", path)
+
+
+def _read_summaries(path: str):
+    """
+    Read the per user summaries written by the last run
+
+    Args:
+        path: A string representing the path of the per user summaries
+
+    Returns:
+        A dictionary mapping each user's name to their summary, empty if
+        there was no last run
+    """
+    try:
+        with open(path, "r", encoding="UTF-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def update_stats(
+    directory: str = "user_data",
+    workers: int = None,
+    chunk_size: int = None,
+    full: bool = False,
+):
+    """
+    Summarize the users whose files changed since the last run, then write
+    the combined statistics
+
+    Args:
+        directory: A string representing the base directory of user data
+        workers: An integer representing the number of worker processes.
+            Defaults to the number of CPUs
+        chunk_size: An integer representing how many users each worker loads
+            at a time. Defaults to about four chunks per worker
+        full: A boolean representing whether to summarize every user again,
+            even if their files haven't changed
+
+    Returns:
+        A dictionary of the statistics written, as read by read_stats
+    """
+    user_stats_path = f"{directory}/{USER_STATS_NAME}"
+    summaries = {} if full else _read_summaries(user_stats_path)
+
+    names = discover_users(directory)
+    # users whose data was deleted drop out of the statistics
+    summaries = {name: summaries[name] for name in names if name in summaries}
+    # taken before loading, so a change made during the run is picked up by
+    # the next one
+    mtimes = {
+        name: user_mtime(user_data_dir(name, directory)) for name in names
+    }
+    changed = [
+        name
+        for name in names
+        if name not in summaries or mtimes[name] > summaries[name]["mtime"]
+    ]
+
+    errors = {}
+    if changed:
+        for chunk_summaries, chunk_errors in map_chunks(
+            _summarize_chunk,
+            directory,
+            changed,
+            workers=workers,
+            chunk_size=chunk_size,
+            since=date.min,
+        ):
+            for name, summary in chunk_summaries.items():
+                summaries[name] = {"mtime": mtimes[name], **summary}
+            for name in chunk_errors:
+                # summarized again next run, once the files are fixed
+                summaries.pop(name, None)
+            errors.update(chunk_errors)
+
+    stats = {
+        "generated": datetime.now().isoformat(timespec="seconds"),
+        "updated_users": len(changed),
+        "errors": errors,
+        **combine_stats(summaries),
+    }
+    _write_json(summaries, user_stats_path)
+    _write_json(stats, f"{directory}/{STATS_NAME}")
+    return stats
+
+
+def read_stats(directory: str = "user_data"):
+    """
+    Read the statistics written by the last run
+
+    Args:
+        directory: A string representing the base directory of user data
+
+    Returns:
+        A dictionary of the statistics, or None if they haven't been computed
+    """
+    try:
+        with open(f"{directory}/{STATS_NAME}", "r", encoding="UTF-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+if __name__ == "__main__":
+    # run nightly, for example from cron:
+    # python -m modules.stats [--full]
+    nightly_stats = update_stats(full="--full" in sys.argv[1:])
+    print(
+        f"{nightly_stats['users']} users, "
+        f"{nightly_stats['updated_users']} updated, "
+        f"{len(nightly_stats['errors'])} errors"
+    )
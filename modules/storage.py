@@ -0,0 +1,245 @@
+"""
+Where each user's data lives under the base data directory
+
+Users are spread over two levels of shard directories named after the
+leading hex digits of a hash of their name:
+    [directory]/[ab]/[cd]/[USERNAME]/
+so no directory holds more than a few hundred entries however many users
+there are. Users saved before sharding live at [directory]/[USERNAME]/ and
+are found there until they're migrated.
+
+Migrating a user moves their directory into its shard and leaves a symlink
+at the old path, so a process that found the old path before the move keeps
+reading and writing the same files. The links can be removed once every
+process using the data directory has restarted.
+"""
+
+import glob
+import hashlib
+import os
+import string
+import sys
+from .journal import journal_path
+
+SHARD_DEPTH = 2
+SHARD_WIDTH = 2
+
+
+def shard_dir(name_no_spaces: str, directory: str = "user_data"):
+    """
+    Find the sharded directory of a user
+
+    Args:
+        name_no_spaces: A string representing the user's name with spaces
+            replaced by underscores
+        directory: A string representing the base directory of user data
+
+    Returns:
+        A string representing the path to the user's directory
+    """
+    digest = hashlib.sha256(name_no_spaces.encode("UTF-8")).hexdigest()
+    shards = [
+        digest[level * SHARD_WIDTH : (level + 1) * SHARD_WIDTH]
+        for level in range(SHARD_DEPTH)
+    ]
+    return "/".join([directory, *shards, name_no_spaces])
+
+
+def user_data_dir(user_name: str, directory: str = "user_data"):
+    """
+    Find the directory of a user's data, which is their sharded directory
+    unless they were saved before sharding and haven't been migrated
+
+    Args:
+        user_name: A string representing the user's name
+        directory: A string representing the base directory of user data
+
+    Returns:
+        A string representing the path to the user's directory, which may
+        not exist yet
+    """
+    name_no_spaces = user_name.replace(" ", "_")
+    path = shard_dir(name_no_spaces, directory)
+    if not os.path.isdir(path):
+        legacy_path = f"{directory}/{name_no_spaces}"
+        if os.path.isdir(legacy_path):
+            return legacy_path
+    return path
+
+
+def _has_user_files(path: str, name: str):
+    """
+    Check whether a directory holds a user's json or journal
+
+    Args:
+        path: A string representing the path to the directory
+        name: A string representing the directory's name
+
+    Returns:
+        True if the directory has the files of a user named after it
+    """
+    return os.path.isfile(f"{path}/{name}.json") or os.path.isfile(
+        journal_path(path)
+    )
+
+
+def _is_shard(entry: os.DirEntry):
+    """
+    Check whether a directory entry is a shard directory rather than an
+    unmigrated user's directory
+
+    Args:
+        entry: An os.DirEntry object of a directory
+
+    Returns:
+        True if the entry is a shard directory
+    """
+    return (
+        len(entry.name) == SHARD_WIDTH
+        and all(char in string.hexdigits.lower() for char in entry.name)
+        and not _has_user_files(entry.path, entry.name)
+    )
+
+
+def _directories(path: str):
+    """
+    List the directories in a directory, leaving out symlinks
+
+    Args:
+        path: A string representing the path to the directory
+
+    Returns:
+        A list of os.DirEntry objects
+    """
+    with os.scandir(path) as entries:
+        return [
+            entry for entry in entries if entry.is_dir(follow_symlinks=False)
+        ]
+
+
+def user_dirs(directory: str = "user_data"):
+    """
+    Find every user's directory, whether sharded or not
+
+    Symlinks left behind by migration are skipped, so each user is found
+    once.
+
+    Args:
+        directory: A string representing the base directory of user data
+
+    Yields:
+        Tuples of a string representing the user's directory name and a
+        string representing the path to the directory
+    """
+    if not os.path.isdir(directory):
+        return
+
+    def walk(path: str, depth: int):
+        for entry in _directories(path):
+            if depth < SHARD_DEPTH:
+                yield from walk(entry.path, depth + 1)
+            else:
+                yield entry.name, entry.path
+
+    for entry in _directories(directory):
+        if _is_shard(entry):
+            yield from walk(entry.path, 1)
+        else:
+            yield entry.name, entry.path
+
+
+def routine_json_paths(directory: str = "user_data"):
+    """
+    Find the json file of every routine of every user
+
+    Args:
+        directory: A string representing the base directory of user data
+
+    Returns:
+        A list of strings representing the paths to the routine json files
+    """
+    return [
+        path
+        for _, user_dir in user_dirs(directory)
+        for path in glob.glob(f"{glob.escape(user_dir)}/*/*.json")
+    ]
+
+
+def migrate_user(name_no_spaces: str, directory: str = "user_data"):
+    """
+    Move an unmigrated user's directory into its shard, leaving a symlink at
+    the old path
+
+    Args:
+        name_no_spaces: A string representing the user's directory name
+        directory: A string representing the base directory of user data
+
+    Returns:
+        True if the user was moved, False if they were already sharded or
+        have no directory
+    """
+    legacy_path = f"{directory}/{name_no_spaces}"
+    path = shard_dir(name_no_spaces, directory)
+    if os.path.islink(legacy_path) or not os.path.isdir(legacy_path):
+        return False
+    if os.path.exists(path):
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # a rename within one file system is atomic, files held open by other
+    # processes move with it
+    os.rename(legacy_path, path)
+    os.symlink(os.path.relpath(path, directory), legacy_path)
+    return True
+
+
+def migrate_all(directory: str = "user_data"):
+    """
+    Move every unmigrated user into their shard
+
+    Args:
+        directory: A string representing the base directory of user data
+
+    Returns:
+        A list of strings representing the directory names of the users
+        moved
+    """
+    return [
+        name
+        for name, path in list(user_dirs(directory))
+        if path == f"{directory}/{name}"
+        and _has_user_files(path, name)
+        and migrate_user(name, directory)
+    ]
+
+
+def remove_links(directory: str = "user_data"):
+    """
+    Remove the symlinks migration left at users' old paths, once no process
+    is using the old paths
+
+    Args:
+        directory: A string representing the base directory of user data
+
+    Returns:
+        An integer representing the number of links removed
+    """
+    removed = 0
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_symlink() and os.path.realpath(
+                entry.path
+            ) == os.path.realpath(shard_dir(entry.name, directory)):
+                os.remove(entry.path)
+                removed += 1
+    return removed
+
+
+if __name__ == "__main__":
+    # safe to run while the website is up:
+    # python -m modules.storage, then python -m modules.storage --remove-links
+    # after restarting every process using the data directory
+    if "--remove-links" in sys.argv[1:]:
+        print(f"removed {remove_links()} links")
+    else:
+        for moved in migrate_all():
+            print(f"moved {moved}")
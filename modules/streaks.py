@@ -0,0 +1,236 @@
+"""
+Streak and adherence tracking for LTRAC users
+"""
+from datetime import date
+from typing import Iterable, Set
+from .schedule import FULL_MASK, NEXT_DELTA, Schedule
+
+
+class StreakTracker:
+    """
+    Tracks how consistently a user trains on their planned workout days
+
+    A streak is the number of consecutive planned workout days the user
+    trained on. Training on a day that isn't planned neither extends nor
+    breaks the streak, and doesn't count towards adherence, which only
+    measures planned days. If the user has no workout days planned, every
+    day counts as planned.
+
+    Attributes:
+        schedule: A Schedule object representing the planned workout days
+        trained_days: A set of datetime.date objects representing every day
+            the user logged a workout
+        longest_streak: An integer representing the longest streak reached
+    """
+
+    __slots__ = (
+        "_schedule",
+        "_mask",
+        "_trained_days",
+        "_streak",
+        "_longest_streak",
+        "_last_counted",
+    )
+
+    _schedule: Schedule
+    _mask: int
+    _trained_days: Set[date]
+    _streak: int
+    _longest_streak: int
+    _last_counted: date
+
+    def __init__(self, schedule: Schedule = None):
+        self._schedule = Schedule() if schedule is None else schedule
+        # an empty schedule means every day is planned
+        self._mask = self._schedule.mask or FULL_MASK
+        self._trained_days = set()
+        self._streak = 0
+        self._longest_streak = 0
+        self._last_counted = None
+
+    def __eq__(self, other):
+        return all(
+            getattr(self, slot) == getattr(other, slot)
+            for slot in self.__slots__
+        )
+
+    @property
+    def schedule(self):
+        """
+        Return private attribute schedule
+        """
+        return self._schedule
+
+    @property
+    def trained_days(self):
+        """
+        Return private attribute trained_days
+        """
+        return self._trained_days
+
+    @property
+    def longest_streak(self):
+        """
+        Return private attribute longest_streak
+        """
+        return self._longest_streak
+
+    @classmethod
+    def from_routines(cls, routines: Iterable, schedule: Schedule):
+        """
+        Build a tracker in a single pass over the logged history of routines
+
+        Args:
+            routines: An iterable of Routine objects whose exercise history
+                and archived sessions should be counted as workout sessions
+            schedule: A Schedule object representing the planned workout days
+
+        Returns:
+            A StreakTracker object reflecting all logged history
+        """
+        tracker = cls(schedule)
+        for routine in routines:
+            tracker.trained_days.update(
+                date.fromisoformat(day) for day in routine.archived_days
+            )
+            for _, exercise in routine.exercises.items():
+                tracker.trained_days.update(
+                    date.fromisoformat(day) for day in exercise.history
+                )
+        tracker.rebuild()
+        return tracker
+
+    def is_planned(self, day: date):
+        """
+        Check whether a day is a planned workout day
+
+        Args:
+            day: A datetime.date object representing the day to check
+
+        Returns:
+            True if the day is planned, False otherwise
+        """
+        return bool(self._mask >> day.weekday() & 1)
+
+    def _missed_between(self, start: date, end: date):
+        """
+        Check whether a planned day strictly between two days was missed
+
+        Days strictly between the last counted day and a later day can only
+        have been trained if they are unplanned, so it is enough to check
+        whether the next planned day comes before the later day.
+
+        Args:
+            start: A datetime.date object representing the earlier day
+            end: A datetime.date object representing the later day
+
+        Returns:
+            True if a planned day between start and end was missed
+        """
+        return int(NEXT_DELTA[self._mask, start.weekday()]) < (end - start).days
+
+    def set_schedule(self, schedule: Schedule):
+        """
+        Change the planned workout days and recompute streaks against them
+
+        Args:
+            schedule: A Schedule object representing the planned workout days
+        """
+        if schedule != self.schedule:
+            self._schedule = schedule
+            self._mask = schedule.mask or FULL_MASK
+            self.rebuild()
+
+    def rebuild(self):
+        """
+        Recompute the current and longest streak from all trained days
+        """
+        self._streak = 0
+        self._longest_streak = 0
+        self._last_counted = None
+        for day in sorted(self.trained_days):
+            self._count(day)
+
+    def _count(self, day: date):
+        """
+        Advance the streak with a trained day that is after every day
+        counted so far
+
+        Args:
+            day: A datetime.date object representing the trained day
+        """
+        if not self.is_planned(day):
+            return
+        if self._last_counted is None or self._missed_between(
+            self._last_counted, day
+        ):
+            self._streak = 1
+        else:
+            self._streak += 1
+        self._last_counted = day
+        self._longest_streak = max(self._longest_streak, self._streak)
+
+    def record(self, day: date):
+        """
+        Record a workout session on a day, updating streaks incrementally
+
+        Args:
+            day: A datetime.date object representing the day of the session
+        """
+        if day in self.trained_days:
+            return
+        self.trained_days.add(day)
+        if self._last_counted is not None and day < self._last_counted:
+            # a session logged out of order can change any streak after it
+            self.rebuild()
+        else:
+            self._count(day)
+
+    def current_streak(self, today: date = None):
+        """
+        Find the streak the user is currently on
+
+        A planned day that is still today doesn't break the streak, since the
+        user can still train on it.
+
+        Args:
+            today: A datetime.date object representing the current date.
+                Defaults to today
+
+        Returns:
+            An integer representing the number of consecutive planned days
+            trained on
+        """
+        if today is None:
+            today = date.today()
+        if self._last_counted is None or self._missed_between(
+            self._last_counted, today
+        ):
+            return 0
+        return self._streak
+
+    def adherence(self, start: date, end: date, today: date = None):
+        """
+        Find the percentage of planned days trained on in a date range, up
+        to today so days still to come don't count as missed
+
+        Args:
+            start: A datetime.date object representing the first day of the
+                range
+            end: A datetime.date object representing the last day of the
+                range, inclusive
+            today: A datetime.date object representing the last day that
+                can have been trained on. Defaults to today
+
+        Returns:
+            A float between 0 and 100 representing the percentage of planned
+            days trained on. Returns None if no days in the range up to
+            today are planned
+        """
+        if today is None:
+            today = date.today()
+        planned = Schedule(self._mask).project(start, min(end, today))
+        if not planned:
+            return None
+        trained = sum(day in self.trained_days for day in planned)
+        return 100 * trained / len(planned)
@@ -0,0 +1,202 @@
+"""
+Routine templates shared by every user
+
+A template is a single stored definition of a routine's exercises and sets.
+A routine adopted from a template refers to it instead of holding its own
+copy: its json only names the template, and its exercises are built from
+the template the first time they're needed. It follows the template until
+the user adds an exercise, when it becomes an ordinary routine saved with
+its own copy. History is always the user's own.
+
+A template never changes once published, so a routine saved as a reference
+always gets the same exercises back. A new version of a template is
+published under a new id.
+
+Templates other than the built in ones are saved as
+[directory]/templates.json in the form
+{template id: {"name": name, "exercises": [[exercise name, sets], ...]}}
+"""
+import json
+import os
+from typing import Dict, NamedTuple, Tuple
+
+
+class RoutineTemplate(NamedTuple):
+    """
+    A routine definition shared by every user who adopts it
+
+    Attributes:
+        template_id: A string identifying the template
+        name: A string representing the name given to adopted routines
+        exercises: A tuple of tuples of each exercise's name and number of
+            sets, in order
+    """
+
+    template_id: str
+    name: str
+    exercises: Tuple[Tuple[str, int], ...]
+
+
+BUILTIN_TEMPLATES = (
+    RoutineTemplate(
+        "push-v1",
+        "Push",
+        (
+            ("Bench Press", 4),
+            ("Overhead Press", 3),
+            ("Incline Dumbbell Press", 3),
+            ("Lateral Raise", 3),
+            ("Tricep Pushdown", 3),
+        ),
+    ),
+    RoutineTemplate(
+        "pull-v1",
+        "Pull",
+        (
+            ("Deadlift", 3),
+            ("Pull Up", 3),
+            ("Barbell Row", 3),
+            ("Face Pull", 3),
+            ("Barbell Curl", 3),
+        ),
+    ),
+    RoutineTemplate(
+        "legs-v1",
+        "Legs",
+        (
+            ("Back Squat", 4),
+            ("Romanian Deadlift", 3),
+            ("Leg Press", 3),
+            ("Leg Curl", 3),
+            ("Calf Raise", 4),
+        ),
+    ),
+    RoutineTemplate(
+        "full-body-v1",
+        "FullBody",
+        (
+            ("Back Squat", 3),
+            ("Bench Press", 3),
+            ("Barbell Row", 3),
+            ("Overhead Press", 2),
+            ("Romanian Deadlift", 2),
+        ),
+    ),
+)
+
+
+class TemplateLibrary:
+    """
+    Every routine template, by id
+
+    Attributes:
+        templates: A dictionary mapping template ids to RoutineTemplate
+            objects, in the order they were published
+    """
+
+    templates: Dict[str, RoutineTemplate]
+    _builtin: frozenset
+    _file_stat: tuple
+
+    def __init__(self, templates: Tuple[RoutineTemplate, ...] = ()):
+        self.templates = {}
+        for template in templates:
+            self.publish(template)
+        self._builtin = frozenset(self.templates)
+        self._file_stat = None
+
+    def __len__(self):
+        return len(self.templates)
+
+    def __iter__(self):
+        return iter(self.templates.values())
+
+    def get(self, template_id: str):
+        """
+        Find a template
+
+        Args:
+            template_id: A string identifying the template
+
+        Returns:
+            The RoutineTemplate object, or None if there's no such template
+        """
+        return self.templates.get(template_id)
+
+    def publish(self, template: RoutineTemplate):
+        """
+        Add a template
+
+        Args:
+            template: The RoutineTemplate object to add
+
+        Raises:
+            ValueError: A different template was already published with the
+                same id
+        """
+        template = RoutineTemplate(
+            template.template_id,
+            template.name,
+            tuple((name, int(sets)) for name, sets in template.exercises),
+        )
+        existing = self.templates.get(template.template_id)
+        if existing is not None and existing != template:
+            raise ValueError(
+                f"Template {template.template_id} is already published"
+            )
+        self.templates[template.template_id] = template
+
+    def load(self, path: str):
+        """
+        Add the templates in a saved library. Does nothing if the file
+        hasn't changed since it was last loaded or saved
+
+        Args:
+            path: A string representing the path to templates.json
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return
+        if (stat.st_mtime_ns, stat.st_size) == self._file_stat:
+            return
+        with open(path, "r", encoding="UTF-8") as file:
+            json_dict = json.load(file)
+        for template_id, item in json_dict.items():
+            self.publish(
+                RoutineTemplate(
+                    template_id,
+                    item["name"],
+                    tuple(tuple(exercise) for exercise in item["exercises"]),
+                )
+            )
+        self._file_stat = (stat.st_mtime_ns, stat.st_size)
+
+    def save(self, path: str):
+        """
+        Save every template that isn't built in, first adding any another
+        process saved
+
+        Args:
+            path: A string representing the path to templates.json
+        """
+        self.load(path)
+        json_dict = {
+            template.template_id: {
+                "name": template.name,
+                "exercises": [
+                    list(exercise) for exercise in template.exercises
+                ],
+            }
+            for template in self
+            if template.template_id not in self._builtin
+        }
+        with open(f"{path}.tmp", "w", encoding="UTF-8") as file:
+            json.dump(json_dict, file, indent=4)
+        os.replace(f"{path}.tmp", path)
+        stat = os.stat(path)
+        self._file_stat = (stat.st_mtime_ns, stat.st_size)
+
+
+# shared by every user so a template is only held in memory once
+TEMPLATES = TemplateLibrary(BUILTIN_TEMPLATES)
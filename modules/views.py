@@ -0,0 +1,101 @@
+"""
+Immutable snapshots of a user for read-only pages
+
+A snapshot is taken once per change to the user and shared by every request
+that renders from it, so pages read a consistent copy while other requests
+keep changing the live User object.
+"""
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional, Tuple
+
+
+class ExerciseView(NamedTuple):
+    """
+    A snapshot of an exercise, without its history
+
+    Attributes:
+        name: A string representing the name of the exercise
+        sets: An integer representing the number of sets
+        personal_record: A number representing the highest weight logged, or
+            None if no weights have been logged
+    """
+
+    name: str
+    sets: int
+    personal_record: Optional[float]
+
+
+class RoutineView(NamedTuple):
+    """
+    A snapshot of a routine, without its history
+
+    Attributes:
+        name: A string representing the name of the routine
+        exercises: A read-only mapping of exercise names to ExerciseView
+            objects, in the order they were added
+    """
+
+    name: str
+    exercises: Mapping[str, ExerciseView]
+
+
+class UserView(NamedTuple):
+    """
+    A snapshot of a user
+
+    Attributes:
+        name: A string representing the name of the user
+        version: An integer representing the user's data version the
+            snapshot was taken at
+        xp_points: An integer representing the user's experience points
+        level: An integer representing the user's level
+        level_progress: A tuple of the xp earned within the current level
+            and the xp the current level takes in total
+        routines: A read-only mapping of routine names to RoutineView objects
+    """
+
+    name: str
+    version: int
+    xp_points: int
+    level: int
+    level_progress: Tuple[int, int]
+    routines: Mapping[str, RoutineView]
+
+
+def snapshot_user(user):
+    """
+    Take a snapshot of a user, who shouldn't change while it's taken
+
+    Args:
+        user: The User object to take a snapshot of
+
+    Returns:
+        A UserView object
+    """
+    return UserView(
+        user.name,
+        user.version,
+        user.xp_points,
+        user.level(),
+        user.level_progress(),
+        MappingProxyType(
+            {
+                name: RoutineView(
+                    routine.name,
+                    MappingProxyType(
+                        {
+                            exercise_name: ExerciseView(
+                                exercise.name,
+                                exercise.sets,
+                                exercise.personal_record(),
+                            )
+                            for exercise_name, exercise in (
+                                routine.exercises.items()
+                            )
+                        }
+                    ),
+                )
+                for name, routine in user.routines.items()
+            }
+        ),
+    )
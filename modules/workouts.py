@@ -3,10 +3,55 @@ Classes for creating a workout routine for LTRAC
 """
 
 import json
+import math
+import sys
+from array import array
 from datetime import date
-from typing import Dict, List
+from typing import Callable, Dict, List
 import pandas as pd
 from flask import request
+from .autocomplete import EXERCISE_INDEX
+from .archive import ArchiveMeta, read_archive
+from .catalogue import CATALOGUE
+from .history_codec import read_log, write_log
+from .templates import TEMPLATES, RoutineTemplate
+
+
+def to_weight(value):
+    """
+    Convert a logged weight to a float
+
+    Args:
+        value: A string, integer or float representing a logged weight
+
+    Returns:
+        A float representing the weight, or NaN if it can't be converted
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def weight_value(weight: float):
+    """
+    Convert a stored weight back to the number it was logged as
+
+    Weights are stored as 32 bit floats, so they are rounded to the
+    precision a 32 bit float holds and whole numbers are returned as
+    integers.
+
+    Args:
+        weight: A float representing a stored weight
+
+    Returns:
+        An integer or float representing the weight, or NaN if the weight
+        wasn't logged
+    """
+    if math.isnan(weight):
+        return weight
+    weight = float(f"{weight:.7g}")
+    return int(weight) if weight.is_integer() else weight
 
 
 class Exercise:
@@ -14,24 +59,40 @@ class Exercise:
     A gym exercise with number of sets
 
     Attributes:
-        name: A string representing the name of the routine
+        name: A string representing the name of the routine, interned so
+            every exercise with the same name shares one string
+        exercise_id: An integer representing the exercise's id in the
+            canonical exercise catalogue
         sets: An integer representing the number of sets for the exercise
-        history: A dictionary mapping strings of dates to a list of integers,
-            representing the weights used on that day. The length of the list
-            will be equal to the number of sets.
+        history: A dictionary mapping strings of dates to an array of floats,
+            representing the weights used on that day. The length of the
+            array will be equal to the number of sets. Sets that weren't
+            logged are NaN.
+        archived_record: A float representing the heaviest weight in
+            archived history, which may not be loaded, or None if nothing
+            is archived
     """
 
+    __slots__ = ("_name", "_sets", "_history", "_archived_record")
+
     _name: str
     _sets: int
-    _history: Dict[str, List[int]]
+    _history: Dict[str, array]
+    _archived_record: float
 
     def __init__(self, name: str, sets: int):
-        self._name = name
-        self._sets = sets
+        self._name = sys.intern(name)
+        # sets can arrive as a string from Flask or json, so convert it once
+        self._sets = int(sets)
         self._history = {}
+        self._archived_record = None
 
     def __eq__(self, other):
-        return self.__dict__ == other.__dict__
+        return (self.name, self.sets, self.history) == (
+            other.name,
+            other.sets,
+            other.history,
+        )
 
     @property
     def name(self):
@@ -40,6 +101,31 @@ class Exercise:
         """
         return self._name
 
+    @property
+    def archived_record(self):
+        """
+        Return private attribute archived_record
+        """
+        return self._archived_record
+
+    def set_archived_record(self, weight: float):
+        """
+        Set the heaviest weight in the exercise's archived history
+
+        Args:
+            weight: A float representing the heaviest archived weight, or
+                None if nothing is archived
+        """
+        self._archived_record = weight
+
+    @property
+    def exercise_id(self):
+        """
+        Return the exercise's id in the canonical exercise catalogue, adding
+        the exercise to the catalogue the first time
+        """
+        return CATALOGUE.id_for(self.name)
+
     @property
     def sets(self):
         """
@@ -76,19 +162,22 @@ class Exercise:
 
         Args:
             date: A string representing the date in ISO format (YYYY-MM-DD)
-            weights: A list of integers representing the weights used in the
-                exercise. Length of list should be equal to the number of sets
-                for the exercise.
+            weights: A list of numbers or numeric strings representing the
+                weights used in the exercise. Length of list should be equal
+                to the number of sets for the exercise.
 
         Raises:
             ValueError: Inputted number of weights does not match number of
                 sets for the exercise
         """
-        if len(weights) != int(self.sets):
+        if len(weights) != self.sets:
             raise ValueError(
                 "Number of weights logged does not match number of sets"
             )
-        self.history[date_iso] = weights
+        # every exercise logged on a day shares one copy of the date string
+        self.history[sys.intern(date_iso)] = array(
+            "f", map(to_weight, weights)
+        )
 
     def log_weights_today(self, weights: List[int]):
         """
@@ -103,15 +192,26 @@ class Exercise:
 
     def personal_record(self):
         """
-        Find the highest weight logged for the exercise
+        Find the highest weight logged for the exercise, including archived
+        history that isn't loaded
 
         Returns:
-            An integer representing the highest weight logged. Returns None if
-            history is empty
-        """
-        if not self.history:
-            return None
-        return max(sum([weights for _, weights in self.history.items()], []))
+            A number representing the highest weight logged. Returns None if
+            no weights have been logged
+        """
+        record = max(
+            (
+                weight
+                for weights in self.history.values()
+                for weight in weights
+                if not math.isnan(weight)
+            ),
+            default=None,
+        )
+        archived = self.archived_record
+        if archived is not None and (record is None or archived > record):
+            record = archived
+        return None if record is None else weight_value(record)
 
 
 class Routine:
@@ -122,23 +222,41 @@ class Routine:
         exercises: A dictionary mapping the string of the exercise name to the
             corresponding exercise object
         name: A string representing the name of the routine
+        archive: An ArchiveMeta object describing the history archived from
+            the routine's csv log, or None if nothing is archived
+        template: The RoutineTemplate object the routine was adopted from,
+            or None if it has exercises of its own
     """
 
+    __slots__ = ("_exercises", "_name", "_archive", "_listener", "_template")
+
     _exercises: Dict[str, Exercise]
     _name: str
+    _archive: ArchiveMeta
+    _listener: Callable
+    _template: RoutineTemplate
 
     def __init__(self, name: str):
         self._exercises = {}
         self._name = name
+        self._archive = None
+        self._listener = None
+        self._template = None
 
     def __eq__(self, other):
-        return self.__dict__ == other.__dict__
+        return (self.exercises, self.name) == (other.exercises, other.name)
 
     @property
     def exercises(self):
         """
-        Return private attribute exercises
+        Return private attribute exercises, building them from the routine's
+        template the first time
         """
+        if self._exercises is None:
+            self._exercises = {
+                name: Exercise(name, sets)
+                for name, sets in self._template.exercises
+            }
         return self._exercises
 
     @property
@@ -148,6 +266,27 @@ class Routine:
         """
         return self._name
 
+    @property
+    def archive(self):
+        """
+        Return private attribute archive
+        """
+        return self._archive
+
+    @property
+    def template(self):
+        """
+        Return private attribute template
+        """
+        return self._template
+
+    @property
+    def archived_days(self):
+        """
+        Return the ISO dates of every archived session of the routine
+        """
+        return () if self.archive is None else self.archive.days
+
     @classmethod
     def from_input(cls, name_id: str):
         """
@@ -159,6 +298,22 @@ class Routine:
         """
         return cls(request.args.get(name_id))
 
+    @classmethod
+    def from_template(cls, template: RoutineTemplate, name: str = None):
+        """
+        Create a routine that follows a template until its exercises are
+        changed
+
+        Args:
+            template: The RoutineTemplate object to follow
+            name: A string representing the name of the routine. Defaults to
+                the template's name
+        """
+        routine = cls(template.name if name is None else name)
+        routine._exercises = None
+        routine._template = template
+        return routine
+
     @classmethod
     def from_json(cls, file_path: str):
         """
@@ -166,9 +321,17 @@ class Routine:
 
         Args:
             file_path: A string representing the path to the json file
+
+        Raises:
+            KeyError: The routine follows a template that isn't published
         """
         with open(file_path, "r", encoding="UTF-8") as file:
             json_dict = json.load(file)
+        if "_template" in json_dict:
+            template = TEMPLATES.get(json_dict["_template"])
+            if template is None:
+                raise KeyError(f"Unknown template {json_dict['_template']}")
+            return cls.from_template(template, json_dict["_name"])
         routine = Routine(json_dict["_name"])
         for key, item in json_dict["_exercises"].items():
             exercise = Exercise(item["_name"], item["_sets"])
@@ -177,12 +340,28 @@ class Routine:
 
     def add_exercise(self, exercise: Exercise):
         """
-        Add an exercise to the routine
+        Add an exercise to the routine, which then stops following its
+        template
 
         Args:
             exercise: An Exercise object to be added to the routine
         """
         self.exercises[exercise.name] = exercise
+        self._template = None
+        EXERCISE_INDEX.add(exercise.name)
+        if self._listener is not None:
+            self._listener(self, exercise)
+
+    def set_listener(self, listener: Callable):
+        """
+        Set a function to be called whenever an exercise is added, so the
+        routine's owner can record the change
+
+        Args:
+            listener: A function taking the Routine and the added Exercise,
+                or None to stop listening
+        """
+        self._listener = listener
 
     def add_exercise_from_input(self, name_id: str, sets_id: str):
         """
@@ -199,43 +378,99 @@ class Routine:
 
     def to_json(self, file_path: str):
         """
-        Export routine to json file
+        Export routine to json file, which only names the template of a
+        routine following one
 
         Args:
             file_path: A string representing the path to the json file
         """
-        json_dict = self.__dict__.copy()
-        json_dict["_exercises"] = {
-            key: {"_name": ex.name, "_sets": ex.sets}
-            for key, ex in json_dict["_exercises"].items()
-        }
+        if self.template is not None:
+            json_dict = {
+                "_name": self.name,
+                "_template": self.template.template_id,
+            }
+        else:
+            json_dict = {
+                "_exercises": {
+                    key: {"_name": ex.name, "_sets": ex.sets}
+                    for key, ex in self.exercises.items()
+                },
+                "_name": self.name,
+            }
         with open(file_path, "w", encoding="UTF-8") as file:
             file.write(json.dumps(json_dict, indent=4))
 
-    def export_log(self, file_path: str):
+    def export_log(self, file_path: str, codec: str = None):
         """
-        Export history of each exercise to single csv
+        Export history of each exercise to single csv, leaving out sessions
+        that have been archived. The archive metadata next to the csv is read
+        again first, so sessions archived since the routine was loaded aren't
+        written back
 
         Args:
             file_path: A string representing the path to the csv file
+            codec: A string representing how to store the log, "csv" or a
+                codec of history_codec. Defaults to HISTORY_CODEC
         """
+        self.load_archive_meta(file_path)
+        archived_days = set(self.archived_days)
         log_df = pd.DataFrame()
         for _, ex in self.exercises.items():
-            ex_df = pd.DataFrame(ex.history)
-            ex_df.insert(0, "Exercise", [ex.name] * int(ex.sets))
-            ex_df.insert(1, "Set", list(range(1, int(ex.sets) + 1)))
+            ex_df = pd.DataFrame(
+                {
+                    day: [weight_value(weight) for weight in weights]
+                    for day, weights in ex.history.items()
+                    if day not in archived_days
+                },
+                index=range(ex.sets),
+            )
+            ex_df.insert(0, "Exercise", [ex.name] * ex.sets)
+            ex_df.insert(1, "Set", list(range(1, ex.sets + 1)))
             log_df = pd.concat([log_df, ex_df], ignore_index=True)
-        log_df.to_csv(file_path)
+        write_log(log_df, file_path, codec)
 
-    def load_log(self, file_path: str):
+    def load_log(self, file_path: str, since: date = None):
         """
         Load history of each exercise from csv. Assumes the routine is already
         initialized with matching exercises through json.
 
+        Only sessions still in the csv log are loaded unless since is given,
+        in which case the archives of every year from since on are read too.
+        The csv log may be plain or encoded by history_codec.
+
+        Args:
+            file_path: A string representing the path to the csv file
+            since: A datetime.date object representing the earliest history
+                needed, or None to only load the csv log
+        """
+        routine_df = read_log(file_path)
+        self.load_archive_meta(file_path)
+        if self.archive is not None and since is not None:
+            for year in self.archive.years_since(since):
+                self._load_frame(read_archive(file_path, year))
+        # loaded last so the csv log wins over an archive with the same day
+        self._load_frame(routine_df)
+
+    def load_archive_meta(self, file_path: str):
+        """
+        Load what has been archived from the routine's csv log, including the
+        archived personal record of each exercise
+
         Args:
             file_path: A string representing the path to the csv file
         """
-        routine_df = pd.read_csv(file_path, index_col=0)
+        self._archive = ArchiveMeta.read(file_path)
+        records = {} if self.archive is None else self.archive.records
+        for _, ex in self.exercises.items():
+            ex.set_archived_record(records.get(ex.name))
+
+    def _load_frame(self, routine_df: pd.DataFrame):
+        """
+        Load history of each exercise from a routine log
+
+        Args:
+            routine_df: A pandas DataFrame in the csv log format
+        """
         for _, ex in self.exercises.items():
             ex_df = routine_df[routine_df["Exercise"] == ex.name]
             days = list(routine_df.columns[2:])
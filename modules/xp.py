@@ -0,0 +1,344 @@
+"""
+Rules for awarding experience points and turning them into levels in LTRAC
+"""
+
+import math
+from bisect import bisect_right
+from datetime import date
+from typing import Dict, List, NamedTuple
+from .streaks import StreakTracker
+from .workouts import to_weight
+
+
+def heaviest(weights):
+    """
+    Find the heaviest logged weight, ignoring anything that isn't a number
+
+    Args:
+        weights: An iterable of logged weights as strings, integers or floats
+
+    Returns:
+        A float representing the heaviest weight, or None if there are none
+    """
+    return max(
+        (
+            weight
+            for weight in map(to_weight, weights)
+            if not math.isnan(weight)
+        ),
+        default=None,
+    )
+
+
+def is_new_record(previous_record, weights: List[float]):
+    """
+    Check whether a session's weights beat an exercise's personal record
+
+    The first session logged for an exercise doesn't count as a new record.
+
+    Args:
+        previous_record: The highest weight logged before the session, or
+            None if nothing was logged before
+        weights: A list of floats representing the weights logged for each
+            set in the session
+
+    Returns:
+        True if the heaviest set beat the previous record, False otherwise
+    """
+    previous_record = to_weight(previous_record)
+    if math.isnan(previous_record):
+        return False
+    return any(weight > previous_record for weight in weights)
+
+
+class Session(NamedTuple):
+    """
+    A single logged routine on a single day
+
+    Attributes:
+        day: A datetime.date object representing the day of the session
+        routine: A string representing the name of the routine logged
+        weights: A dictionary mapping exercise names to the list of weights
+            logged for each set
+        new_prs: An integer representing how many exercises beat their
+            personal record in this session
+        streak: An integer representing the user's streak including this
+            session
+    """
+
+    day: date
+    routine: str
+    weights: Dict[str, List[float]]
+    new_prs: int
+    streak: int
+
+
+# rules are callables taking a Session, so they only need __call__
+# pylint: disable=too-few-public-methods
+class FlatXP:
+    """
+    Award the same amount of xp for every session
+
+    Attributes:
+        amount: An integer representing the xp awarded per session
+    """
+
+    def __init__(self, amount: int = 100):
+        self.amount = amount
+
+    def __call__(self, session: Session):
+        return self.amount
+
+
+class VolumeXP:
+    """
+    Award xp in proportion to the total weight lifted in a session
+
+    Attributes:
+        per_unit: A float representing the xp awarded per unit of weight
+    """
+
+    def __init__(self, per_unit: float = 0.01):
+        self.per_unit = per_unit
+
+    def __call__(self, session: Session):
+        # unlogged sets are NaN, and a weight too big for a float is skipped
+        # rather than overflowing the xp
+        volume = sum(
+            weight
+            for weights in session.weights.values()
+            for weight in weights
+            if math.isfinite(weight)
+        )
+        xp_points = volume * self.per_unit
+        return int(xp_points) if math.isfinite(xp_points) else 0
+
+
+class PersonalRecordXP:
+    """
+    Award bonus xp for every exercise that beat its personal record
+
+    Attributes:
+        bonus: An integer representing the xp awarded per new record
+    """
+
+    def __init__(self, bonus: int = 50):
+        self.bonus = bonus
+
+    def __call__(self, session: Session):
+        return self.bonus * session.new_prs
+
+
+class StreakXP:
+    """
+    Award bonus xp for keeping a streak going
+
+    Attributes:
+        per_day: An integer representing the xp awarded per day of streak
+        cap: An integer representing the most xp awarded for a streak
+    """
+
+    def __init__(self, per_day: int = 10, cap: int = 100):
+        self.per_day = per_day
+        self.cap = cap
+
+    def __call__(self, session: Session):
+        return min(self.per_day * max(session.streak - 1, 0), self.cap)
+
+
+# pylint: enable=too-few-public-methods
+
+
+def user_sessions(user):
+    """
+    Group a user's routine history into the sessions it was logged in
+
+    Args:
+        user: A User object whose routine history should be grouped
+
+    Returns:
+        A dictionary mapping each (date string, routine name) pair to a
+        dictionary of exercise names to the list of weights logged
+    """
+    sessions = {}
+    for routine in user.routines.values():
+        for exercise in routine.exercises.values():
+            for day, weights in exercise.history.items():
+                sessions.setdefault((day, routine.name), {})[
+                    exercise.name
+                ] = weights.tolist()
+    return sessions
+
+
+class LevelCurve:
+    """
+    A precomputed table of the total xp needed to reach each level
+
+    Levels past the end of the table keep the xp step of the last level.
+
+    Attributes:
+        thresholds: A list of integers where thresholds[n] is the total xp
+            needed to reach level n. thresholds[0] is always 0
+    """
+
+    thresholds: List[int]
+
+    def __init__(self, thresholds: List[int]):
+        if len(thresholds) < 2 or thresholds[0] != 0:
+            raise ValueError("Thresholds must start at 0 and have a level 1")
+        if any(low >= high for low, high in zip(thresholds, thresholds[1:])):
+            raise ValueError("Thresholds must be strictly increasing")
+        self.thresholds = thresholds
+        self._last_step = thresholds[-1] - thresholds[-2]
+
+    @classmethod
+    def linear(cls, xp_per_level: int, max_level: int = 100):
+        """
+        Create a curve where every level takes the same amount of xp
+
+        Args:
+            xp_per_level: An integer representing the xp needed per level
+            max_level: An integer representing the number of levels in the
+                table
+
+        Returns:
+            A LevelCurve object
+        """
+        return cls([level * xp_per_level for level in range(max_level + 1)])
+
+    @classmethod
+    def geometric(cls, first_level: int, growth: float, max_level: int = 100):
+        """
+        Create a curve where each level takes a fixed factor more xp than the
+        level before it
+
+        Args:
+            first_level: An integer representing the xp needed for level 1
+            growth: A float representing how many times more xp each level
+                takes than the previous one
+            max_level: An integer representing the number of levels in the
+                table
+
+        Returns:
+            A LevelCurve object
+        """
+        thresholds = [0]
+        for level in range(max_level):
+            thresholds.append(
+                thresholds[-1] + max(round(first_level * growth**level), 1)
+            )
+        return cls(thresholds)
+
+    def level(self, xp_points: int):
+        """
+        Find the level reached with an amount of xp
+
+        Args:
+            xp_points: An integer representing the amount of xp
+
+        Returns:
+            An integer representing the level
+        """
+        last_level = len(self.thresholds) - 1
+        if xp_points >= self.thresholds[-1]:
+            return last_level + (
+                (xp_points - self.thresholds[-1]) // self._last_step
+            )
+        return bisect_right(self.thresholds, xp_points) - 1
+
+    def level_start(self, level: int):
+        """
+        Find the total xp needed to reach a level
+
+        Args:
+            level: An integer representing the level
+
+        Returns:
+            An integer representing the total xp needed
+        """
+        last_level = len(self.thresholds) - 1
+        if level > last_level:
+            return self.thresholds[-1] + (level - last_level) * self._last_step
+        return self.thresholds[level]
+
+    def progress(self, xp_points: int):
+        """
+        Find how far through their current level an amount of xp is
+
+        Args:
+            xp_points: An integer representing the amount of xp
+
+        Returns:
+            A tuple of two integers, the xp earned within the current level
+            and the xp the current level takes in total
+        """
+        level = self.level(xp_points)
+        start = self.level_start(level)
+        return xp_points - start, self.level_start(level + 1) - start
+
+
+class XPEngine:
+    """
+    A set of xp rules and the level curve they feed into
+
+    Attributes:
+        rules: A list of callables that each take a Session and return the
+            xp it earns under that rule
+        curve: A LevelCurve object used to turn xp into levels
+    """
+
+    def __init__(self, rules: List = None, curve: LevelCurve = None):
+        if rules is None:
+            rules = [FlatXP(), VolumeXP(), PersonalRecordXP(), StreakXP()]
+        if curve is None:
+            curve = LevelCurve.linear(1000)
+        self.rules = rules
+        self.curve = curve
+
+    def award(self, session: Session):
+        """
+        Find the xp a session earns under every rule
+
+        Args:
+            session: A Session object representing the logged session
+
+        Returns:
+            An integer representing the total xp earned
+        """
+        return sum(rule(session) for rule in self.rules)
+
+    def replay(self, user):
+        """
+        Find the xp a user would have under these rules by replaying every
+        session in their history in date order
+
+        Args:
+            user: A User object whose routine history should be replayed
+
+        Returns:
+            An integer representing the total xp earned
+        """
+        sessions = user_sessions(user)
+        tracker = StreakTracker(user.schedule)
+        records = {}
+        total = 0
+        for (day, routine_name), weights in sorted(sessions.items()):
+            day = date.fromisoformat(day)
+            tracker.record(day)
+            new_prs = 0
+            for exercise_name, exercise_weights in weights.items():
+                key = (routine_name, exercise_name)
+                new_prs += is_new_record(records.get(key), exercise_weights)
+                best = heaviest(exercise_weights)
+                if best is not None and best > records.get(key, -math.inf):
+                    records[key] = best
+            total += self.award(
+                Session(
+                    day,
+                    routine_name,
+                    weights,
+                    new_prs,
+                    tracker.current_streak(day),
+                )
+            )
+        return total
@@ -0,0 +1,84 @@
+"""
+A job recomputing every user's xp under new xp rules
+
+Each user is replayed in a worker process while holding the lock on their
+data directory, which the app holds for as long as it has the user logged
+in. A user the app has open is skipped and reported as busy rather than
+saved under it, so the job can be run again for them later. Replaying reads
+archived history too, but only the new xp is saved: the routine files are
+left alone and the snapshot leaves archived sessions out.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from .journal import user_dir_locked
+from .profile import User
+from .storage import user_data_dir, user_dirs
+from .xp import XPEngine
+
+
+def _recompute_user(args):
+    """
+    Replay one user's history and save their new xp
+
+    Args:
+        args: A tuple of the user's name, the data directory and the
+            XPEngine to use
+
+    Returns:
+        A tuple of the user's name and either their new xp or the exception
+        raised while recomputing it, a BlockingIOError if the app has them
+        open
+    """
+    name, directory, engine = args
+    try:
+        with user_dir_locked(user_data_dir(name, directory), blocking=False):
+            # replaying needs every session, including archived ones
+            user = User.load_user_data(
+                name, directory=directory, since=date.min
+            )
+            # journal the new xp too, or replaying an older journaled xp over
+            # the saved json would undo it
+            user.open_journal(directory)
+            user.recompute_xp(engine)
+            user.close_journal()
+            user.to_json(directory)
+        return name, user.xp_points
+    except (OSError, ValueError, KeyError) as error:
+        return name, error
+
+
+def recompute_all(
+    directory: str = "user_data", engine: XPEngine = None, workers: int = None
+):
+    """
+    Replay every user's history under new rules in parallel and save the
+    recomputed xp
+
+    Args:
+        directory: A string representing the base directory of user data
+        engine: An XPEngine object with the new rules. Defaults to the
+            default engine
+        workers: An integer representing the number of worker processes.
+            Defaults to the number of CPUs
+
+    Returns:
+        A dictionary mapping each user name to their new xp, or to the
+        exception raised if their data couldn't be recomputed
+    """
+    if engine is None:
+        engine = XPEngine()
+    names = [
+        name
+        for name, user_dir in user_dirs(directory)
+        if os.path.isfile(f"{user_dir}/{name}.json")
+    ]
+    chunk_size = max(len(names) // (4 * (workers or os.cpu_count())), 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return dict(
+            executor.map(
+                _recompute_user,
+                [(name, directory, engine) for name in names],
+                chunksize=chunk_size,
+            )
+        )
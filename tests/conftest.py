@@ -0,0 +1,22 @@
+"""
+Fixtures shared by the unit tests
+"""
+
+import shutil
+import pytest
+
+
+@pytest.fixture
+def data_dir(request, tmp_path):
+    """
+    Copy the sample users to a temporary directory
+
+    Returns:
+        A string representing the base directory of user data
+    """
+    shutil.copytree(
+        f"{request.fspath.dirname}/static_data/users",
+        tmp_path,
+        dirs_exist_ok=True,
+    )
+    return str(tmp_path)
@@ -0,0 +1,139 @@
+"""
+Unit tests for the JSON API
+"""
+
+import gzip
+import json
+import sys
+import zlib
+import pytest
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+import app as app_module
+from modules.api import MIN_COMPRESS_SIZE, weights_to_json
+from modules.profile import User
+from modules.workouts import Routine, Exercise
+
+
+@pytest.fixture
+def client():
+    """
+    Create a test client logged in as a sample user with a logged routine
+
+    Returns:
+        A flask test client
+    """
+    user = User("username", 1500)
+    user.add_routine(Routine("routine1"))
+    for number in range(20):
+        user.routines["routine1"].add_exercise(Exercise(f"exercise{number}", 2))
+    exercise = user.routines["routine1"].exercises["exercise0"]
+    exercise.log_weights("2023-05-01", [10, 20])
+    exercise.log_weights("2023-05-03", [15, ""])
+    app_module.user = user
+    return app_module.app.test_client()
+
+
+def test_weights_to_json():
+    """
+    Test that unlogged sets become None and whole weights become integers
+    """
+    assert weights_to_json([float("nan"), 2.0, 2.5]) == [None, 2, 2.5]
+
+
+# pylint: disable=redefined-outer-name
+def test_routines(client):
+    """
+    Test that routines are listed with their exercises and records
+
+    Args:
+        client: The flask test client to use
+    """
+    routine = client.get("/api/v1/routines").get_json()["routines"][0]
+    assert routine["name"] == "routine1"
+    assert routine["exercises"][0] == {
+        "name": "exercise0",
+        "sets": 2,
+        "personal_record": 20,
+    }
+
+
+def test_exercise_history_range(client):
+    """
+    Test that exercise history is limited to the requested dates
+
+    Args:
+        client: The flask test client to use
+    """
+    response = client.get(
+        "/api/v1/routines/routine1/exercises/exercise0?start=2023-05-02"
+    )
+    assert response.get_json()["history"] == {"2023-05-03": [15, None]}
+
+
+def test_exercise_chart(client):
+    """
+    Test that chart series skip unlogged sets and estimate the one rep max
+
+    Args:
+        client: The flask test client to use
+    """
+    response = client.get(
+        "/api/v1/routines/routine1/exercises/exercise0/chart?width=10&reps=3"
+    )
+    assert response.get_json() == {
+        "max_weight": [["2023-05-01", 20], ["2023-05-03", 15]],
+        "volume": [["2023-05-01", 30], ["2023-05-03", 15]],
+        "estimated_1rm": [["2023-05-01", 22], ["2023-05-03", 16.5]],
+    }
+
+
+def test_missing_routine(client):
+    """
+    Test that an unknown routine is a 404 with a JSON error
+
+    Args:
+        client: The flask test client to use
+    """
+    response = client.get("/api/v1/routines/missing")
+    assert response.status_code == 404
+    assert response.get_json()["errors"]
+
+
+@pytest.mark.parametrize(
+    "encoding,decompress",
+    [("gzip", gzip.decompress), ("deflate", zlib.decompress)],
+)
+def test_compression(client, encoding, decompress):
+    """
+    Test that responses are compressed with the encoding the client accepts
+
+    Args:
+        client: The flask test client to use
+        encoding: A string representing the accepted encoding
+        decompress: A function that undoes the encoding
+    """
+    response = client.get(
+        "/api/v1/routines", headers={"Accept-Encoding": encoding}
+    )
+    assert response.headers["Content-Encoding"] == encoding
+    assert "Accept-Encoding" in response.headers["Vary"]
+    body = json.loads(decompress(response.get_data()))
+    assert len(body["routines"][0]["exercises"]) == 20
+
+
+def test_no_compression(client):
+    """
+    Test that small responses and clients without compression get plain JSON
+
+    Args:
+        client: The flask test client to use
+    """
+    response = client.get("/api/v1/routines")
+    assert "Content-Encoding" not in response.headers
+    assert len(response.get_data()) >= MIN_COMPRESS_SIZE
+
+    response = client.get("/api/v1/prs", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
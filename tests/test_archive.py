@@ -0,0 +1,169 @@
+"""
+Unit tests for archiving old routine history
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+import os
+import sys
+import pytest
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+from modules.archive import (
+    ArchiveMeta,
+    archive_all,
+    archive_path,
+    archive_routine,
+)
+from modules.journal import user_dir_locked
+from modules.profile import User
+from modules.storage import user_data_dir
+from modules.workouts import Routine, Exercise
+
+TODAY = date(2023, 6, 1)
+
+
+@pytest.fixture
+def saved_user(tmp_path):
+    """
+    Save a sample user with history spanning three years
+
+    Returns:
+        A tuple of a string representing the base data directory and a
+        string representing the path to the routine's csv log
+    """
+    user = User("username")
+    user.add_routine(Routine("routine1"))
+    user.routines["routine1"].add_exercise(Exercise("exercise1", 2))
+    exercise = user.routines["routine1"].exercises["exercise1"]
+    exercise.log_weights("2021-03-01", [100, 110])
+    exercise.log_weights("2022-04-01", [50, 60])
+    exercise.log_weights("2023-05-01", [10, 20])
+    user.to_json(str(tmp_path))
+    user.export_routines(str(tmp_path))
+    user_dir = user_data_dir("username", str(tmp_path))
+    csv_path = f"{user_dir}/routine1/routine1.csv"
+    return str(tmp_path), csv_path
+
+
+# pylint: disable=redefined-outer-name
+def test_archive_routine(saved_user):
+    """
+    Test that sessions past the horizon move into per-year archives and the
+    metadata keeps their records
+
+    Args:
+        saved_user: A tuple of the data directory and the csv log path
+    """
+    _, csv_path = saved_user
+    assert archive_routine(csv_path, 365, TODAY) == 2
+    assert os.path.isfile(archive_path(csv_path, 2021))
+    assert os.path.isfile(archive_path(csv_path, 2022))
+    assert ArchiveMeta.read(csv_path) == ArchiveMeta(
+        [2021, 2022], ["2021-03-01", "2022-04-01"], {"exercise1": 110.0}
+    )
+    assert archive_routine(csv_path, 365, TODAY) == 0
+
+
+def test_load_hot_only(saved_user):
+    """
+    Test that loading skips the archives but keeps records and streak days
+
+    Args:
+        saved_user: A tuple of the data directory and the csv log path
+    """
+    directory, csv_path = saved_user
+    archive_routine(csv_path, 365, TODAY)
+    user = User.load_user_data("username", directory)
+    exercise = user.routines["routine1"].exercises["exercise1"]
+    assert list(exercise.history) == ["2023-05-01"]
+    assert exercise.personal_record() == 110
+    assert len(user.streaks.trained_days) == 3
+
+
+def test_load_since(saved_user):
+    """
+    Test that only the archives a query spans are read
+
+    Args:
+        saved_user: A tuple of the data directory and the csv log path
+    """
+    directory, csv_path = saved_user
+    archive_routine(csv_path, 365, TODAY)
+    user = User.load_user_data("username", directory, since=date(2022, 1, 1))
+    history = user.routines["routine1"].exercises["exercise1"].history
+    assert list(history) == ["2022-04-01", "2023-05-01"]
+
+
+def test_archive_merges_years(saved_user):
+    """
+    Test that archiving again adds to an existing year's archive
+
+    Args:
+        saved_user: A tuple of the data directory and the csv log path
+    """
+    directory, csv_path = saved_user
+    archive_routine(csv_path, 365, TODAY)
+    user = User.load_user_data("username", directory)
+    routine = user.routines["routine1"]
+    routine.exercises["exercise1"].log_weights("2022-04-15", [70, 80])
+    routine.export_log(csv_path)
+    assert archive_routine(csv_path, 365, TODAY) == 1
+
+    user = User.load_user_data("username", directory, since=date.min)
+    history = user.routines["routine1"].exercises["exercise1"].history
+    assert list(history) == [
+        "2021-03-01",
+        "2022-04-01",
+        "2022-04-15",
+        "2023-05-01",
+    ]
+
+
+@pytest.mark.parametrize("since", [None, date.min])
+def test_save_after_archive(saved_user, since):
+    """
+    Test that saving a user loaded before their history was archived, or
+    loaded with their archives, doesn't write archived sessions back
+
+    Args:
+        saved_user: A tuple of the data directory and the csv log path
+        since: A datetime.date object passed when loading the user
+    """
+    directory, csv_path = saved_user
+    if since is not None:
+        archive_routine(csv_path, 365, TODAY)
+    user = User.load_user_data("username", directory, since=since)
+    archive_routine(csv_path, 365, TODAY)
+    user.gain_xp(10)
+    user.checkpoint(directory)
+
+    with open(csv_path, "r", encoding="UTF-8") as file:
+        assert "2021-03-01" not in file.readline()
+    loaded = User.load_user_data("username", directory)
+    history = loaded.routines["routine1"].exercises["exercise1"].history
+    assert list(history) == ["2023-05-01"]
+    assert loaded.xp_points == 10
+
+
+def test_archive_all_skips_open_user(saved_user):
+    """
+    Test that archive_all leaves a user another process has open alone,
+    and archives them once they're closed
+
+    Args:
+        saved_user: A tuple of the data directory and the csv log path
+    """
+    directory, csv_path = saved_user
+    with user_dir_locked(user_data_dir("username", directory)):
+        # the job runs in its own process, like it does from cron
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            archived, busy = executor.submit(
+                archive_all, directory, 365, TODAY
+            ).result()
+    assert (archived, busy) == ({}, ["username"])
+    assert ArchiveMeta.read(csv_path) is None
+
+    assert archive_all(directory, 365, TODAY) == ({csv_path: 2}, [])
@@ -0,0 +1,92 @@
+"""
+Unit tests for exercise name autocompletion
+"""
+
+import sys
+import pytest
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+from modules.autocomplete import EXERCISE_INDEX, PrefixIndex
+from modules.workouts import Routine, Exercise
+
+
+@pytest.fixture(autouse=True)
+def change_test_dir(request, monkeypatch):
+    """
+    Change working directory to tests directory
+    """
+    monkeypatch.chdir(request.fspath.dirname)
+
+
+@pytest.fixture
+def sample_index():
+    """
+    Create a sample index of exercise names
+
+    Returns:
+        A PrefixIndex object with a few bench and squat variations
+    """
+    return PrefixIndex(
+        ["Bench Press", "bench  press", "Back Squat", "Bent Over Row"]
+    )
+
+
+# pylint: disable=redefined-outer-name
+def test_suggest(sample_index: PrefixIndex):
+    """
+    Test that suggestions match the prefix ignoring case and spacing, and
+    keep the first spelling of duplicate names
+
+    Args:
+        sample_index: The PrefixIndex object to use
+    """
+    assert sample_index.suggest("BEN") == ["Bench Press", "Bent Over Row"]
+    assert sample_index.suggest("bench   p") == ["Bench Press"]
+    assert len(sample_index) == 3
+
+
+def test_suggest_limit(sample_index: PrefixIndex):
+    """
+    Test that suggestions stop at the limit and an empty prefix suggests
+    nothing
+
+    Args:
+        sample_index: The PrefixIndex object to use
+    """
+    assert sample_index.suggest("b", limit=2) == ["Back Squat", "Bench Press"]
+    assert not sample_index.suggest("  ")
+    assert not sample_index.suggest("curl")
+
+
+def test_add(sample_index: PrefixIndex):
+    """
+    Test that added names are suggested in order
+
+    Args:
+        sample_index: The PrefixIndex object to use
+    """
+    sample_index.add("Belt Squat")
+    assert sample_index.suggest("be") == [
+        "Belt Squat",
+        "Bench Press",
+        "Bent Over Row",
+    ]
+
+
+def test_load_user_data():
+    """
+    Test that exercise names are read from every user's routine json
+    """
+    index = PrefixIndex()
+    index.load_user_data("static_data/users")
+    assert "exercise1" in index
+
+
+def test_add_exercise_updates_shared_index():
+    """
+    Test that adding an exercise to a routine makes it a suggestion
+    """
+    Routine("routine1").add_exercise(Exercise("Zercher Squat", 3))
+    assert EXERCISE_INDEX.suggest("zerch") == ["Zercher Squat"]
@@ -0,0 +1,77 @@
+"""
+Unit tests for loading every user in parallel
+"""
+
+import os
+import sys
+import pytest
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+from modules.batch import discover_users, load_users, load_users_frame
+
+
+# pylint: disable=redefined-outer-name
+@pytest.fixture
+def data_dir(data_dir):
+    """
+    Add a user whose json is corrupt to the sample users
+
+    Returns:
+        A string representing the base directory of user data
+    """
+    os.makedirs(f"{data_dir}/corrupt")
+    with open(
+        f"{data_dir}/corrupt/corrupt.json", "w", encoding="UTF-8"
+    ) as file:
+        file.write("{")
+    return data_dir
+
+
+def test_discover_users(data_dir):
+    """
+    Test that every user directory with data is found
+
+    Args:
+        data_dir: A string representing the base directory of user data
+    """
+    assert discover_users(data_dir) == [
+        "corrupt",
+        "user_with_routine_history",
+        "user_with_routines",
+        "user_with_workout_days",
+        "user_with_xp",
+        "username",
+    ]
+
+
+def test_load_users(data_dir):
+    """
+    Test that users load in chunks and a corrupt user doesn't stop the run
+
+    Args:
+        data_dir: A string representing the base directory of user data
+    """
+    loaded = dict(load_users(data_dir, workers=2, chunk_size=2))
+    assert isinstance(loaded.pop("corrupt"), ValueError)
+    assert len(loaded) == 5
+    assert list(loaded["user_with_routines"].routines) == [
+        "routine1",
+        "routine2",
+    ]
+
+
+def test_load_users_frame(data_dir):
+    """
+    Test that every logged set ends up in one row of the combined frame
+
+    Args:
+        data_dir: A string representing the base directory of user data
+    """
+    frame, errors = load_users_frame(data_dir, workers=2, chunk_size=1)
+    assert list(errors) == ["corrupt"]
+    history = frame[frame["User"] == "user_with_routine_history"]
+    assert len(history) == 4
+    assert history["Weight"].sum() == 6
+    assert set(history["Date"]) == {"2023-04-30"}
@@ -0,0 +1,139 @@
+"""
+Unit tests for the canonical exercise catalogue
+"""
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+from modules.catalogue import (
+    CATALOGUE,
+    ExerciseCatalogue,
+    register_user_exercises,
+)
+from modules.profile import User
+from modules.workouts import Routine, Exercise
+
+
+@pytest.fixture
+def sample_catalogue():
+    """
+    Create a sample catalogue with an alias
+
+    Returns:
+        An ExerciseCatalogue object with two exercises and one alias
+    """
+    return ExerciseCatalogue(["Bench Press", "Pull Up"], {"BP": "Bench Press"})
+
+
+# pylint: disable=redefined-outer-name
+def test_aliases(sample_catalogue: ExerciseCatalogue):
+    """
+    Test that case, spacing, hyphens and aliases all map to the same id
+
+    Args:
+        sample_catalogue: The ExerciseCatalogue object to use
+    """
+    assert sample_catalogue.lookup("bench  press") == 0
+    assert sample_catalogue.lookup("bp") == 0
+    assert sample_catalogue.canonical_name("pull-up") == "Pull Up"
+    assert sample_catalogue.lookup("Dip") is None
+
+
+def test_new_names_are_appended(sample_catalogue: ExerciseCatalogue):
+    """
+    Test that unknown names get the next id and keep it
+
+    Args:
+        sample_catalogue: The ExerciseCatalogue object to use
+    """
+    assert sample_catalogue.id_for("Dip") == 2
+    assert sample_catalogue.id_for("dip") == 2
+    assert len(sample_catalogue) == 3
+
+
+def test_load_keeps_file_ids(sample_catalogue: ExerciseCatalogue, tmp_path):
+    """
+    Test that loading a saved catalogue keeps the saved ids and gives names
+    only known in memory new ones
+
+    Args:
+        sample_catalogue: The ExerciseCatalogue object to save
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    path = str(tmp_path / "catalogue.json")
+    sample_catalogue.save(path)
+    other = ExerciseCatalogue(["Dip"])
+    other.load(path)
+    assert other.names == ["Bench Press", "Pull Up", "Dip"]
+    assert other.lookup("BP") == 0
+    assert other.checksum(2) == sample_catalogue.checksum(2)
+
+
+def test_exercises_share_names():
+    """
+    Test that exercises with the same name share one interned string and
+    resolve aliases to the same id
+    """
+    first = Exercise("".join(["Bench", " Press"]), 3)
+    second = Exercise("".join(["Bench", " Press"]), 5)
+    assert first.name is second.name
+    assert Exercise("BP", 3).exercise_id == first.exercise_id
+
+
+def test_ids_are_lazy_and_thread_safe(sample_catalogue: ExerciseCatalogue):
+    """
+    Test that creating an exercise doesn't add it to the catalogue, and
+    names added from many threads at once each get one id
+
+    Args:
+        sample_catalogue: The ExerciseCatalogue object to add names to
+    """
+    size = len(CATALOGUE)
+    Exercise("Not In The Catalogue", 3)
+    assert len(CATALOGUE) == size
+
+    names = [f"exercise{number % 50}" for number in range(2000)]
+    with ThreadPoolExecutor(8) as pool:
+        ids = list(pool.map(sample_catalogue.id_for, names))
+    assert len(sample_catalogue) == 52
+    assert sorted(set(ids)) == list(range(2, 52))
+    assert all(
+        sample_catalogue.name(id_) == name for id_, name in zip(ids, names)
+    )
+
+
+def test_register_user_exercises(data_dir):
+    """
+    Test that every existing exercise is given an id and the catalogue is
+    saved
+
+    Args:
+        data_dir: A string representing the base directory of user data
+    """
+    mapping = register_user_exercises(data_dir)
+    assert CATALOGUE.name(mapping["exercise1"]) == "exercise1"
+    saved = ExerciseCatalogue()
+    saved.load(f"{data_dir}/catalogue.json")
+    assert saved.lookup("exercise1") == mapping["exercise1"]
+
+
+def test_snapshot_keeps_alias_names(tmp_path):
+    """
+    Test that exercises named with an alias keep their name through a
+    snapshot, which stores them by id
+
+    Args:
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    user = User("username")
+    user.add_routine(Routine("routine1"))
+    user.routines["routine1"].add_exercise(Exercise("BP", 3))
+    user.routines["routine1"].add_exercise(Exercise("Deadlift", 1))
+    user.to_json(str(tmp_path))
+    user.export_routines(str(tmp_path))
+    loaded = User.load_user_data("username", str(tmp_path))
+    assert list(loaded.routines["routine1"].exercises) == ["BP", "Deadlift"]
@@ -0,0 +1,189 @@
+"""
+Unit tests for the change log clients sync from
+"""
+
+import sys
+import pytest
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+import app as app_module
+from modules.changelog import ChangeLog, changes_path
+from modules.dates import Weekday
+from modules.profile import User
+from modules.templates import TEMPLATES
+from modules.workouts import Routine, Exercise
+
+
+def xp_record(xp_points: int):
+    """
+    Build a change setting a user's xp
+
+    Args:
+        xp_points: An integer representing the xp set
+
+    Returns:
+        A tuple of the operation name and its arguments
+    """
+    return ("set_xp", {"xp_points": xp_points})
+
+
+def test_versions_persist(tmp_path):
+    """
+    Test that changes are numbered in order, listed after a version and kept
+    across reopening, without a partly written change
+
+    Args:
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    log = ChangeLog.open(str(tmp_path))
+    log.append([xp_record(1), xp_record(2)])
+    log.append([("set_schedule", {"mask": 3})])
+    log.close()
+    with open(changes_path(str(tmp_path)), "ab") as file:
+        file.write(b"0000 [partial")
+
+    log = ChangeLog.open(str(tmp_path))
+    assert log.version == 3
+    assert log.changes_since(1) == [
+        (2, *xp_record(2)),
+        (3, "set_schedule", {"mask": 3}),
+    ]
+    assert log.changes_since(0, limit=1) == [(1, *xp_record(1))]
+    assert log.changes_since(3) == []
+    assert log.changes_since(4) is None
+    log.append([xp_record(4)])
+    assert log.version == 4
+
+
+def test_compaction(tmp_path):
+    """
+    Test that compaction drops overwritten and old changes, and clients
+    behind what's kept have to fetch the full state
+
+    Args:
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    log = ChangeLog.open(str(tmp_path))
+    log.append([("add_routine", {"name": "routine1"})])
+    log.append([xp_record(xp_points) for xp_points in range(1, 5)])
+    log.append([("add_routine", {"name": "routine2"})])
+    log.compact(keep=10)
+    assert log.base == 0
+    assert [version for version, _, _ in log.changes_since(0)] == [1, 5, 6]
+
+    log.compact(keep=2)
+    assert log.base == 1
+    assert log.changes_since(0) is None
+    assert log.changes_since(2) == [
+        (5, *xp_record(4)),
+        (6, "add_routine", {"name": "routine2"}),
+    ]
+    log.close()
+    reopened = ChangeLog.open(str(tmp_path))
+    assert (reopened.base, reopened.version) == (1, 6)
+    assert reopened.changes_since(1) == log.changes_since(1)
+
+
+def test_other_process_appends(tmp_path):
+    """
+    Test that a log picks up changes another process appended before
+    numbering its own
+
+    Args:
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    log = ChangeLog.open(str(tmp_path))
+    log.append([xp_record(1)])
+    other = ChangeLog.open(str(tmp_path))
+    other.append([xp_record(2)])
+    log.append([xp_record(3)])
+    assert log.changes_since(0) == [
+        (1, *xp_record(1)),
+        (2, *xp_record(2)),
+        (3, *xp_record(3)),
+    ]
+
+
+@pytest.fixture
+def client(tmp_path):
+    """
+    Create a test client logged in as a sample user whose changes are
+    recorded
+
+    Returns:
+        A tuple of the flask test client and the User object
+    """
+    user = User("username", 100)
+    user.add_routine(Routine("routine1"))
+    user.routines["routine1"].add_exercise(Exercise("exercise1", 2))
+    user.routines["routine1"].exercises["exercise1"].log_weights(
+        "2023-05-01", [10, 20]
+    )
+    user.checkpoint(str(tmp_path))
+    user.open_journal(str(tmp_path))
+    app_module.user = user
+    return app_module.app.test_client(), user
+
+
+# pylint: disable=redefined-outer-name
+def test_sync(client):
+    """
+    Test that a client first gets the full state, then only the changes
+    made since, a page at a time
+
+    Args:
+        client: A tuple of the flask test client and the User object
+    """
+    test_client, user = client
+    first = test_client.get("/api/v1/sync").get_json()
+    assert first["version"] == 0
+    assert first["full"]["routines"][0]["history"] == {
+        "exercise1": {"2023-05-01": [10, 20]}
+    }
+
+    user.gain_xp(50)
+    user.set_workout_days([Weekday.MONDAY])
+    user.add_routine(Routine.from_template(TEMPLATES.get("legs-v1")))
+    user.log_workouts(
+        [
+            {
+                "date": "2023-05-02",
+                "routine": "routine1",
+                "exercise": "exercise1",
+                "weights": [15, ""],
+            }
+        ]
+    )
+    page = test_client.get("/api/v1/sync?since=0&limit=2").get_json()
+    assert page["more"]
+    assert [change["args"] for change in page["changes"]] == [
+        {"xp_points": 150},
+        {"workout_days": ["MONDAY"]},
+    ]
+    rest = test_client.get(f"/api/v1/sync?since={page['version']}").get_json()
+    assert not rest["more"]
+    assert rest["version"] == user.changes.version
+    operations = {change["operation"]: change for change in rest["changes"]}
+    assert len(operations["add_routine"]["args"]["exercises"]) == 5
+    assert operations["log"]["args"]["weights"] == [15, None]
+    assert test_client.get(
+        f"/api/v1/sync?since={rest['version']}"
+    ).get_json() == {"version": rest["version"], "changes": [], "more": False}
+
+
+def test_replay_not_recorded(client, tmp_path):
+    """
+    Test that loading a user doesn't record their journal again as new
+    changes
+
+    Args:
+        client: A tuple of the flask test client and the User object
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    _, user = client
+    user.gain_xp(50)
+    loaded = User.load_user_data("username", str(tmp_path))
+    loaded.open_journal(str(tmp_path))
+    assert loaded.changes.version == user.changes.version == 1
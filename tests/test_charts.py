@@ -0,0 +1,77 @@
+"""
+Unit tests for downsampled progression chart data
+"""
+
+from datetime import date, timedelta
+import sys
+import numpy as np
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+from modules.charts import cached_chart_data, chart_data, lttb
+from modules.profile import User
+from modules.workouts import Routine, Exercise
+
+
+def test_lttb_keeps_shape():
+    """
+    Test that downsampling keeps the ends, the width and a lone spike
+    """
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[500] = 100
+    indices = lttb(x, y, 50)
+    assert len(indices) == 50
+    assert indices[0] == 0 and indices[-1] == 999
+    assert 500 in indices
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_lttb_short_series():
+    """
+    Test that a series no longer than the width is kept whole
+    """
+    assert list(lttb(np.arange(5.0), np.arange(5.0), 10)) == [0, 1, 2, 3, 4]
+
+
+def test_chart_size_bounded():
+    """
+    Test that every series is at most the chart width however long the
+    history is
+    """
+    exercise = Exercise("exercise1", 2)
+    first = date(2020, 1, 1)
+    for day in range(2000):
+        exercise.log_weights(
+            (first + timedelta(days=day)).isoformat(), [day % 50, 10]
+        )
+    chart = chart_data(exercise, 100)
+    assert all(len(series) == 100 for series in chart.values())
+    assert chart["max_weight"][0] == ["2020-01-01", 10]
+
+
+def test_chart_cache_follows_version():
+    """
+    Test that a cached chart is reused until the user's data changes
+    """
+    user = User("username")
+    user.add_routine(Routine("routine1"))
+    user.routines["routine1"].add_exercise(Exercise("exercise1", 1))
+    exercise = user.routines["routine1"].exercises["exercise1"]
+    exercise.log_weights("2023-05-01", [10])
+    chart = cached_chart_data(user, "routine1", exercise, 100)
+    assert cached_chart_data(user, "routine1", exercise, 100) is chart
+
+    user.log_workouts(
+        [
+            {
+                "date": "2023-05-02",
+                "routine": "routine1",
+                "exercise": "exercise1",
+                "weights": [20],
+            }
+        ]
+    )
+    chart = cached_chart_data(user, "routine1", exercise, 100)
+    assert chart["max_weight"][-1] == ["2023-05-02", 20]
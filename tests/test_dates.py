@@ -7,7 +7,7 @@ import sys
 sys.path.append("./")
 
 # pylint: disable=import-error, wrong-import-position
-from modules.dates import Weekday, get_week
+from modules.dates import Weekday, get_week, get_date_range
 
 
 def test_week_string():
@@ -42,3 +42,19 @@ def test_weekday_object():
     Test that the Weekday object properly returns values for dates.
     """
     assert isinstance(get_week()[0][0], type(Weekday(0))) is True
+
+
+def test_date_range():
+    """
+    Test that get_date_range() finds the bounds of the week and month
+    containing a date.
+    """
+    day = datetime.date(2023, 2, 15)
+    assert get_date_range(day, "week") == (
+        datetime.date(2023, 2, 13),
+        datetime.date(2023, 2, 19),
+    )
+    assert get_date_range(day, "month") == (
+        datetime.date(2023, 2, 1),
+        datetime.date(2023, 2, 28),
+    )
@@ -3,6 +3,7 @@ Unit tests for Exercise class
 """
 
 from datetime import date, timedelta
+import math
 import sys
 import pytest
 
@@ -33,7 +34,19 @@ def test_weights_get_logged(sample_exercise: Exercise):
     """
     exercise = sample_exercise
     exercise.log_weights_today([1, 2, 3])
-    assert exercise.history.popitem()[1] == [1, 2, 3]
+    assert exercise.history.popitem()[1].tolist() == [1, 2, 3]
+
+
+def test_weights_get_converted():
+    """
+    Test that weights and sets entered as strings are stored as numbers, with
+    sets left empty stored as NaN
+    """
+    exercise = Exercise("sample", "3")
+    exercise.log_weights_today(["135", "137.5", ""])
+    weights = exercise.history.popitem()[1]
+    assert exercise.sets == 3
+    assert weights[:2].tolist() == [135, 137.5] and math.isnan(weights[2])
 
 
 def test_wrong_number_of_sets(sample_exercise: Exercise):
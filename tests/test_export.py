@@ -0,0 +1,86 @@
+"""
+Unit tests for streaming data exports
+"""
+
+import io
+import sys
+import zipfile
+import pytest
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+from modules.export import stream_long_csv, stream_user_zip, stream_zip
+from modules.profile import User
+from modules.storage import user_data_dir
+from modules.workouts import Routine, Exercise
+
+
+@pytest.fixture
+def saved_user(tmp_path):
+    """
+    Save a sample user with a logged routine to a temporary directory
+
+    Returns:
+        A tuple of the User object and a string representing their data
+        directory
+    """
+    user = User("user name", 100)
+    user.add_routine(Routine("routine 1"))
+    user.routines["routine 1"].add_exercise(Exercise("exercise1", 2))
+    exercise = user.routines["routine 1"].exercises["exercise1"]
+    exercise.log_weights("2023-05-01", [10, 20])
+    exercise.log_weights("2023-05-03", [15, ""])
+    user.to_json(str(tmp_path))
+    user.export_routines(str(tmp_path))
+    return user, user_data_dir(user.name, str(tmp_path))
+
+
+def test_stream_zip():
+    """
+    Test that a zip streamed in chunks is a valid archive of every entry
+    """
+    chunks = list(
+        stream_zip(
+            [("a.txt", [b"hello ", b"world"]), ("b.bin", [bytes(100_000)])]
+        )
+    )
+    assert len(chunks) > 1
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.read("a.txt") == b"hello world"
+        assert archive.read("b.bin") == bytes(100_000)
+
+
+# pylint: disable=redefined-outer-name
+def test_user_zip(saved_user):
+    """
+    Test that a user's zip has their json and routine logs but no snapshot
+
+    Args:
+        saved_user: A tuple of the saved User object and their directory
+    """
+    user, user_dir = saved_user
+    data = b"".join(stream_user_zip(user, user_dir, f"{user_dir}/missing.jpg"))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert sorted(archive.namelist()) == [
+            "routine_1/routine_1.csv",
+            "routine_1/routine_1.json",
+            "user_name.json",
+        ]
+
+
+def test_long_csv(saved_user):
+    """
+    Test that the long format csv has a row for each logged set
+
+    Args:
+        saved_user: A tuple of the saved User object and their directory
+    """
+    user, user_dir = saved_user
+    chunks = list(stream_long_csv(list(user.routines), user_dir, 1))
+    assert b"".join(chunks).decode("UTF-8").splitlines() == [
+        "Date,Routine,Exercise,Set,Weight",
+        "2023-05-01,routine 1,exercise1,1,10",
+        "2023-05-03,routine 1,exercise1,1,15",
+        "2023-05-01,routine 1,exercise1,2,20",
+    ]
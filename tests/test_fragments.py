@@ -0,0 +1,104 @@
+"""
+Unit tests for caching rendered template fragments
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from jinja2 import DictLoader, Environment
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+from modules.fragments import (
+    FragmentCache,
+    FragmentCacheExtension,
+    template_bytecode_cache,
+)
+from modules.profile import User
+from modules.workouts import Routine, Exercise
+
+
+def test_least_recently_used_evicted():
+    """
+    Test that a full cache drops the fragment used longest ago
+    """
+    cache = FragmentCache(2)
+    cache.set(("a",), "1")
+    cache.set(("b",), "2")
+    assert cache.get(("a",)) == "1"
+    cache.set(("c",), "3")
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == "1"
+    assert len(cache) == 2
+
+
+def test_shared_between_threads():
+    """
+    Test that lookups and stores from many threads at once keep the cache
+    within its size and count every lookup
+    """
+    cache = FragmentCache(16)
+
+    def use(number: int):
+        key = (number % 40,)
+        if cache.get(key) is None:
+            cache.set(key, str(number))
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(use, range(20000)))
+    assert len(cache) == 16
+    assert cache.hits + cache.misses == 20000
+
+
+def test_fragment_rendered_once_per_version():
+    """
+    Test that a cached fragment is only rendered again when its key changes
+    """
+    renders = []
+    env = Environment(
+        loader=DictLoader(
+            {"page": '{% cache "list", version %}{{ render() }}{% endcache %}'}
+        ),
+        extensions=[FragmentCacheExtension],
+    )
+    env.fragment_cache = FragmentCache()
+
+    def render():
+        renders.append(1)
+        return len(renders)
+
+    template = env.get_template("page")
+    assert template.render(version=1, render=render) == "1"
+    assert template.render(version=1, render=render) == "1"
+    assert template.render(version=2, render=render) == "2"
+    assert env.fragment_cache.hits == 1
+
+
+def test_user_version_changes():
+    """
+    Test that changing a user gives them a new data version
+    """
+    user = User("username")
+    versions = [user.version]
+    user.add_routine(Routine("routine1"))
+    versions.append(user.version)
+    user.routines["routine1"].add_exercise(Exercise("exercise1", 2))
+    versions.append(user.version)
+    user.gain_xp(10)
+    versions.append(user.version)
+    assert len(set(versions)) == 4
+    assert User("username").version not in versions
+
+
+def test_bytecode_cache_persists(tmp_path):
+    """
+    Test that compiled templates are written to the cache directory
+    """
+    directory = f"{tmp_path}/jinja"
+    env = Environment(
+        loader=DictLoader({"page": "{{ 1 + 1 }}"}),
+        bytecode_cache=template_bytecode_cache(directory),
+    )
+    assert env.get_template("page").render() == "2"
+    assert os.listdir(directory)
@@ -0,0 +1,186 @@
+"""
+Unit tests for the compact encoding of routine logs
+"""
+
+from datetime import date, timedelta
+import io
+import sys
+import zipfile
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+from modules.archive import archive_routine
+from modules.export import long_csv_rows, stream_user_zip
+from modules.history_codec import (
+    MAGIC,
+    decode_log,
+    encode_log,
+    log_codec,
+    read_log,
+)
+from modules.profile import User
+from modules.storage import user_data_dir
+from modules.workouts import Routine, Exercise
+
+
+def sample_log():
+    """
+    Build a routine log with gaps, an unlogged set and days out of order
+
+    Returns:
+        A pandas DataFrame in the csv log format
+    """
+    return pd.DataFrame(
+        {
+            "Exercise": ["bench", "bench", "squat"],
+            "Set": [1, 2, 1],
+            "2023-01-03": [100.0, 102.5, np.nan],
+            "2023-01-01": [95.0, np.nan, 140.0],
+            "2023-01-10": [np.nan, np.nan, 145.0],
+        }
+    )
+
+
+def assert_same_log(decoded: pd.DataFrame, log_df: pd.DataFrame):
+    """
+    Check a decoded log holds the same weights as a log, with its days in
+    order
+
+    Args:
+        decoded: The decoded pandas DataFrame
+        log_df: The pandas DataFrame that was encoded
+    """
+    days = sorted(log_df.columns[2:])
+    pd.testing.assert_frame_equal(
+        decoded, log_df[["Exercise", "Set", *days]], check_dtype=False
+    )
+
+
+@pytest.mark.parametrize("codec", ["zlib", "lzma"])
+def test_round_trip(codec):
+    """
+    Test that an encoded log decodes to the same log with either codec
+
+    Args:
+        codec: A string representing the codec
+    """
+    data = encode_log(sample_log(), codec)
+    assert data.startswith(MAGIC)
+    assert_same_log(decode_log(data), sample_log())
+
+
+def test_round_trip_odd_weights():
+    """
+    Test that weights no plate increment divides are kept exactly
+    """
+    log_df = sample_log()
+    log_df.loc[0, "2023-01-03"] = 133.337
+    assert_same_log(decode_log(encode_log(log_df)), log_df)
+
+
+def test_decode_rejects_other_data():
+    """
+    Test that data that isn't an encoded log raises a ValueError
+    """
+    with pytest.raises(ValueError):
+        decode_log(b"XXXX\x01\x01")
+
+
+def test_smaller_than_csv():
+    """
+    Test that a long, steady history encodes far smaller than its csv
+    """
+    start = date(2020, 1, 1)
+    days = [(start + timedelta(days=2 * i)).isoformat() for i in range(500)]
+    log_df = pd.DataFrame(
+        {
+            "Exercise": ["bench"] * 3 + ["squat"] * 3,
+            "Set": [1, 2, 3] * 2,
+            **{
+                day: [100.0 + 2.5 * (i // 20)] * 6 for i, day in enumerate(days)
+            },
+        }
+    )
+    data = encode_log(log_df)
+    assert len(data) * 10 < len(log_df.to_csv().encode())
+    assert_same_log(decode_log(data), log_df)
+
+
+@pytest.fixture
+def encoded_user(tmp_path):
+    """
+    Save a sample user with an encoded csv log
+
+    Returns:
+        A tuple of the User object and a string representing the path to
+        the routine's csv log
+    """
+    user = User("username")
+    user.add_routine(Routine("routine1"))
+    user.routines["routine1"].add_exercise(Exercise("exercise1", 2))
+    exercise = user.routines["routine1"].exercises["exercise1"]
+    exercise.log_weights("2022-04-01", [50, 60])
+    exercise.log_weights("2023-05-01", [10, 20])
+    user.to_json(str(tmp_path))
+    user.export_routines(str(tmp_path))
+    user_dir = user_data_dir("username", str(tmp_path))
+    csv_path = f"{user_dir}/routine1/routine1.csv"
+    user.routines["routine1"].export_log(csv_path, "lzma")
+    return user, csv_path
+
+
+# pylint: disable=redefined-outer-name
+def test_load_log_encoded(encoded_user):
+    """
+    Test that load_log reads an encoded log like a csv log
+
+    Args:
+        encoded_user: A tuple of the User object and the csv log path
+    """
+    user, csv_path = encoded_user
+    assert log_codec(csv_path) == "lzma"
+    routine = Routine("routine1")
+    routine.add_exercise(Exercise("exercise1", 2))
+    routine.load_log(csv_path)
+    assert (
+        routine.exercises["exercise1"].history
+        == user.routines["routine1"].exercises["exercise1"].history
+    )
+
+
+def test_archive_keeps_encoding(encoded_user):
+    """
+    Test that archiving an encoded log leaves it encoded
+
+    Args:
+        encoded_user: A tuple of the User object and the csv log path
+    """
+    _, csv_path = encoded_user
+    assert archive_routine(csv_path, 365, date(2023, 6, 1)) == 1
+    assert log_codec(csv_path) == "lzma"
+    assert list(read_log(csv_path).columns[2:]) == ["2023-05-01"]
+
+
+def test_exports_decode(encoded_user):
+    """
+    Test that exports write an encoded log as csv
+
+    Args:
+        encoded_user: A tuple of the User object and the csv log path
+    """
+    user, csv_path = encoded_user
+    assert list(long_csv_rows("routine1", csv_path)) == [
+        ("2022-04-01", "routine1", "exercise1", "1", 50),
+        ("2023-05-01", "routine1", "exercise1", "1", 10),
+        ("2022-04-01", "routine1", "exercise1", "2", 60),
+        ("2023-05-01", "routine1", "exercise1", "2", 20),
+    ]
+    user_dir = csv_path.rsplit("/", 2)[0]
+    data = b"".join(stream_user_zip(user, user_dir, "missing.jpg"))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        log_text = archive.read("routine1/routine1.csv").decode("UTF-8")
+    assert log_text.startswith(",Exercise,Set,2022-04-01,2023-05-01")
@@ -0,0 +1,183 @@
+"""
+Unit tests for HistoryStore class
+"""
+
+from datetime import date
+import sys
+import numpy as np
+import pytest
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+from modules.archive import archive_routine
+from modules.history_store import HistoryStore, MAIN, TAIL
+from modules.storage import user_data_dir
+from modules.profile import User
+from modules.workouts import Routine, Exercise
+
+
+@pytest.fixture
+def sample_user():
+    """
+    Create a sample user with logged routines to be used for testing
+
+    Returns:
+        A user object with one routine logged on two days
+    """
+    user = User("username")
+    user.add_routine(Routine("routine1"))
+    user.routines["routine1"].add_exercise(Exercise("exercise1", 2))
+    user.routines["routine1"].add_exercise(Exercise("exercise2", 2))
+    exercises = user.routines["routine1"].exercises
+    exercises["exercise1"].log_weights("2023-05-03", [30, 40])
+    exercises["exercise1"].log_weights("2023-05-01", [10, 20])
+    exercises["exercise2"].log_weights("2023-05-01", [5, ""])
+    return user
+
+
+# pylint: disable=redefined-outer-name
+def test_build_sorted(sample_user: User, tmp_path):
+    """
+    Test that building a store writes every logged set sorted by date into
+    memory-mapped columns
+
+    Args:
+        sample_user: The User object to use
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    store = HistoryStore.for_user(sample_user, str(tmp_path))
+    main = store.segment(MAIN)
+    assert isinstance(main["weight"], np.memmap)
+    assert len(main["date"]) == 6
+    assert np.all(np.diff(main["date"]) >= 0)
+
+
+def test_query_range(sample_user: User, tmp_path):
+    """
+    Test that a date range query only returns rows in the range, as views of
+    the main segment
+
+    Args:
+        sample_user: The User object to use
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    store = HistoryStore.for_user(sample_user, str(tmp_path))
+    segments = store.query(date(2023, 5, 2), date(2023, 5, 3))
+    assert len(segments) == 1
+    assert segments[0]["weight"].tolist() == [30, 40]
+    assert isinstance(segments[0]["weight"], np.memmap)
+
+
+def test_aggregates(sample_user: User, tmp_path):
+    """
+    Test that max_weight and volume ignore sets that weren't logged
+
+    Args:
+        sample_user: The User object to use
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    store = HistoryStore.for_user(sample_user, str(tmp_path))
+    assert store.max_weight() == {
+        "routine1/exercise1": 40,
+        "routine1/exercise2": 5,
+    }
+    assert store.volume(end=date(2023, 5, 1)) == {
+        "routine1/exercise1": 30,
+        "routine1/exercise2": 5,
+    }
+
+
+def test_append_and_compact(sample_user: User, tmp_path):
+    """
+    Test that appended sessions are queryable from the tail, and compact
+    merges them into the main segment in date order
+
+    Args:
+        sample_user: The User object to use
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    store = HistoryStore.for_user(sample_user, str(tmp_path))
+    routine = sample_user.routines["routine1"]
+    routine.exercises["exercise1"].log_weights("2023-05-02", [50, 60])
+    store.append_session(routine, "2023-05-02")
+    assert len(store.segment(TAIL)["date"]) == 2
+    assert store.max_weight()["routine1/exercise1"] == 60
+
+    store.compact()
+    main = store.segment(MAIN)
+    assert len(store.segment(TAIL)["date"]) == 0
+    assert len(main["date"]) == 8 and np.all(np.diff(main["date"]) >= 0)
+    assert store.volume()["routine1/exercise1"] == 210
+
+
+def test_tail_compacted_when_full(sample_user: User, tmp_path, monkeypatch):
+    """
+    Test that appending past TAIL_ROWS rows merges the tail into the main
+    segment, so the tail never grows with the whole history
+
+    Args:
+        sample_user: The User object to use
+        tmp_path: A pathlib.Path object representing a temporary directory
+        monkeypatch: The pytest fixture for shrinking the tail
+    """
+    monkeypatch.setattr("modules.history_store.TAIL_ROWS", 4)
+    store = HistoryStore.for_user(sample_user, str(tmp_path))
+    routine = sample_user.routines["routine1"]
+    for day in ("2023-05-04", "2023-05-05"):
+        routine.exercises["exercise1"].log_weights(day, [50, 60])
+        store.append_session(routine, day)
+    assert len(store.segment(TAIL)["date"]) == 4
+    routine.exercises["exercise1"].log_weights("2023-05-06", [50, 60])
+    store.append_session(routine, "2023-05-06")
+    assert len(store.segment(TAIL)["date"]) == 0
+    assert len(store.segment(MAIN)["date"]) == 12
+
+
+def test_build_includes_archived(sample_user: User, tmp_path):
+    """
+    Test that a store built for a user loaded without their archived history
+    still holds the archived sessions
+
+    Args:
+        sample_user: The User object to use
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    sample_user.routines["routine1"].exercises["exercise1"].log_weights(
+        "2021-03-01", [100, 110]
+    )
+    sample_user.checkpoint(str(tmp_path))
+    user_dir = user_data_dir("username", str(tmp_path))
+    archive_routine(f"{user_dir}/routine1/routine1.csv", 365, date(2023, 6, 1))
+    loaded = User.load_user_data("username", str(tmp_path))
+    assert "2021-03-01" not in (
+        loaded.routines["routine1"].exercises["exercise1"].history
+    )
+
+    store = HistoryStore.for_user(loaded, f"{user_dir}/history")
+    assert store.max_weight()["routine1/exercise1"] == 110
+    assert store.volume()["routine1/exercise1"] == 310
+
+
+def test_log_again_replaces(sample_user: User, tmp_path):
+    """
+    Test that logging an exercise again on the same day replaces its rows,
+    like the csv log, both before and after compacting
+
+    Args:
+        sample_user: The User object to use
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    store = HistoryStore.for_user(sample_user, str(tmp_path))
+    routine = sample_user.routines["routine1"]
+    routine.exercises["exercise1"].log_weights("2023-05-02", [50, 50])
+    store.append_session(routine, "2023-05-02")
+    store.append_session(routine, "2023-05-02")
+    routine.exercises["exercise1"].log_weights("2023-05-01", [15, 20])
+    store.append_session(routine, "2023-05-01")
+    expected = {"routine1/exercise1": 205, "routine1/exercise2": 5}
+    assert store.volume() == expected
+
+    store.compact()
+    assert len(store.segment(MAIN)["date"]) == 8
+    assert store.volume() == expected
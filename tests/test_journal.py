@@ -0,0 +1,147 @@
+"""
+Unit tests for the write-ahead journal of user changes
+"""
+
+import os
+import sys
+import pytest
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+import app as app_module
+from modules.journal import Journal, journal_path, read_records
+from modules.profile import User
+from modules.storage import user_data_dir
+from modules.workouts import Routine, Exercise
+from modules.dates import Weekday
+
+
+@pytest.fixture
+def journaled_user(tmp_path):
+    """
+    Save a sample user and start journaling their changes
+
+    Returns:
+        A User object with one saved routine and an open journal
+    """
+    user = User("username", 100)
+    user.add_routine(Routine("routine1"))
+    user.routines["routine1"].add_exercise(Exercise("exercise1", 2))
+    user.checkpoint(str(tmp_path))
+    user.open_journal(str(tmp_path))
+    return user
+
+
+def test_append_and_read(tmp_path):
+    """
+    Test that appended records are read back in order
+    """
+    journal, records = Journal.open(str(tmp_path))
+    assert not records
+    journal.append([("set_xp", {"xp_points": 1}), ("set_xp", {"xp_points": 2})])
+    journal.append([("set_schedule", {"mask": 3})])
+    journal.close()
+    assert read_records(journal_path(str(tmp_path)))[0] == [
+        ("set_xp", {"xp_points": 1}),
+        ("set_xp", {"xp_points": 2}),
+        ("set_schedule", {"mask": 3}),
+    ]
+
+
+def test_torn_record_is_dropped(tmp_path):
+    """
+    Test that a partly written last record is ignored and cut off
+    """
+    journal, _ = Journal.open(str(tmp_path))
+    journal.append([("set_xp", {"xp_points": 1})])
+    journal.close()
+    path = journal_path(str(tmp_path))
+    valid_size = os.path.getsize(path)
+    with open(path, "ab") as file:
+        file.write(b'1234abcd ["set_xp",{"xp_p')
+
+    journal, records = Journal.open(str(tmp_path))
+    assert records == [("set_xp", {"xp_points": 1})]
+    assert os.path.getsize(path) == valid_size
+    assert journal.pending == 1
+
+
+# pylint: disable=redefined-outer-name
+def test_replay_on_load(journaled_user: User, tmp_path):
+    """
+    Test that changes only in the journal are replayed when the user loads
+
+    Args:
+        journaled_user: The User object to change
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    journaled_user.add_routine(Routine("routine2"))
+    journaled_user.routines["routine2"].add_exercise(Exercise("exercise2", 1))
+    journaled_user.set_workout_days([Weekday.MONDAY])
+    journaled_user.log_workouts(
+        [
+            {
+                "date": "2023-05-01",
+                "routine": "routine1",
+                "exercise": "exercise1",
+                "weights": [10, 20],
+            }
+        ]
+    )
+    assert journaled_user.journal.pending == 5
+
+    loaded = User.load_user_data("username", str(tmp_path))
+    assert loaded == journaled_user
+
+
+def test_checkpoint_empties_journal(journaled_user: User, tmp_path):
+    """
+    Test that a checkpoint saves the changes and empties the journal
+
+    Args:
+        journaled_user: The User object to change
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    journaled_user.gain_xp(50)
+    journaled_user.checkpoint(str(tmp_path))
+    assert journaled_user.journal.pending == 0
+    user_dir = user_data_dir("username", str(tmp_path))
+    assert not read_records(journal_path(user_dir))[0]
+    assert User.load_user_data("username", str(tmp_path)).xp_points == 150
+
+
+def test_logging_only_journals(tmp_path, monkeypatch):
+    """
+    Test that logging through the app journals the sets instead of saving
+    every file, and they're kept when the user is loaded again
+
+    Args:
+        tmp_path: A pathlib.Path object representing a temporary directory
+        monkeypatch: The pytest fixture for changing the working directory
+    """
+    monkeypatch.chdir(tmp_path)
+    user = User("username", 100)
+    user.add_routine(Routine("routine1"))
+    user.routines["routine1"].add_exercise(Exercise("exercise1", 2))
+    user.checkpoint()
+    user.open_journal()
+    app_module.user = user
+    csv_path = f"{user_data_dir('username')}/routine1/routine1.csv"
+    saved_csv = os.stat(csv_path).st_mtime_ns
+
+    entry = {
+        "date": "2023-05-01",
+        "routine": "routine1",
+        "exercise": "exercise1",
+        "weights": [10, 20],
+    }
+    client = app_module.app.test_client()
+    response = client.post("/submit-logs", json={"entries": [entry]})
+    assert response.status_code == 200
+    assert os.stat(csv_path).st_mtime_ns == saved_csv
+    assert user.journal.pending == 2
+
+    loaded = User.load_user_data("username")
+    history = loaded.routines["routine1"].exercises["exercise1"].history
+    assert list(history["2023-05-01"]) == [10, 20]
@@ -0,0 +1,105 @@
+"""
+Unit tests for memory accounting
+"""
+
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+import sys
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+from modules.fragments import FragmentCache
+from modules.memory import (
+    cache_memory,
+    deep_sizeof,
+    format_metrics,
+    start_tracing,
+    stop_tracing,
+    top_allocations,
+    user_memory,
+)
+from modules.profile import User
+from modules.workouts import Routine, Exercise
+
+
+def test_shared_objects_counted_once():
+    """
+    Test that an object held twice is only counted once
+    """
+    weights = array("f", range(1000))
+    pair = [weights, weights]
+    assert deep_sizeof(pair) == sys.getsizeof(pair) + sys.getsizeof(weights)
+    assert deep_sizeof(weights) >= 4000
+
+
+def test_user_memory_follows_history():
+    """
+    Test that logging history grows a user's measured size, which is only
+    measured again after a change
+    """
+    user = User("username")
+    user.add_routine(Routine("routine1"))
+    user.routines["routine1"].add_exercise(Exercise("exercise1", 100))
+    before = user_memory(user)
+    assert user_memory(user) is before
+
+    user.log_workouts(
+        [
+            {
+                "date": "2023-05-01",
+                "routine": "routine1",
+                "exercise": "exercise1",
+                "weights": list(range(100)),
+            }
+        ]
+    )
+    after = user_memory(user)
+    assert after["routines"]["routine1"] >= before["routines"]["routine1"] + 400
+    assert after["total"] > sum(after["routines"].values())
+
+
+def test_cache_memory_while_in_use():
+    """
+    Test that a cache can be measured while other threads fill it, and that
+    its size follows its fragments
+    """
+    cache = FragmentCache(64)
+    empty = cache_memory(cache)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(4) as pool:
+            stores = pool.map(
+                lambda number: cache.set((number,), f"{number:04}" * 250),
+                range(5000),
+            )
+            sizes = [cache_memory(cache) for _ in range(200)]
+            list(stores)
+    finally:
+        sys.setswitchinterval(interval)
+    assert all(size >= empty for size in sizes)
+    assert cache_memory(cache) >= empty + 64 * 1000
+
+
+def test_format_metrics():
+    """
+    Test that samples are written in the Prometheus text format
+    """
+    assert format_metrics(
+        [("bytes", {"user": 'a "b"'}, 10), ("total", {}, 20)]
+    ) == ('bytes{user="a \\"b\\""} 10\ntotal 20\n')
+
+
+def test_top_allocations():
+    """
+    Test that allocations are only listed while tracing
+    """
+    assert top_allocations() == []
+    start_tracing()
+    held = [bytes(100_000) for _ in range(5)]
+    allocations = top_allocations(3)
+    stop_tracing()
+    assert len(held) == 5
+    assert allocations[0]["size"] >= 500_000
+    assert __file__ in allocations[0]["location"]
@@ -0,0 +1,105 @@
+"""
+Unit tests for opt-in request profiling
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+import time
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+import app as app_module
+from modules.profiling import RequestProfiler, collapsed_stacks
+
+
+def busy_inner():
+    """
+    Spend a little time in a nested call
+    """
+    return sum(number * number for number in range(20_000))
+
+
+def busy_outer():
+    """
+    Call the nested function twice
+    """
+    return busy_inner() + busy_inner()
+
+
+def profile_busy():
+    """
+    Profile busy_outer
+
+    Returns:
+        A cProfile.Profile object
+    """
+    profile = cProfile.Profile()
+    profile.enable()
+    busy_outer()
+    profile.disable()
+    return profile
+
+
+def test_collapsed_stacks():
+    """
+    Test that nested calls become a stack through their caller
+    """
+    stacks = collapsed_stacks(pstats.Stats(profile_busy()))
+    nested = [
+        stack
+        for stack in stacks
+        if "busy_outer" in stack and stack.split(";")[-1].count("busy_inner")
+    ]
+    assert len(nested) == 1
+    assert nested[0].index("busy_outer") < nested[0].index("busy_inner")
+    assert all(micros > 0 for micros in stacks.values())
+
+
+def test_wanted():
+    """
+    Test that requests are profiled when asked to or sampled
+    """
+    profiler = RequestProfiler()
+    assert not profiler.wanted({}, {})
+    assert profiler.wanted({"X-Profile": "1"}, {})
+    assert profiler.wanted({}, {"profile": "1"})
+    assert not profiler.wanted({"X-Profile": "1"}, {}, allow_requested=False)
+    assert RequestProfiler(sample_rate=1.0).wanted({}, {})
+
+
+def test_admin_pages_hidden(monkeypatch):
+    """
+    Test that admin pages are only served in debug mode or when enabled
+
+    Args:
+        monkeypatch: The pytest fixture for changing the app's config
+    """
+    client = app_module.app.test_client()
+    monkeypatch.setitem(app_module.app.config, "ADMIN_PAGES", False)
+    for page in ("stats", "profiles", "metrics", "allocations?trace=start"):
+        assert client.get(f"/admin/{page}").status_code == 404
+    monkeypatch.setitem(app_module.app.config, "ADMIN_PAGES", True)
+    assert client.get("/admin/profiles").status_code == 200
+
+
+def test_oldest_profiles_dropped(tmp_path):
+    """
+    Test that only the newest profiles are kept, files included
+
+    Args:
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    profiler = RequestProfiler(str(tmp_path), max_profiles=2)
+    records = [
+        profiler.save(profile_busy(), "/plan", "/plan", time.perf_counter())
+        for _ in range(3)
+    ]
+    assert not os.path.exists(records[0].stats_path)
+    assert os.path.exists(records[2].folded_path)
+    assert len(profiler.slowest()) == 2
+    assert profiler.find(records[0].profile_id) is None
+    assert profiler.find(records[1].profile_id) == records[1]
+    assert pstats.Stats(records[1].stats_path).total_calls > 0
@@ -0,0 +1,94 @@
+"""
+Unit tests for the workout reminder scheduler
+"""
+
+from datetime import date, datetime
+import sys
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+from modules.reminders import LogFileSink, ReminderScheduler
+from modules.schedule import Schedule
+from modules.dates import Weekday
+
+# a Monday, before reminders go out
+MONDAY_MORNING = datetime(2023, 5, 1, 6, 0)
+
+
+def test_reminders_fire_and_rearm():
+    """
+    Test that due reminders are sent and each user is scheduled again for
+    their next workout day
+    """
+    sent = []
+    scheduler = ReminderScheduler(lambda *reminder: sent.append(reminder))
+    scheduler.schedule_user(
+        "user1",
+        Schedule.from_days([Weekday.MONDAY, Weekday.WEDNESDAY]),
+        MONDAY_MORNING,
+    )
+    scheduler.schedule_user(
+        "user2", Schedule.from_days([Weekday.TUESDAY]), MONDAY_MORNING
+    )
+    assert scheduler.tick(MONDAY_MORNING) == 0
+    assert scheduler.next_due() == datetime(2023, 5, 1, 7, 0)
+
+    assert scheduler.tick(datetime(2023, 5, 1, 7, 0)) == 1
+    assert scheduler.tick(datetime(2023, 5, 2, 7, 30)) == 1
+    assert scheduler.tick(datetime(2023, 5, 3, 7, 30)) == 1
+    assert sent == [
+        ("user1", date(2023, 5, 1)),
+        ("user2", date(2023, 5, 2)),
+        ("user1", date(2023, 5, 3)),
+    ]
+    assert scheduler.next_due() == datetime(2023, 5, 8, 7, 0)
+
+
+def test_changed_days_replace_reminders():
+    """
+    Test that changing a user's workout days drops their old reminder
+    """
+    sent = []
+    scheduler = ReminderScheduler(lambda *reminder: sent.append(reminder))
+    scheduler.schedule_user(
+        "user1", Schedule.from_days([Weekday.MONDAY]), MONDAY_MORNING
+    )
+    scheduler.schedule_user(
+        "user1", Schedule.from_days([Weekday.FRIDAY]), MONDAY_MORNING
+    )
+    scheduler.schedule_user(
+        "user2", Schedule.from_days([Weekday.MONDAY]), MONDAY_MORNING
+    )
+    scheduler.remove_user("user2")
+    assert scheduler.tick(datetime(2023, 5, 1, 8, 0)) == 0
+    assert scheduler.next_due() == datetime(2023, 5, 5, 7, 0)
+    assert len(scheduler) == 1
+
+
+def test_missed_reminders_skipped():
+    """
+    Test that reminders due while the scheduler wasn't ticking aren't sent
+    late
+    """
+    sent = []
+    scheduler = ReminderScheduler(lambda *reminder: sent.append(reminder))
+    scheduler.schedule_user(
+        "user1", Schedule.from_days([Weekday.MONDAY]), MONDAY_MORNING
+    )
+    assert scheduler.tick(datetime(2023, 5, 10, 12, 0)) == 0
+    assert scheduler.next_due() == datetime(2023, 5, 15, 7, 0)
+
+
+def test_log_file_sink(tmp_path):
+    """
+    Test that the log file sink writes a line for each reminder
+
+    Args:
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    sink = LogFileSink(f"{tmp_path}/reminders.log")
+    sink("user1", date(2023, 5, 1))
+    sink("user2", date(2023, 5, 2))
+    lines = (tmp_path / "reminders.log").read_text("UTF-8").splitlines()
+    assert lines[1].endswith("user2: workout on 2023-05-02")
@@ -0,0 +1,105 @@
+"""
+Unit tests for Schedule class
+"""
+
+from datetime import date
+import sys
+import pytest
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+from modules.schedule import Schedule, next_workout_days
+from modules.dates import Weekday
+
+# 2023-05-01 is a Monday
+MONDAY = date(2023, 5, 1)
+
+
+@pytest.fixture
+def sample_schedule():
+    """
+    Create a sample schedule to be used for testing
+
+    Returns:
+        A Schedule object with Monday and Thursday set
+    """
+    return Schedule.from_days([Weekday.MONDAY, Weekday.THURSDAY])
+
+
+next_day_cases = [
+    # next workout day is later in the week
+    (MONDAY, date(2023, 5, 4)),
+    # next workout day is next week
+    (date(2023, 5, 4), date(2023, 5, 8)),
+    (date(2023, 5, 7), date(2023, 5, 8)),
+]
+
+
+# pylint: disable=redefined-outer-name
+@pytest.mark.parametrize("day,next_day", next_day_cases)
+def test_next_day(sample_schedule: Schedule, day: date, next_day: date):
+    """
+    Test that Schedule.next_day finds the next workout day strictly after a
+    date
+
+    Args:
+        sample_schedule: The Schedule object to use
+        day: A datetime.date object representing the date to search from
+        next_day: A datetime.date object representing the expected result
+    """
+    assert sample_schedule.next_day(day) == next_day
+
+
+def test_no_next_day():
+    """
+    Test that Schedule.next_day returns None when no days are set
+    """
+    assert Schedule().next_day(MONDAY) is None
+
+
+def test_json_round_trip(sample_schedule: Schedule):
+    """
+    Test that a schedule converted to the user json format converts back to
+    the same schedule
+
+    Args:
+        sample_schedule: The Schedule object to use
+    """
+    json_dict = sample_schedule.to_json_dict()
+    assert json_dict["MONDAY"] and not json_dict["TUESDAY"]
+    assert Schedule.from_json_dict(json_dict) == sample_schedule
+
+
+def test_project(sample_schedule: Schedule):
+    """
+    Test that Schedule.project lists every workout date in a range, including
+    both ends
+
+    Args:
+        sample_schedule: The Schedule object to use
+    """
+    assert sample_schedule.project(MONDAY, date(2023, 5, 11)) == [
+        MONDAY,
+        date(2023, 5, 4),
+        date(2023, 5, 8),
+        date(2023, 5, 11),
+    ]
+    assert len(sample_schedule.project_weeks(12, MONDAY)) == 24
+
+
+def test_next_workout_days(sample_schedule: Schedule):
+    """
+    Test that next_workout_days matches Schedule.next_day for every schedule
+
+    Args:
+        sample_schedule: The Schedule object to use
+    """
+    schedules = {
+        "user1": sample_schedule,
+        "user2": Schedule.from_days([Weekday.SUNDAY]),
+        "user3": Schedule(),
+    }
+    assert next_workout_days(schedules, MONDAY) == {
+        name: schedule.next_day(MONDAY) for name, schedule in schedules.items()
+    }
@@ -0,0 +1,115 @@
+"""
+Unit tests for binary user snapshots
+"""
+
+import sys
+import os
+import pytest
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+from modules.profile import User
+from modules.storage import user_data_dir
+from modules.workouts import Routine, Exercise
+from modules.dates import Weekday
+from modules.snapshot import read_snapshot, snapshot_path
+
+
+@pytest.fixture
+def sample_user():
+    """
+    Create a sample user with logged routines to be used for testing
+
+    Returns:
+        A user object with xp, workout days and logged routines
+    """
+    user = User("user name", 1500)
+    user.set_workout_days([Weekday.MONDAY, Weekday.FRIDAY])
+    user.add_routine(Routine("routine 1"))
+    user.routines["routine 1"].add_exercise(Exercise("exercise1", 2))
+    user.routines["routine 1"].add_exercise(Exercise("exercise2", 3))
+    user.routines["routine 1"].exercises["exercise1"].log_weights(
+        "2023-04-30", [1, 2.5]
+    )
+    user.routines["routine 1"].exercises["exercise2"].log_weights(
+        "2023-05-01", [1, 2, 3]
+    )
+    return user
+
+
+@pytest.fixture
+# pylint: disable=redefined-outer-name
+def saved_user_dir(sample_user: User, tmp_path):
+    """
+    Save the sample user's files and snapshot to a temporary directory
+
+    Returns:
+        A string representing the user's data directory
+    """
+    sample_user.to_json(str(tmp_path))
+    sample_user.export_routines(str(tmp_path))
+    return user_data_dir(sample_user.name, str(tmp_path))
+
+
+def test_round_trip(sample_user: User, saved_user_dir: str):
+    """
+    Test that a user restored from their snapshot matches the saved user
+
+    Args:
+        sample_user: The User object that was saved
+        saved_user_dir: A string representing the user's data directory
+    """
+    assert read_snapshot(User, saved_user_dir, "user_name") == sample_user
+
+
+def test_stale_snapshot(saved_user_dir: str):
+    """
+    Test that a snapshot is not used once a file it was taken from changes
+
+    Args:
+        saved_user_dir: A string representing the user's data directory
+    """
+    with open(
+        f"{saved_user_dir}/routine_1/routine_1.csv", "a", encoding="UTF-8"
+    ) as file:
+        file.write("\n")
+    assert read_snapshot(User, saved_user_dir, "user_name") is None
+
+
+def test_corrupt_snapshot(saved_user_dir: str):
+    """
+    Test that a corrupt snapshot is not used, and loading falls back to the
+    json and csv files
+
+    Args:
+        saved_user_dir: A string representing the user's data directory
+    """
+    path = snapshot_path(saved_user_dir, "user_name")
+    with open(path, "r+b") as file:
+        file.seek(-1, os.SEEK_END)
+        file.write(b"\xff")
+    assert read_snapshot(User, saved_user_dir, "user_name") is None
+    loaded = User.load_user_data(
+        "user name", directory=os.path.dirname(saved_user_dir)
+    )
+    assert loaded.xp_points == 1500
+
+
+def test_missing_snapshot(sample_user: User, saved_user_dir: str):
+    """
+    Test that loading falls back to the json and csv files when there is no
+    snapshot
+
+    Args:
+        sample_user: The User object that was saved
+        saved_user_dir: A string representing the user's data directory
+    """
+    os.remove(snapshot_path(saved_user_dir, "user_name"))
+    assert read_snapshot(User, saved_user_dir, "user_name") is None
+    assert (
+        User.load_user_data(
+            "user name", directory=os.path.dirname(saved_user_dir)
+        )
+        == sample_user
+    )
@@ -0,0 +1,63 @@
+"""
+Unit tests for the nightly gym-wide statistics
+"""
+
+import os
+import shutil
+import sys
+import time
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+from modules.stats import read_stats, update_stats
+
+
+def test_update_stats(data_dir):
+    """
+    Test that statistics combine every user and are saved for the admin page
+
+    Args:
+        data_dir: A string representing the base directory of user data
+    """
+    stats = update_stats(data_dir, workers=2)
+    assert stats["users"] == 5
+    assert stats["updated_users"] == 5
+    assert stats["popular_exercises"] == [
+        ["exercise1", 1, 1],
+        ["exercise2", 1, 1],
+    ]
+    assert stats["average_volume"] == {"exercise1": 3.0, "exercise2": 3.0}
+    assert sum(stats["levels"].values()) == 5
+    assert stats["weekdays"]["MONDAY"] == 1
+    assert stats["weekdays"]["TUESDAY"] == 0
+    assert read_stats(data_dir) == stats
+
+
+def test_only_changed_users_updated(data_dir):
+    """
+    Test that a second run only loads users whose files changed
+
+    Args:
+        data_dir: A string representing the base directory of user data
+    """
+    update_stats(data_dir, workers=2)
+    assert update_stats(data_dir, workers=2)["updated_users"] == 0
+
+    later = time.time() + 10
+    os.utime(f"{data_dir}/user_with_xp/user_with_xp.json", (later, later))
+    shutil.rmtree(f"{data_dir}/username")
+    stats = update_stats(data_dir, workers=2)
+    assert stats["updated_users"] == 1
+    assert stats["users"] == 4
+    assert update_stats(data_dir, workers=2, full=True)["updated_users"] == 4
+
+
+def test_no_stats(tmp_path):
+    """
+    Test that nothing is read before the first run
+
+    Args:
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    assert read_stats(str(tmp_path)) is None
@@ -0,0 +1,76 @@
+"""
+Unit tests for the sharded user data layout
+"""
+
+import os
+import sys
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+from modules.batch import discover_users
+from modules.profile import User
+from modules.storage import (
+    migrate_all,
+    remove_links,
+    shard_dir,
+    user_data_dir,
+    user_dirs,
+)
+from modules.workouts import Routine, Exercise
+
+
+def test_new_user_sharded(tmp_path):
+    """
+    Test that a new user is saved in their shard and loads from it
+
+    Args:
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    user = User("new user", 10)
+    user.add_routine(Routine("routine1"))
+    user.routines["routine1"].add_exercise(Exercise("exercise1", 1))
+    user.to_json(str(tmp_path))
+    user.export_routines(str(tmp_path))
+    path = shard_dir("new_user", str(tmp_path))
+    assert path.startswith(str(tmp_path))
+    assert len(os.path.relpath(path, tmp_path).split(os.sep)) == 3
+    assert os.path.isfile(f"{path}/new_user.json")
+    assert not os.path.exists(f"{tmp_path}/new_user")
+    assert User.load_user_data("new user", str(tmp_path)).xp_points == 10
+
+
+def test_unmigrated_fallback(data_dir):
+    """
+    Test that users saved before sharding are still found and loaded
+
+    Args:
+        data_dir: A string representing the base directory of user data
+    """
+    assert user_data_dir("user_with_xp", data_dir) == f"{data_dir}/user_with_xp"
+    assert User.load_user_data("user_with_xp", data_dir).xp_points > 0
+
+
+def test_migrate_all(data_dir):
+    """
+    Test that migration moves every user into their shard, leaves links a
+    running process can keep using, and lists each user once
+
+    Args:
+        data_dir: A string representing the base directory of user data
+    """
+    names = discover_users(data_dir)
+    xp_points = User.load_user_data("user_with_xp", data_dir).xp_points
+    assert sorted(migrate_all(data_dir)) == names
+    assert not migrate_all(data_dir)
+    assert user_data_dir("user_with_xp", data_dir) == shard_dir(
+        "user_with_xp", data_dir
+    )
+    assert os.path.isfile(f"{data_dir}/user_with_xp/user_with_xp.json")
+    assert sorted(name for name, _ in user_dirs(data_dir)) == names
+    assert discover_users(data_dir) == names
+    assert User.load_user_data("user_with_xp", data_dir).xp_points == xp_points
+
+    assert remove_links(data_dir) == len(names)
+    assert not os.path.exists(f"{data_dir}/user_with_xp")
+    assert discover_users(data_dir) == names
@@ -0,0 +1,151 @@
+"""
+Unit tests for StreakTracker class
+"""
+
+from datetime import date
+import sys
+import pytest
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+from modules.streaks import StreakTracker
+from modules.schedule import Schedule
+from modules.workouts import Routine, Exercise
+from modules.dates import Weekday
+
+# 2023-05-01 is a Monday
+MONDAY = date(2023, 5, 1)
+MON_WED_FRI = Schedule.from_days(
+    [Weekday.MONDAY, Weekday.WEDNESDAY, Weekday.FRIDAY]
+)
+
+
+@pytest.fixture
+def sample_tracker():
+    """
+    Create a sample tracker planned for Monday, Wednesday and Friday
+
+    Returns:
+        A StreakTracker object with no trained days
+    """
+    return StreakTracker(MON_WED_FRI)
+
+
+def days(*iso_dates: str):
+    """
+    Convert ISO date strings to datetime.date objects
+
+    Args:
+        iso_dates: Strings representing dates in ISO format
+
+    Returns:
+        A list of datetime.date objects
+    """
+    return [date.fromisoformat(iso_date) for iso_date in iso_dates]
+
+
+streak_cases = [
+    # every planned day trained
+    (days("2023-05-01", "2023-05-03", "2023-05-05"), 3, 3),
+    # unplanned days neither extend nor break the streak
+    (days("2023-05-01", "2023-05-02", "2023-05-03"), 2, 2),
+    # missing wednesday breaks the streak
+    (days("2023-05-01", "2023-05-05", "2023-05-08"), 2, 2),
+    # a long gap breaks the streak
+    (days("2023-05-01", "2023-05-03", "2023-05-22"), 1, 2),
+]
+
+
+# pylint: disable=redefined-outer-name
+@pytest.mark.parametrize("trained,streak,longest", streak_cases)
+def test_record_streaks(
+    sample_tracker: StreakTracker, trained: list, streak: int, longest: int
+):
+    """
+    Test that recording sessions in order updates the current and longest
+    streak
+
+    Args:
+        sample_tracker: The StreakTracker object to use
+        trained: A list of datetime.date objects to record in order
+        streak: An integer representing the expected current streak on the
+            last trained day
+        longest: An integer representing the expected longest streak
+    """
+    for day in trained:
+        sample_tracker.record(day)
+    assert sample_tracker.current_streak(trained[-1]) == streak
+    assert sample_tracker.longest_streak == longest
+
+
+def test_out_of_order_matches_rebuild(sample_tracker: StreakTracker):
+    """
+    Test that recording a session out of order gives the same result as
+    recording every session in order
+
+    Args:
+        sample_tracker: The StreakTracker object to use
+    """
+    in_order = StreakTracker(MON_WED_FRI)
+    for day in days("2023-05-01", "2023-05-03", "2023-05-05"):
+        in_order.record(day)
+    for day in days("2023-05-01", "2023-05-05", "2023-05-03"):
+        sample_tracker.record(day)
+    assert sample_tracker == in_order
+
+
+def test_missed_day_resets_current_streak(sample_tracker: StreakTracker):
+    """
+    Test that the current streak is 0 once a planned day has passed without
+    a session, but not while the planned day is still today
+
+    Args:
+        sample_tracker: The StreakTracker object to use
+    """
+    sample_tracker.record(MONDAY)
+    assert sample_tracker.current_streak(date(2023, 5, 3)) == 1
+    assert sample_tracker.current_streak(date(2023, 5, 4)) == 0
+
+
+def test_adherence(sample_tracker: StreakTracker):
+    """
+    Test that adherence is the percentage of planned days trained on
+
+    Args:
+        sample_tracker: The StreakTracker object to use
+    """
+    for day in days("2023-05-01", "2023-05-02", "2023-05-05"):
+        sample_tracker.record(day)
+    assert sample_tracker.adherence(MONDAY, date(2023, 5, 7)) == pytest.approx(
+        100 * 2 / 3
+    )
+
+
+def test_adherence_up_to_today(sample_tracker: StreakTracker):
+    """
+    Test that planned days after today aren't counted as missed, and a range
+    with no planned days up to today has no adherence
+
+    Args:
+        sample_tracker: The StreakTracker object to use
+    """
+    sample_tracker.record(MONDAY)
+    wednesday = date(2023, 5, 3)
+    assert sample_tracker.adherence(MONDAY, date(2023, 5, 7), wednesday) == 50
+    assert sample_tracker.adherence(wednesday, date(2023, 5, 7), MONDAY) is None
+
+
+def test_from_routines():
+    """
+    Test that building a tracker from routine history gives the same result
+    as recording each session
+    """
+    routine = Routine("routine1")
+    routine.add_exercise(Exercise("exercise1", 1))
+    routine.exercises["exercise1"].log_weights("2023-05-03", [1])
+    routine.exercises["exercise1"].log_weights("2023-05-01", [1])
+    recorded = StreakTracker(MON_WED_FRI)
+    recorded.record(MONDAY)
+    recorded.record(date(2023, 5, 3))
+    assert StreakTracker.from_routines([routine], MON_WED_FRI) == recorded
@@ -0,0 +1,138 @@
+"""
+Unit tests for shared routine templates
+"""
+
+import json
+import os
+import sys
+import pytest
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+import app as app_module
+from modules.profile import User
+from modules.snapshot import snapshot_path
+from modules.storage import user_data_dir
+from modules.templates import TEMPLATES, RoutineTemplate, TemplateLibrary
+from modules.workouts import Routine, Exercise
+
+PUSH = TEMPLATES.get("push-v1")
+
+
+def test_routine_follows_template(tmp_path):
+    """
+    Test that a routine from a template builds its exercises from it and is
+    saved as a reference to it
+
+    Args:
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    routine = Routine.from_template(PUSH)
+    assert routine.name == "Push"
+    assert [(ex.name, ex.sets) for ex in routine.exercises.values()] == list(
+        PUSH.exercises
+    )
+    routine.to_json(f"{tmp_path}/push.json")
+    with open(f"{tmp_path}/push.json", "r", encoding="UTF-8") as file:
+        assert json.load(file) == {"_name": "Push", "_template": "push-v1"}
+    loaded = Routine.from_json(f"{tmp_path}/push.json")
+    assert loaded.template is PUSH
+    assert loaded == routine
+
+
+def test_edit_copies_template(tmp_path):
+    """
+    Test that adding an exercise gives the routine its own copy and leaves
+    the template unchanged
+
+    Args:
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    routine = Routine.from_template(PUSH)
+    routine.add_exercise(Exercise("Dip", 3))
+    assert routine.template is None
+    assert len(routine.exercises) == len(PUSH.exercises) + 1
+    assert Routine.from_template(PUSH).exercises.keys() == {
+        name for name, _ in PUSH.exercises
+    }
+    routine.to_json(f"{tmp_path}/push.json")
+    assert Routine.from_json(f"{tmp_path}/push.json") == routine
+
+
+@pytest.mark.parametrize("with_snapshot", [True, False])
+def test_user_round_trip(tmp_path, with_snapshot):
+    """
+    Test that a user's routine keeps following its template through saving
+    and loading, with history of their own
+
+    Args:
+        tmp_path: A pathlib.Path object representing a temporary directory
+        with_snapshot: A boolean representing whether to load from the
+            user's snapshot or their json and csv
+    """
+    user = User("username", 10)
+    user.add_routine(Routine.from_template(PUSH))
+    user.routines["Push"].exercises["Bench Press"].log_weights(
+        "2023-05-01", [100, 100, 95, 95]
+    )
+    user.checkpoint(str(tmp_path))
+    if not with_snapshot:
+        os.remove(
+            snapshot_path(user_data_dir(user.name, str(tmp_path)), user.name)
+        )
+    loaded = User.load_user_data("username", str(tmp_path))
+    assert loaded.routines["Push"].template is PUSH
+    assert loaded.routines == user.routines
+
+
+def test_journal_replay(tmp_path):
+    """
+    Test that adopting a template is journaled as a reference to it
+
+    Args:
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    user = User("username")
+    user.open_journal(str(tmp_path))
+    user.add_routine(Routine.from_template(PUSH, "Monday"))
+    assert user.journal.pending == 1
+    user.journal.close()
+    loaded = User.load_user_data("username", str(tmp_path))
+    assert loaded.routines["Monday"].template is PUSH
+
+
+def test_library_save_and_load(tmp_path):
+    """
+    Test that published templates are saved, loaded by another library and
+    can't be changed
+
+    Args:
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    template = RoutineTemplate("arms-v1", "Arms", (("Barbell Curl", 3),))
+    library = TemplateLibrary()
+    library.publish(template)
+    library.publish(template)
+    with pytest.raises(ValueError):
+        library.publish(template._replace(name="Biceps"))
+    library.save(f"{tmp_path}/templates.json")
+    other = TemplateLibrary()
+    other.load(f"{tmp_path}/templates.json")
+    assert other.get("arms-v1") == template
+
+
+def test_adopt_template():
+    """
+    Test that adopting a template adds a routine following it, named so it
+    doesn't replace an existing routine
+    """
+    user = User("username")
+    app_module.user = user
+    client = app_module.app.test_client()
+    assert client.post("/adopt-template/push-v1").status_code == 302
+    assert client.post("/adopt-template/push-v1").status_code == 302
+    assert client.post("/adopt-template/missing").status_code == 404
+    assert list(user.routines) == ["Push", "Push2"]
+    assert user.routines["Push2"].template is PUSH
+    assert b"Push" in client.get("/templates").data
@@ -3,6 +3,7 @@ Unit tests for the User class internal methods
 """
 
 import sys
+from datetime import date
 from typing import List
 import pytest
 
@@ -10,8 +11,9 @@ sys.path.append("./")
 
 # pylint: disable=import-error, wrong-import-position
 from modules.profile import User
-from modules.workouts import Routine
+from modules.workouts import Routine, Exercise
 from modules.dates import Weekday
+from modules.xp import XPEngine
 
 
 @pytest.fixture
@@ -118,3 +120,204 @@ def test_set_workout_days_overrides(sample_user: User):
     assert {
         day for day, value in sample_user.workout_days.items() if value
     } == set([Weekday.THURSDAY])
+
+
+@pytest.fixture
+def sample_user_with_routine(sample_user: User):
+    """
+    Create a sample user with a routine to log
+
+    Returns:
+        A user object with a routine of two exercises
+    """
+    sample_user.add_routine(Routine("routine1"))
+    sample_user.routines["routine1"].add_exercise(Exercise("exercise1", 2))
+    sample_user.routines["routine1"].add_exercise(Exercise("exercise2", 1))
+    return sample_user
+
+
+def test_log_workouts(sample_user_with_routine: User):
+    """
+    Test that User.log_workouts logs every entry, groups entries on the same
+    day into one session and gains xp once for all of them
+
+    Args:
+        sample_user_with_routine: The User object to use
+    """
+    user = sample_user_with_routine
+    gained_xp, sessions = user.log_workouts(
+        [
+            {
+                "date": "2023-05-02",
+                "routine": "routine1",
+                "exercise": "exercise1",
+                "weights": [10, 20],
+            },
+            {
+                "date": "2023-05-01",
+                "routine": "routine1",
+                "exercise": "exercise1",
+                "weights": [10, 15],
+            },
+            {
+                "date": "2023-05-01",
+                "routine": "routine1",
+                "exercise": "exercise2",
+                "weights": ["5"],
+            },
+        ]
+    )
+    exercises = user.routines["routine1"].exercises
+    assert sessions == [
+        ("2023-05-01", "routine1"),
+        ("2023-05-02", "routine1"),
+    ]
+    assert exercises["exercise1"].personal_record() == 20
+    assert exercises["exercise2"].history["2023-05-01"].tolist() == [5]
+    assert gained_xp == user.xp_points > 0
+
+
+def test_log_workouts_validates_first(sample_user_with_routine: User):
+    """
+    Test that User.log_workouts logs nothing when any entry is invalid
+
+    Args:
+        sample_user_with_routine: The User object to use
+    """
+    user = sample_user_with_routine
+    entries = [
+        {
+            "date": "2023-05-01",
+            "routine": "routine1",
+            "exercise": "exercise1",
+            "weights": [10, 15],
+        },
+        {
+            "date": "2023-05-01",
+            "routine": "routine1",
+            "exercise": "exercise1",
+            "weights": [10],
+        },
+        {"date": "May 1", "routine": "routine2", "exercise": "exercise1"},
+    ]
+    assert len(user.validate_log_entries(entries)) == 3
+    with pytest.raises(ValueError):
+        user.log_workouts(entries)
+    assert not user.routines["routine1"].exercises["exercise1"].history
+    assert user.xp_points == 0
+
+
+def test_log_workouts_again(sample_user_with_routine: User):
+    """
+    Test that sending the same batch again logs nothing and gains no xp,
+    while a batch changing one session only gains xp for that session
+
+    Args:
+        sample_user_with_routine: The User object to use
+    """
+    user = sample_user_with_routine
+    entries = [
+        {
+            "date": "2023-05-01",
+            "routine": "routine1",
+            "exercise": "exercise1",
+            "weights": [10, ""],
+        },
+        {
+            "date": "2023-05-02",
+            "routine": "routine1",
+            "exercise": "exercise2",
+            "weights": [5],
+        },
+    ]
+    gained_xp, _ = user.log_workouts(entries)
+    version = user.version
+    assert user.log_workouts(entries) == (0, [])
+    assert user.xp_points == gained_xp
+    assert user.version == version
+
+    entries[1]["weights"] = [7.5]
+    _, sessions = user.log_workouts(entries)
+    assert sessions == [("2023-05-02", "routine1")]
+    assert user.xp_points > gained_xp
+
+
+@pytest.mark.parametrize(
+    "weights",
+    [
+        [1e40, 10],
+        [float("inf"), 10],
+        [float("nan"), 10],
+        ["nan", 10],
+        ["heavy", 10],
+        [{"weight": 10}, 10],
+        [True, 10],
+        [None, None],
+        ["", None],
+    ],
+)
+def test_log_workouts_rejects_weights(
+    sample_user_with_routine: User, weights: list
+):
+    """
+    Test that User.log_workouts rejects weights that aren't finite numbers
+    and entries without any set done, logging nothing
+
+    Args:
+        sample_user_with_routine: The User object to use
+        weights: A list of the weights logged for each set
+    """
+    user = sample_user_with_routine
+    entries = [
+        {
+            "date": "2023-05-01",
+            "routine": "routine1",
+            "exercise": "exercise1",
+            "weights": weights,
+        }
+    ]
+    assert len(user.validate_log_entries(entries)) == 1
+    with pytest.raises(ValueError):
+        user.log_workouts(entries)
+    assert not user.routines["routine1"].exercises["exercise1"].history
+    assert user.xp_points == 0
+
+
+def test_log_workouts_undone_on_failure(
+    sample_user_with_routine: User, monkeypatch
+):
+    """
+    Test that User.log_workouts puts back what it logged when awarding xp
+    fails part way through a batch
+
+    Args:
+        sample_user_with_routine: The User object to use
+        monkeypatch: The pytest fixture for replacing the xp rules
+    """
+    user = sample_user_with_routine
+    exercise = user.routines["routine1"].exercises["exercise1"]
+    exercise.log_weights("2023-05-01", [10, 20])
+
+    def failing_rule(session):
+        if session.day == date(2023, 5, 2):
+            raise OverflowError("rule failed")
+        return 100
+
+    monkeypatch.setattr(User, "XP_ENGINE", XPEngine([failing_rule]))
+    entries = [
+        {
+            "date": day,
+            "routine": "routine1",
+            "exercise": "exercise1",
+            "weights": [30, 40],
+        }
+        for day in ("2023-05-01", "2023-05-02")
+    ]
+    version = user.version
+    with pytest.raises(OverflowError):
+        user.log_workouts(entries)
+    assert list(exercise.history) == ["2023-05-01"]
+    assert exercise.history["2023-05-01"].tolist() == [10, 20]
+    assert user.xp_points == 0
+    assert user.version == version
+    assert user.streaks.current_streak(date(2023, 5, 1)) == 1
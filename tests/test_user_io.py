@@ -13,6 +13,7 @@ sys.path.append("./")
 
 # pylint: disable=import-error, wrong-import-position
 from modules.profile import User
+from modules.storage import user_data_dir
 from modules.workouts import Routine, Exercise
 from modules.dates import Weekday
 
@@ -75,8 +76,8 @@ def test_to_json_creates_path(sample_user: User):
     Args:
         sample_user: The User object to use
     """
-    if os.path.exists("user_data/username"):
-        shutil.rmtree("user_data/username")
+    if os.path.exists(user_data_dir("username")):
+        shutil.rmtree(user_data_dir("username"))
     try:
         sample_user.to_json()
     except FileNotFoundError:
@@ -93,7 +94,7 @@ def test_to_json_correctness(sample_user: User):
     """
     sample_user.to_json()
     with open(
-        "user_data/username/username.json", "r", encoding="UTF-8"
+        f"{user_data_dir('username')}/username.json", "r", encoding="UTF-8"
     ) as created_json, open(
         "static_data/users/username/username.json", "r", encoding="UTF-8"
     ) as target_json:
@@ -111,9 +112,13 @@ def test_export_routines(sample_user_with_routine_data: User):
     sample_user_with_routine_data.export_routines()
 
     with open(
-        "user_data/username/routine1/routine1.json", "r", encoding="UTF-8"
+        f"{user_data_dir('username')}/routine1/routine1.json",
+        "r",
+        encoding="UTF-8",
     ) as created_json, open(
-        "user_data/username/routine1/routine1.csv", "r", encoding="UTF-8"
+        f"{user_data_dir('username')}/routine1/routine1.csv",
+        "r",
+        encoding="UTF-8",
     ) as created_csv, open(
         "static_data/routines/routine1/routine1.json", "r", encoding="UTF-8"
     ) as target_json, open(
@@ -180,4 +185,4 @@ def test_load_user_routine_history(sample_user_with_routine_data: User):
     loaded_user = User.load_user_data(
         "user_with_routine_history", directory="static_data/users"
     )
-    assert loaded_user.__dict__ == sample_user_with_routine_data.__dict__
+    assert loaded_user == sample_user_with_routine_data
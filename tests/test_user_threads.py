@@ -0,0 +1,149 @@
+"""
+Stress tests for changing one user from many threads at once
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import sys
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+import app as app_module
+from modules.profile import User
+from modules.workouts import Routine, Exercise
+
+LOGGERS = 8
+SESSIONS_PER_LOGGER = 30
+ROUTINES_PER_WRITER = 20
+READ_ROUTES = [
+    "/profile/routine1/PRs",
+    "/logs/Monday/routine1",
+    "/calendar",
+    "/api/v1/user",
+    "/api/v1/routines",
+    "/api/v1/routines/routine1/exercises/exercise1",
+    "/api/v1/routines/routine1/exercises/exercise1/chart",
+    "/api/v1/routines/routine1/history",
+    "/api/v1/prs",
+]
+
+
+def test_hammer_one_user(tmp_path):
+    """
+    Test that logging, adding routines, saving and rendering one user from
+    many threads loses no changes and never shows a torn snapshot
+
+    Args:
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    user = User("username")
+    user.add_routine(Routine("routine1"))
+    user.routines["routine1"].add_exercise(Exercise("exercise1", 2))
+    first = date(2020, 1, 1)
+
+    def log(logger):
+        gained = 0
+        for session in range(SESSIONS_PER_LOGGER):
+            day = first + timedelta(days=session * LOGGERS + logger)
+            gained += user.log_workouts(
+                [
+                    {
+                        "date": day.isoformat(),
+                        "routine": "routine1",
+                        "exercise": "exercise1",
+                        "weights": [10, 20],
+                    }
+                ]
+            )[0]
+        return gained
+
+    def add_routines(writer):
+        for number in range(ROUTINES_PER_WRITER):
+            user.add_routine(Routine(f"routine_{writer}_{number}"))
+        return 0
+
+    def save(_):
+        for _ in range(10):
+            user.to_json(str(tmp_path))
+            user.export_routines(str(tmp_path))
+        return 0
+
+    def render(_):
+        for _ in range(200):
+            view = user.view()
+            assert list(view.routines)[0] == "routine1"
+            assert all(
+                name == routine.name for name, routine in view.routines.items()
+            )
+        return 0
+
+    jobs = (
+        [(log, logger) for logger in range(LOGGERS)]
+        + [(add_routines, writer) for writer in range(2)]
+        + [(save, saver) for saver in range(2)]
+        + [(render, reader) for reader in range(4)]
+    )
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        futures = [executor.submit(job, arg) for job, arg in jobs]
+        gained = sum(future.result() for future in futures)
+
+    history = user.routines["routine1"].exercises["exercise1"].history
+    assert len(history) == LOGGERS * SESSIONS_PER_LOGGER
+    assert len(user.routines) == 1 + 2 * ROUTINES_PER_WRITER
+    assert user.xp_points == gained
+    assert len(user.view().routines) == len(user.routines)
+
+    user.checkpoint(str(tmp_path))
+    assert User.load_user_data("username", str(tmp_path)) == user
+
+
+def test_read_routes_while_logging(monkeypatch):
+    """
+    Test that pages and API readers answer consistently while other
+    requests log sessions and add exercises to the same user
+
+    Args:
+        monkeypatch: The pytest fixture for replacing the logged in user
+    """
+    user = User("username")
+    user.add_routine(Routine("routine1"))
+    user.routines["routine1"].add_exercise(Exercise("exercise1", 2))
+    monkeypatch.setattr(app_module, "user", user, raising=False)
+    # switch threads as often as possible, so reads land mid-change
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    first = date(2020, 1, 1)
+
+    def log(logger):
+        for session in range(SESSIONS_PER_LOGGER):
+            day = first + timedelta(days=session * LOGGERS + logger)
+            user.log_workouts(
+                [
+                    {
+                        "date": day.isoformat(),
+                        "routine": "routine1",
+                        "exercise": "exercise1",
+                        "weights": [10 + session, 20],
+                    }
+                ]
+            )
+            user.routines["routine1"].add_exercise(
+                Exercise(f"exercise_{logger}_{session}", 1)
+            )
+
+    def read(_):
+        client = app_module.app.test_client()
+        for _ in range(5):
+            for route in READ_ROUTES:
+                assert client.get(route).status_code == 200
+
+    jobs = [(log, logger) for logger in range(LOGGERS)] + [
+        (read, reader) for reader in range(4)
+    ]
+    try:
+        with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+            for future in [executor.submit(job, arg) for job, arg in jobs]:
+                future.result()
+    finally:
+        sys.setswitchinterval(interval)
@@ -0,0 +1,127 @@
+"""
+Unit tests for the xp rules and level curves
+"""
+
+from datetime import date
+import sys
+import pytest
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+from modules.xp import (
+    FlatXP,
+    LevelCurve,
+    PersonalRecordXP,
+    Session,
+    StreakXP,
+    VolumeXP,
+    XPEngine,
+)
+from modules.profile import User
+from modules.workouts import Routine, Exercise
+
+
+@pytest.fixture(autouse=True)
+def change_test_dir(request, monkeypatch):
+    """
+    Change working directory to tests directory
+    """
+    monkeypatch.chdir(request.fspath.dirname)
+
+
+@pytest.fixture
+def sample_curve():
+    """
+    Create a sample non-linear level curve
+
+    Returns:
+        A LevelCurve object where each of 3 levels takes twice the xp of the
+        last, starting at 100
+    """
+    return LevelCurve.geometric(100, 2, max_level=3)
+
+
+level_cases = [(0, 0), (99, 0), (100, 1), (299, 1), (300, 2), (700, 3)]
+
+
+# pylint: disable=redefined-outer-name
+@pytest.mark.parametrize("xp_points,level", level_cases)
+def test_curve_level(sample_curve: LevelCurve, xp_points: int, level: int):
+    """
+    Test that LevelCurve.level finds the level from the threshold table
+
+    Args:
+        sample_curve: The LevelCurve object to use
+        xp_points: An integer representing the amount of xp
+        level: An integer representing the expected level
+    """
+    assert sample_curve.level(xp_points) == level
+
+
+def test_curve_past_table(sample_curve: LevelCurve):
+    """
+    Test that levels past the end of the table keep the last level's step
+
+    Args:
+        sample_curve: The LevelCurve object to use
+    """
+    assert sample_curve.level(700 + 400 * 2) == 5
+    assert sample_curve.progress(700 + 400 * 2 + 10) == (10, 400)
+
+
+def test_curve_progress(sample_curve: LevelCurve):
+    """
+    Test that LevelCurve.progress finds the xp into and the size of the
+    current level
+
+    Args:
+        sample_curve: The LevelCurve object to use
+    """
+    assert sample_curve.progress(350) == (50, 400)
+
+
+def test_award():
+    """
+    Test that XPEngine.award adds up every rule
+    """
+    engine = XPEngine(
+        [FlatXP(100), VolumeXP(0.1), PersonalRecordXP(50), StreakXP(10, 30)]
+    )
+    session = Session(
+        date(2023, 5, 1), "routine1", {"exercise1": [100.0, 100.0]}, 2, 5
+    )
+    assert engine.award(session) == 100 + 20 + 100 + 30
+
+
+def test_volume_skips_non_finite():
+    """
+    Test that VolumeXP skips unlogged and infinite weights instead of
+    overflowing
+    """
+    session = Session(
+        date(2023, 5, 1),
+        "routine1",
+        {"exercise1": [100.0, float("nan"), float("inf"), -float("inf")]},
+        0,
+        1,
+    )
+    assert VolumeXP(0.1)(session) == 10
+    session.weights["exercise1"][:] = [1e308, 1e308]
+    assert VolumeXP(0.1)(session) == 0
+
+
+def test_replay():
+    """
+    Test that XPEngine.replay awards records only when a later session beats
+    an earlier one
+    """
+    user = User("username")
+    user.add_routine(Routine("routine1"))
+    user.routines["routine1"].add_exercise(Exercise("exercise1", 1))
+    exercise = user.routines["routine1"].exercises["exercise1"]
+    exercise.log_weights("2023-05-01", [10])
+    exercise.log_weights("2023-05-02", [20])
+    exercise.log_weights("2023-05-03", [15])
+    engine = XPEngine([FlatXP(100), PersonalRecordXP(50)])
+    assert engine.replay(user) == 3 * 100 + 50
@@ -0,0 +1,75 @@
+"""
+Unit tests for the job recomputing every user's xp
+"""
+
+from datetime import date
+import sys
+
+sys.path.append("./")
+
+# pylint: disable=import-error, wrong-import-position
+from modules.archive import archive_routine
+from modules.journal import user_dir_locked
+from modules.profile import User
+from modules.storage import user_data_dir
+from modules.workouts import Routine, Exercise
+from modules.xp import FlatXP, XPEngine
+from modules.xp_jobs import recompute_all
+
+
+def test_recompute_all(data_dir):
+    """
+    Test that recompute_all replays and saves every user's xp
+
+    Args:
+        data_dir: A string representing the base directory of user data
+    """
+    results = recompute_all(data_dir, XPEngine([FlatXP(100)]), workers=2)
+    assert results["user_with_routine_history"] == 100
+    assert results["user_with_xp"] == 0
+    assert User.load_user_data("user_with_xp", data_dir).xp_points == 0
+
+
+def test_open_user_skipped(data_dir):
+    """
+    Test that a user another process has open isn't saved under it
+
+    Args:
+        data_dir: A string representing the base directory of user data
+    """
+    user_dir = user_data_dir("user_with_routine_history", data_dir)
+    with user_dir_locked(user_dir):
+        results = recompute_all(data_dir, XPEngine([FlatXP(100)]), workers=1)
+    assert isinstance(results["user_with_routine_history"], BlockingIOError)
+    assert results["user_with_xp"] == 0
+
+
+def test_archived_history_not_saved(tmp_path):
+    """
+    Test that archived sessions count towards the new xp without being
+    written back into the csv log
+
+    Args:
+        tmp_path: A pathlib.Path object representing a temporary directory
+    """
+    user = User("username")
+    user.add_routine(Routine("routine1"))
+    user.routines["routine1"].add_exercise(Exercise("exercise1", 1))
+    exercise = user.routines["routine1"].exercises["exercise1"]
+    exercise.log_weights("2021-03-01", [100])
+    exercise.log_weights("2023-05-01", [10])
+    user.checkpoint(str(tmp_path))
+    csv_path = (
+        f"{user_data_dir('username', str(tmp_path))}/routine1/routine1.csv"
+    )
+    archive_routine(csv_path, 365, date(2023, 6, 1))
+
+    results = recompute_all(str(tmp_path), XPEngine([FlatXP(100)]), workers=1)
+    assert results["username"] == 200
+    loaded = User.load_user_data("username", str(tmp_path))
+    assert loaded.xp_points == 200
+    assert list(loaded.routines["routine1"].exercises["exercise1"].history) == [
+        "2023-05-01"
+    ]
+    with open(csv_path, "r", encoding="UTF-8") as file:
+        assert "2021-03-01" not in file.readline()